@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.database import get_db
 from app.schemas.booking import BookingCreate, BookingResponse
 from app.services.booking import BookingService
@@ -9,7 +9,7 @@ router = APIRouter(prefix="/api/booking", tags=["booking"])
 booking_service = BookingService()
 
 @router.post("/book", response_model=BookingResponse)
-async def book_slot(booking_data: BookingCreate, db: Session = Depends(get_db)):
+async def book_slot(booking_data: BookingCreate, db: AsyncSession = Depends(get_db)):
     """
     Book a time slot with an analyst.
     Uses Redis distributed lock to prevent double-booking.
@@ -31,15 +31,15 @@ async def book_slot(booking_data: BookingCreate, db: Session = Depends(get_db)):
     return booking
 
 @router.get("/my-bookings", response_model=List[BookingResponse])
-def get_my_bookings(user_id: str, db: Session = Depends(get_db)):
+async def get_my_bookings(user_id: str, db: AsyncSession = Depends(get_db)):
     """Get all bookings for a user"""
-    bookings = booking_service.get_user_bookings(db, user_id)
+    bookings = await booking_service.get_user_bookings(db, user_id)
     return bookings
 
 @router.delete("/{booking_id}")
-def cancel_booking(booking_id: str, user_id: str, db: Session = Depends(get_db)):
+async def cancel_booking(booking_id: str, user_id: str, db: AsyncSession = Depends(get_db)):
     """Cancel a booking"""
-    success = booking_service.cancel_booking(db, booking_id, user_id)
+    success = await booking_service.cancel_booking(db, booking_id, user_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -0,0 +1,90 @@
+"""
+Contention benchmark for the booking strategies.
+
+Many users try to book the same few slots at once against the configured
+DATABASE_URL and REDIS_URL:
+
+    python -m app.benchmark --strategy lock optimistic reserve --users 1000 --slots 1
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+from app.models.database import SessionLocal, engine, init_db
+from app.services.booking import BOOKING_STRATEGIES, BookingService, redis_client
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run(strategy: str, users: int = 1000, slots: int = 1, redis=None, sessions=SessionLocal) -> dict:
+    """Book ``slots`` slots with ``users`` concurrent attempts spread evenly over them"""
+    service = BookingService(redis, strategy=strategy, sessions=sessions)
+    await service.start()
+    # Fresh slots far in the future, so repeated runs do not collide
+    first_slot = datetime(2100, 1, 1) + timedelta(hours=random.randrange(10 ** 6))
+    slot_times = [first_slot + timedelta(hours=i) for i in range(slots)]
+    analyst_id = f"bench-{strategy}"
+    latencies: List[float] = []
+
+    async def attempt(user: int) -> bool:
+        started = time.perf_counter()
+        async with sessions() as db:
+            booking = await service.book_slot(db, f"bench-user-{user}", analyst_id, slot_times[user % slots])
+        latencies.append(time.perf_counter() - started)
+        return booking is not None
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(attempt(user) for user in range(users)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    persisted = elapsed
+    if service.writer is not None:
+        while await service.writer.drain_once():
+            pass
+        persisted = time.perf_counter() - started
+    await service.stop()
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    return {
+        "strategy": strategy,
+        "attempts": users,
+        "booked": sum(result is True for result in results),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "attempts_per_second": round(users / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "persisted_seconds": round(persisted, 3),
+    }
+
+
+async def compare(strategies: List[str], users: int, slots: int) -> List[dict]:
+    await init_db()
+    try:
+        return [await run(strategy, users, slots) for strategy in strategies]
+    finally:
+        await redis_client.aclose()
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark booking strategies under contention")
+    parser.add_argument("--strategy", nargs="+", choices=BOOKING_STRATEGIES, default=list(BOOKING_STRATEGIES))
+    parser.add_argument("--users", type=int, default=1000, help="Concurrent booking attempts")
+    parser.add_argument("--slots", type=int, default=1, help="Distinct slots the attempts compete for")
+    args = parser.parse_args()
+
+    results = asyncio.run(compare(args.strategy, args.users, args.slots))
+    columns = list(results[0])
+    print("  ".join(f"{column:>19}" for column in columns))
+    for result in results:
+        print("  ".join(f"{result[column]!s:>19}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,29 @@ from fastapi.responses import JSONResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from contextlib import asynccontextmanager
 from app.api import booking
+from app.models.database import engine, init_db
+from app.services.booking import redis_client
 import os
 
 # Rate Limiter
 limiter = Limiter(key_func=get_remote_address)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    await booking.booking_service.start()
+    yield
+    await booking.booking_service.stop()
+    await redis_client.aclose()
+    await engine.dispose()
+
 app = FastAPI(
     title="MarketHub Booking Service",
     description="High-load booking service with Redis distributed locks",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add rate limiter to app state
@@ -1,21 +1,40 @@
-from sqlalchemy import Column, String, DateTime, Integer, create_engine
+from sqlalchemy import Column, String, DateTime, Index, Integer, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import List
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Use sqlite for local development, PostgreSQL for production
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bookings.db")
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bookings.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+# Longest booking accepted; bounds the overlap range query
+BOOKING_MAX_DURATION_MINUTES = int(os.getenv("BOOKING_MAX_DURATION_MINUTES", 240))
+# Granularity of slot locks, claims and slot rows
+BOOKING_BUCKET_MINUTES = int(os.getenv("BOOKING_BUCKET_MINUTES", 15))
 
-# Convert async URL to sync if needed
-if "postgresql" in DATABASE_URL and "asyncpg" not in DATABASE_URL:
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://")
+# Use the async drivers for plain URLs
+if DATABASE_URL.startswith("postgresql://"):
+    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+elif DATABASE_URL.startswith("sqlite://"):
+    DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_async_engine(DATABASE_URL)
+else:
+    engine = create_async_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True
+    )
+# Objects stay usable after commit without a reload round trip
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 class Booking(Base):
@@ -30,15 +49,112 @@ class Booking(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-def get_db():
-    db = SessionLocal()
-    try:
+# At most one active (not cancelled) booking per analyst and slot
+ACTIVE_SLOT_WHERE = Booking.status != "cancelled"
+active_slot_index = Index(
+    "uq_bookings_active_slot",
+    Booking.analyst_id,
+    Booking.slot_time,
+    unique=True,
+    postgresql_where=ACTIVE_SLOT_WHERE,
+    sqlite_where=ACTIVE_SLOT_WHERE
+)
+
+class BookingSlot(Base):
+    """
+    One row per time bucket an active booking covers (optimistic strategy).
+    The primary key lets only one booking hold a bucket, so overlapping
+    bookings conflict on insert.
+    """
+    __tablename__ = "booking_slots"
+
+    analyst_id = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    booking_id = Column(String, nullable=False, index=True)
+
+def naive_utc(moment: datetime) -> datetime:
+    """Slot times are stored as naive UTC"""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def slot_end(slot_time: datetime, duration_minutes: int) -> datetime:
+    return slot_time + timedelta(minutes=duration_minutes)
+
+def slot_buckets(slot_time: datetime, duration_minutes: int, minutes: int = BOOKING_BUCKET_MINUTES) -> List[datetime]:
+    """
+    Start times of the fixed-size buckets [slot_time, slot_end) touches.
+    Overlapping bookings always share a bucket.
+    """
+    slot_time = naive_utc(slot_time)
+    size = timedelta(minutes=minutes)
+    first = datetime.min + (slot_time - datetime.min) // size * size
+    end = slot_end(slot_time, max(duration_minutes, 1))
+    return [first + i * size for i in range((end - first + size - timedelta.resolution) // size)]
+
+async def find_overlapping(db, analyst_id: str, slot_time: datetime, duration_minutes: int) -> List[Booking]:
+    """
+    Active bookings of the analyst overlapping [slot_time, slot_end).
+    A range scan on the (analyst_id, slot_time) index, bounded by the
+    longest possible booking.
+    """
+    candidates = await db.scalars(
+        select(Booking).where(
+            Booking.analyst_id == analyst_id,
+            ACTIVE_SLOT_WHERE,
+            Booking.slot_time > slot_time - timedelta(minutes=BOOKING_MAX_DURATION_MINUTES),
+            Booking.slot_time < slot_end(slot_time, duration_minutes)
+        )
+    )
+    return [
+        booking for booking in candidates
+        if slot_end(booking.slot_time, booking.duration_minutes or 0) > slot_time
+    ]
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def dialect_insert(dialect: str):
+    """The dialect's INSERT construct supporting ON CONFLICT"""
+    if dialect not in UPSERT_DIALECTS:
+        raise ValueError(f"Unsupported database dialect {dialect!r}. Available: {list(UPSERT_DIALECTS)}")
+    return UPSERT_DIALECTS[dialect]
+
+def insert_unless_slot_taken(dialect: str, values: dict):
+    """
+    INSERT ... ON CONFLICT DO NOTHING against the active slot index:
+    inserts one row, or none if the slot already has an active booking.
+    """
+    return dialect_insert(dialect)(Booking).values(**values).on_conflict_do_nothing(
+        index_elements=[Booking.analyst_id, Booking.slot_time],
+        index_where=ACTIVE_SLOT_WHERE
+    )
+
+def insert_slot_rows(dialect: str, rows: List[dict]):
+    """INSERT ... ON CONFLICT DO NOTHING for bucket rows; the row count tells how many were free"""
+    return dialect_insert(dialect)(BookingSlot).values(rows).on_conflict_do_nothing(
+        index_elements=[BookingSlot.analyst_id, BookingSlot.bucket]
+    )
+
+async def lock_analyst(db, analyst_id: str):
+    """
+    Serialize the rest of the transaction with other transactions locking
+    the same analyst. PostgreSQL takes a transaction-scoped advisory lock;
+    SQLite already serializes writing transactions.
+    """
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(analyst_id))))
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-# Create tables on import
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    print(f"Database init warning: {e}")
+
+async def init_db():
+    """Create tables (called from the app lifespan)"""
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # create_all skips indexes of tables that already exist
+            await conn.run_sync(active_slot_index.create, checkfirst=True)
+    except Exception as e:
+        print(f"Database init warning: {e}")
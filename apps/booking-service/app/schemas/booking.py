@@ -1,12 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
+from app.models.database import BOOKING_MAX_DURATION_MINUTES
 
 class BookingCreate(BaseModel):
     user_id: str
     analyst_id: str
     slot_time: datetime
-    duration_minutes: int = 30
+    duration_minutes: int = Field(30, gt=0, le=BOOKING_MAX_DURATION_MINUTES)
 
 class BookingResponse(BaseModel):
     id: str
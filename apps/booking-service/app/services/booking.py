@@ -1,45 +1,185 @@
-import redis
+import redis.asyncio as redis
 import os
 from dotenv import load_dotenv
-from typing import Optional
-from datetime import datetime
-from sqlalchemy.orm import Session
-from app.models.database import Booking
+from typing import List, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.database import (
+    ACTIVE_SLOT_WHERE, BOOKING_BUCKET_MINUTES, Booking, BookingSlot, SessionLocal, find_overlapping,
+    insert_slot_rows, insert_unless_slot_taken, lock_analyst, naive_utc, slot_buckets
+)
+from app.services.reservations import ReservationStore, WriteBehindWriter
 import uuid
 
 load_dotenv()
 
-redis_client = redis.from_url(os.getenv("REDIS_URL"))
+# lock: Redis lock around a DB check and insert
+# reserve: atomic Redis reservation, persisted in batches by a background writer
+# optimistic: no Redis, INSERT ... ON CONFLICT DO NOTHING on slot rows and the active slot index
+BOOKING_STRATEGY = os.getenv("BOOKING_STRATEGY", "lock")
+BOOKING_STRATEGIES = ("lock", "reserve", "optimistic")
+
+# The async client connects lazily, on the first command
+redis_client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"))
+
+# Take every bucket lock of a booking, or none of them
+LOCK_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call("exists", KEYS[i]) == 1 then
+        return 0
+    end
+end
+for i = 1, #KEYS do
+    redis.call("set", KEYS[i], ARGV[1], "PX", ARGV[2])
+end
+return 1
+"""
+
+# Release only the bucket locks still holding our token
+UNLOCK_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call("get", KEYS[i]) == ARGV[1] then
+        redis.call("del", KEYS[i])
+    end
+end
+return 1
+"""
 
 class BookingService:
-    def __init__(self):
-        self.redis = redis_client
+    def __init__(self, redis=None, strategy: str = BOOKING_STRATEGY, sessions=SessionLocal):
+        if strategy not in BOOKING_STRATEGIES:
+            raise ValueError(f"Unknown booking strategy {strategy!r}. Available: {list(BOOKING_STRATEGIES)}")
+        self.redis = redis if redis is not None else redis_client
         self.lock_ttl = 10  # Lock expires in 10 seconds
+        self.strategy = strategy
+        self.sessions = sessions
+        self.reservations = ReservationStore(self.redis) if strategy == "reserve" else None
+        self.writer = WriteBehindWriter(self.redis, sessions) if strategy == "reserve" else None
+        self._lock = self.redis.register_script(LOCK_SCRIPT) if strategy == "lock" else None
+        self._unlock = self.redis.register_script(UNLOCK_SCRIPT) if strategy == "lock" else None
+
+    async def start(self):
+        """
+        Reconcile strategy state with the DB: reservations and the writer
+        (reserve), bucket rows of bookings made by other strategies (optimistic).
+        """
+        if self.writer is not None:
+            await self.writer.start()
+            await self.reservations.restore_claims(self.sessions)
+        if self.strategy == "optimistic":
+            await self.restore_slot_rows()
 
-    async def book_slot(self, db: Session, user_id: str, analyst_id: str, slot_time: datetime, duration_minutes: int = 30) -> Optional[Booking]:
+    async def stop(self):
+        if self.writer is not None:
+            await self.writer.stop()
+
+    async def book_slot(self, db: AsyncSession, user_id: str, analyst_id: str, slot_time: datetime, duration_minutes: int = 30) -> Optional[Booking]:
         """
-        Book a time slot with Redis distributed lock.
+        Book a time slot with the configured strategy.
         Handles high-load scenario where 1000+ users try to book same slot.
+        Redis and database round trips are awaited, so waiting requests
+        never block the event loop.
+        """
+        # Stored, compared and bucketed as naive UTC by every strategy
+        slot_time = naive_utc(slot_time)
+        if self.strategy == "reserve":
+            return await self.reservations.reserve(user_id, analyst_id, slot_time, duration_minutes)
+        if self.strategy == "optimistic":
+            return await self._book_optimistic(db, user_id, analyst_id, slot_time, duration_minutes)
+        return await self._book_with_lock(db, user_id, analyst_id, slot_time, duration_minutes)
+
+    async def _book_optimistic(self, db: AsyncSession, user_id: str, analyst_id: str, slot_time: datetime, duration_minutes: int) -> Optional[Booking]:
         """
-        # Create unique lock key for this slot
-        lock_key = f"lock:booking:{analyst_id}:{slot_time.isoformat()}"
+        Book a time slot in one DB transaction: bucket rows and the booking
+        are inserted with ON CONFLICT DO NOTHING. When every bucket is free
+        no lock is taken. A bucket may instead be held by an off-grid
+        neighbour that only shares it: then the booking is checked for real
+        overlaps under a per-analyst lock, which every booking reaching a
+        held bucket takes.
+        """
+        dialect = db.bind.dialect.name
+        now = datetime.utcnow()
+        values = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "analyst_id": analyst_id,
+            "slot_time": slot_time,
+            "duration_minutes": duration_minutes,
+            "status": "confirmed",
+            "created_at": now,
+            "updated_at": now
+        }
+        buckets = slot_buckets(slot_time, duration_minutes)
+        claimed = await db.execute(insert_slot_rows(dialect, [
+            {"analyst_id": analyst_id, "bucket": bucket, "booking_id": values["id"]} for bucket in buckets
+        ]))
+        if claimed.rowcount < len(buckets):
+            # Holders of the other buckets have committed by now
+            await lock_analyst(db, analyst_id)
+            if await find_overlapping(db, analyst_id, slot_time, duration_minutes):
+                await db.rollback()
+                return None
         
-        # Try to acquire lock (NX = only set if not exists)
-        lock_acquired = self.redis.set(lock_key, user_id, nx=True, ex=self.lock_ttl)
+        result = await db.execute(insert_unless_slot_taken(dialect, values))
+        if result.rowcount == 0:
+            await db.rollback()
+            return None
+        await db.commit()
+        return Booking(**values)
+
+    async def restore_slot_rows(self) -> int:
+        """Add missing bucket rows for upcoming active bookings"""
+        async with self.sessions() as db:
+            bookings = await db.scalars(
+                select(Booking).where(ACTIVE_SLOT_WHERE, Booking.slot_time >= datetime.utcnow() - timedelta(days=1))
+            )
+            rows = [
+                {"analyst_id": booking.analyst_id, "bucket": bucket, "booking_id": booking.id}
+                for booking in bookings
+                for bucket in slot_buckets(booking.slot_time, booking.duration_minutes or 0)
+            ]
+            restored = 0
+            for start in range(0, len(rows), 500):
+                result = await db.execute(insert_slot_rows(db.bind.dialect.name, rows[start:start + 500]))
+                restored += result.rowcount
+            await db.commit()
+        return restored
+
+    async def _hand_over_slot_rows(self, db: AsyncSession, booking: Booking):
+        """Give the freed buckets to off-grid neighbours that also touch them"""
+        freed = slot_buckets(booking.slot_time, booking.duration_minutes or 0)
+        span = int((freed[-1] - freed[0]) / timedelta(minutes=1)) + BOOKING_BUCKET_MINUTES
+        rows = {}
+        for neighbour in await find_overlapping(db, booking.analyst_id, freed[0], span):
+            for bucket in slot_buckets(neighbour.slot_time, neighbour.duration_minutes or 0):
+                if bucket in freed:
+                    rows.setdefault(bucket, {"analyst_id": booking.analyst_id, "bucket": bucket, "booking_id": neighbour.id})
+        if rows:
+            await db.execute(insert_slot_rows(db.bind.dialect.name, list(rows.values())))
+
+    async def _book_with_lock(self, db: AsyncSession, user_id: str, analyst_id: str, slot_time: datetime, duration_minutes: int) -> Optional[Booking]:
+        """
+        Book a time slot with Redis distributed locks on every time bucket
+        the booking covers, so overlapping attempts contend for a shared key.
+        """
+        lock_keys = [
+            f"lock:booking:{analyst_id}:{bucket.isoformat()}"
+            for bucket in slot_buckets(slot_time, duration_minutes)
+        ]
+        token = str(uuid.uuid4())
+        
+        # Try to acquire all locks at once (NX semantics across the buckets)
+        lock_acquired = await self._lock(keys=lock_keys, args=[token, self.lock_ttl * 1000])
         
         if not lock_acquired:
-            # Another user already locked this slot
+            # Another user already locked an overlapping slot
             return None
         
         try:
-            # Check if slot is already booked in database
-            existing_booking = db.query(Booking).filter(
-                Booking.analyst_id == analyst_id,
-                Booking.slot_time == slot_time,
-                Booking.status != "cancelled"
-            ).first()
-            
-            if existing_booking:
+            # Check for overlapping bookings in database
+            if await find_overlapping(db, analyst_id, slot_time, duration_minutes):
                 return None
             
             # Create new booking
@@ -53,29 +193,50 @@ class BookingService:
             )
             
             db.add(booking)
-            db.commit()
-            db.refresh(booking)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Booked by another path meanwhile (e.g. after the lock expired)
+                await db.rollback()
+                return None
             
             return booking
             
         finally:
-            # Always release the lock
-            self.redis.delete(lock_key)
+            # Always release the locks
+            await self._unlock(keys=lock_keys, args=[token])
 
-    def get_user_bookings(self, db: Session, user_id: str):
+    async def get_user_bookings(self, db: AsyncSession, user_id: str) -> List[Booking]:
         """Get all bookings for a user"""
-        return db.query(Booking).filter(Booking.user_id == user_id).all()
+        result = await db.scalars(select(Booking).where(Booking.user_id == user_id))
+        bookings = {booking.id: booking for booking in result}
+        if self.reservations is not None:
+            # Reservations not written yet are newer than their DB rows
+            bookings.update(await self.reservations.pending(user_id))
+        return list(bookings.values())
 
-    def cancel_booking(self, db: Session, booking_id: str, user_id: str) -> bool:
+    async def cancel_booking(self, db: AsyncSession, booking_id: str, user_id: str) -> bool:
         """Cancel a booking"""
-        booking = db.query(Booking).filter(
-            Booking.id == booking_id,
-            Booking.user_id == user_id
-        ).first()
+        if self.reservations is not None:
+            cancelled = await self.reservations.cancel_pending(booking_id, user_id)
+            if cancelled is not None:
+                return cancelled
+        
+        booking = await db.scalar(
+            select(Booking).where(
+                Booking.id == booking_id,
+                Booking.user_id == user_id
+            )
+        )
         
         if not booking:
             return False
         
         booking.status = "cancelled"
-        db.commit()
+        await db.execute(delete(BookingSlot).where(BookingSlot.booking_id == booking.id))
+        if self.strategy == "optimistic":
+            await self._hand_over_slot_rows(db, booking)
+        await db.commit()
+        if self.reservations is not None:
+            await self.reservations.release(booking)
         return True
@@ -0,0 +1,403 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, InterfaceError, OperationalError
+from app.models.database import (
+    BOOKING_BUCKET_MINUTES, BOOKING_MAX_DURATION_MINUTES, Booking, SessionLocal, naive_utc, slot_buckets, slot_end
+)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BOOKING_WRITER_BATCH_SIZE = int(os.getenv("BOOKING_WRITER_BATCH_SIZE", 500))
+BOOKING_WRITER_INTERVAL_MS = int(os.getenv("BOOKING_WRITER_INTERVAL_MS", 100))
+BOOKING_WRITER_CLAIM_IDLE_MS = int(os.getenv("BOOKING_WRITER_CLAIM_IDLE_MS", 30000))
+BOOKING_WRITER_MAX_DELIVERIES = int(os.getenv("BOOKING_WRITER_MAX_DELIVERIES", 5))
+
+PENDING_KEY = "booking:pending"
+STREAM_KEY = "booking:stream"
+WRITER_GROUP = "booking-writers"
+DEAD_LETTER_KEY = "booking:dead-letter"
+
+# The database is unavailable: retry the batch later instead of blaming its records
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+# Slot claims live in one hash per analyst and time bucket: booking id -> "start:end"
+# (epoch seconds). A booking is claimed in every bucket it touches.
+
+# Check the buckets for an overlapping claim; if there is none claim them all,
+# keep the record until it is persisted and queue it for the writer.
+# KEYS: pending, stream, buckets...  ARGV: id, record, start, end, bucket expiries...
+RESERVE_SCRIPT = """
+local start, finish = tonumber(ARGV[3]), tonumber(ARGV[4])
+for i = 3, #KEYS do
+    for _, span in ipairs(redis.call("hvals", KEYS[i])) do
+        local sep = string.find(span, ":", 1, true)
+        if tonumber(string.sub(span, 1, sep - 1)) < finish and start < tonumber(string.sub(span, sep + 1)) then
+            return 0
+        end
+    end
+end
+for i = 3, #KEYS do
+    redis.call("hset", KEYS[i], ARGV[1], ARGV[3] .. ":" .. ARGV[4])
+    redis.call("expireat", KEYS[i], ARGV[i + 2])
+end
+redis.call("hset", KEYS[1], ARGV[1], ARGV[2])
+redis.call("xadd", KEYS[2], "*", "id", ARGV[1])
+return 1
+"""
+
+# Mark a not yet persisted booking cancelled and free its buckets
+# KEYS: pending, buckets...  ARGV: id, user id
+CANCEL_SCRIPT = """
+local raw = redis.call("hget", KEYS[1], ARGV[1])
+if not raw then
+    return -1
+end
+local record = cjson.decode(raw)
+if record["user_id"] ~= ARGV[2] then
+    return 0
+end
+record["status"] = "cancelled"
+redis.call("hset", KEYS[1], ARGV[1], cjson.encode(record))
+for i = 2, #KEYS do
+    redis.call("hdel", KEYS[i], ARGV[1])
+end
+return 1
+"""
+
+# Drop persisted records unless they changed meanwhile (then they are written again)
+SETTLE_SCRIPT = """
+local settled = 0
+for i = 2, #ARGV, 3 do
+    local raw = redis.call("hget", KEYS[1], ARGV[i])
+    if not raw or raw == ARGV[i + 1] then
+        redis.call("hdel", KEYS[1], ARGV[i])
+        redis.call("xack", KEYS[2], ARGV[1], ARGV[i + 2])
+        redis.call("xdel", KEYS[2], ARGV[i + 2])
+        settled = settled + 1
+    end
+end
+return settled
+"""
+
+
+def bucket_key(analyst_id: str, bucket: datetime) -> str:
+    return f"booking:slots:{analyst_id}:{bucket.isoformat()}"
+
+
+def bucket_claims(booking: Booking) -> Dict[str, int]:
+    """Bucket keys the booking is claimed in, with the time each can expire"""
+    return {
+        bucket_key(booking.analyst_id, bucket): claim_expiry(bucket, BOOKING_BUCKET_MINUTES + BOOKING_MAX_DURATION_MINUTES)
+        for bucket in slot_buckets(booking.slot_time, booking.duration_minutes or 0)
+    }
+
+
+def epoch(moment: datetime) -> int:
+    """Seconds since the epoch; naive datetimes are UTC like the stored slot times"""
+    if moment.tzinfo is not None:
+        return int(moment.timestamp())
+    return int((moment - datetime(1970, 1, 1)).total_seconds())
+
+
+def to_record(booking: Booking) -> str:
+    return json.dumps({
+        "id": booking.id,
+        "user_id": booking.user_id,
+        "analyst_id": booking.analyst_id,
+        "slot_time": booking.slot_time.isoformat(),
+        "duration_minutes": booking.duration_minutes,
+        "status": booking.status,
+        "created_at": booking.created_at.isoformat()
+    })
+
+
+def from_record(raw) -> Booking:
+    record = json.loads(raw)
+    record["slot_time"] = datetime.fromisoformat(record["slot_time"])
+    record["created_at"] = datetime.fromisoformat(record["created_at"])
+    return Booking(**record)
+
+
+def claim_expiry(slot_time: datetime, duration_minutes: int) -> int:
+    """
+    Unix time a claim can be dropped: an hour after the slot ends. A bucket
+    outlives every booking that touches it (bucket end plus the longest booking).
+    """
+    return max(epoch(slot_end(slot_time, duration_minutes + 60)), int(time.time()) + 3600)
+
+
+class ReservationStore:
+    """
+    Slot reservations decided in Redis.
+
+    One Lua script checks the time buckets the booking covers for an
+    overlapping claim, claims them, stores the booking record and queues it
+    for persistence in a single round trip, so a contended slot costs one
+    Redis call per attempt and no DB work on the request path. Records stay
+    in the pending hash until the writer has saved them.
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+        self._reserve = redis.register_script(RESERVE_SCRIPT)
+        self._cancel = redis.register_script(CANCEL_SCRIPT)
+
+    async def reserve(self, user_id: str, analyst_id: str, slot_time: datetime, duration_minutes: int = 30) -> Optional[Booking]:
+        slot_time = naive_utc(slot_time)
+        booking = Booking(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            analyst_id=analyst_id,
+            slot_time=slot_time,
+            duration_minutes=duration_minutes,
+            status="confirmed",
+            created_at=datetime.utcnow()
+        )
+        claims = bucket_claims(booking)
+        claimed = await self._reserve(
+            keys=[PENDING_KEY, STREAM_KEY, *claims],
+            args=[
+                booking.id, to_record(booking),
+                epoch(slot_time), epoch(slot_end(slot_time, duration_minutes)),
+                *claims.values()
+            ]
+        )
+        return booking if claimed else None
+
+    async def pending(self, user_id: Optional[str] = None) -> Dict[str, Booking]:
+        """Reserved bookings not persisted yet (optionally only ``user_id``'s)"""
+        bookings = {}
+        for raw in (await self.redis.hgetall(PENDING_KEY)).values():
+            booking = from_record(raw)
+            if user_id is None or booking.user_id == user_id:
+                bookings[booking.id] = booking
+        return bookings
+
+    async def cancel_pending(self, booking_id: str, user_id: str) -> Optional[bool]:
+        """Cancel a not yet persisted booking; None if it is not pending"""
+        raw = await self.redis.hget(PENDING_KEY, booking_id)
+        if raw is None:
+            return None
+        booking = from_record(raw)
+        cancelled = await self._cancel(keys=[PENDING_KEY, *bucket_claims(booking)], args=[booking_id, user_id])
+        return None if cancelled == -1 else bool(cancelled)
+
+    async def release(self, booking: Booking):
+        """Free the buckets of a persisted booking that was cancelled"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in bucket_claims(booking):
+                pipe.hdel(key, booking.id)
+            await pipe.execute()
+
+    async def restore_claims(self, sessions=SessionLocal) -> int:
+        """
+        Re-claim buckets of upcoming bookings saved in the DB, e.g. after
+        Redis lost its data. Existing claims are left alone.
+        """
+        async with sessions() as db:
+            bookings = await db.scalars(
+                select(Booking).where(
+                    Booking.status != "cancelled",
+                    Booking.slot_time >= datetime.utcnow() - timedelta(days=1)
+                )
+            )
+            restored = 0
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for booking in bookings:
+                    span = f"{epoch(booking.slot_time)}:{epoch(slot_end(booking.slot_time, booking.duration_minutes or 0))}"
+                    for key, expires in bucket_claims(booking).items():
+                        pipe.hsetnx(key, booking.id, span)
+                        pipe.expireat(key, expires)
+                restored = sum(1 for claimed in (await pipe.execute())[::2] if claimed)
+        return restored
+
+
+class WriteBehindWriter:
+    """
+    Persists reserved bookings to the bookings table in batches.
+
+    Every worker reads the reservation stream in one consumer group, so a
+    booking is written by one of them. Entries are acknowledged only after
+    the batch is committed; on start, and periodically, entries left
+    unacknowledged by a crashed worker are claimed and written again.
+    Writes are idempotent (keyed by booking id) and a record changed while
+    being written (cancelled) is written again.
+
+    A record that fails to write for a reason other than the database being
+    unavailable is retried on later batches, without holding up new entries;
+    after ``max_deliveries`` failures it is moved to the dead-letter stream.
+    """
+
+    def __init__(
+        self,
+        redis,
+        sessions=SessionLocal,
+        batch_size: int = BOOKING_WRITER_BATCH_SIZE,
+        interval_ms: int = BOOKING_WRITER_INTERVAL_MS,
+        claim_idle_ms: int = BOOKING_WRITER_CLAIM_IDLE_MS,
+        max_deliveries: int = BOOKING_WRITER_MAX_DELIVERIES,
+        consumer: Optional[str] = None
+    ):
+        self.redis = redis
+        self.sessions = sessions
+        self.batch_size = batch_size
+        self.interval_ms = interval_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.written = 0
+        self.batches = 0
+        self.dead_lettered = 0
+        self._failures: Dict[bytes, int] = {}
+        self._settle = redis.register_script(SETTLE_SCRIPT)
+        self._last_claim = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def setup(self):
+        try:
+            await self.redis.xgroup_create(STREAM_KEY, WRITER_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def start(self):
+        await self.setup()
+        await self.claim_abandoned()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Persist what this worker already took off the stream
+        try:
+            while await self.drain_once():
+                pass
+        except Exception:
+            logger.exception("Booking writer could not drain on shutdown")
+
+    async def claim_abandoned(self) -> int:
+        """Take over entries other (crashed) workers read but never acknowledged"""
+        self._last_claim = time.monotonic()
+        claimed, start = 0, "0-0"
+        while True:
+            result = await self.redis.xautoclaim(
+                STREAM_KEY, WRITER_GROUP, self.consumer,
+                min_idle_time=self.claim_idle_ms, start_id=start, count=self.batch_size
+            )
+            start, entries = result[0], result[1]
+            claimed += len(entries)
+            if start in (b"0-0", "0-0"):
+                return claimed
+
+    async def drain_once(self, block: Optional[int] = None) -> int:
+        """Write one batch: this worker's unacknowledged entries plus new ones"""
+        backlog = await self._read("0")
+        entries = backlog + await self._read(">", None if backlog else block)
+        if entries:
+            await self._persist(entries)
+        return len(entries)
+
+    async def _read(self, start: str, block: Optional[int] = None) -> List[tuple]:
+        response = await self.redis.xreadgroup(
+            WRITER_GROUP, self.consumer, {STREAM_KEY: start}, count=self.batch_size, block=block
+        )
+        return response[0][1] if response else []
+
+    async def _persist(self, entries: List[tuple]):
+        # Entries deleted from the stream come back without fields; they are only acknowledged
+        ids = [fields[b"id"].decode() if fields else "" for _, fields in entries]
+        raws = await self.redis.hmget(PENDING_KEY, ids)
+        records = {booking_id: raw for booking_id, raw in zip(ids, raws) if raw is not None}
+
+        failed: Dict[str, Exception] = {}
+        if records:
+            try:
+                await self._write(records)
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception:
+                # Isolate the records that cannot be written
+                for booking_id, raw in records.items():
+                    try:
+                        await self._write_one(booking_id, raw)
+                    except TRANSIENT_ERRORS:
+                        raise
+                    except Exception as e:
+                        failed[booking_id] = e
+
+        args = [WRITER_GROUP]
+        for (entry_id, _), booking_id, raw in zip(entries, ids, raws):
+            if booking_id in failed:
+                deliveries = self._failures[entry_id] = self._failures.get(entry_id, 0) + 1
+                if deliveries < self.max_deliveries:
+                    logger.warning("Booking %s not written (attempt %d): %s", booking_id, deliveries, failed[booking_id])
+                    continue
+                await self._dead_letter(entry_id, booking_id, raw, failed[booking_id])
+            self._failures.pop(entry_id, None)
+            args += [booking_id, raw if raw is not None else "", entry_id]
+        if len(args) > 1:
+            await self._settle(keys=[PENDING_KEY, STREAM_KEY], args=args)
+        self.written += len(records) - len(failed)
+        self.batches += 1
+
+    async def _write_one(self, booking_id: str, raw: bytes):
+        try:
+            await self._write({booking_id: raw})
+        except IntegrityError:
+            # A slot claim was lost (e.g. Redis data loss)
+            logger.warning("Booking %s conflicts with an active booking; stored as cancelled", booking_id)
+            await self._write({booking_id: raw}, status="cancelled")
+
+    async def _dead_letter(self, entry_id: bytes, booking_id: str, raw: bytes, error: Exception):
+        """Park a record that keeps failing; its slot claims stay until it is resolved"""
+        logger.error(
+            "Booking %s failed %d writes, moved to %s: %r", booking_id, self.max_deliveries, DEAD_LETTER_KEY, error
+        )
+        await self.redis.xadd(
+            DEAD_LETTER_KEY, {"id": booking_id, "record": raw, "entry": entry_id, "error": repr(error)}
+        )
+        self.dead_lettered += 1
+
+    async def _write(self, records: Dict[str, bytes], status: Optional[str] = None):
+        async with self.sessions() as db:
+            existing = {
+                booking.id: booking
+                for booking in await db.scalars(select(Booking).where(Booking.id.in_(list(records))))
+            }
+            for booking_id, raw in records.items():
+                booking = from_record(raw)
+                booking.status = status or booking.status
+                if booking_id in existing:
+                    existing[booking_id].status = booking.status
+                else:
+                    db.add(booking)
+            await db.commit()
+
+    async def _loop(self):
+        while True:
+            try:
+                if time.monotonic() - self._last_claim > self.claim_idle_ms / 1000:
+                    await self.claim_abandoned()
+                await self.drain_once(block=self.interval_ms)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Booking writer batch failed")
+                await asyncio.sleep(self.interval_ms / 1000)
@@ -0,0 +1,34 @@
+"""
+Shared fixtures for Booking Service tests
+"""
+import asyncio
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models.database import Base
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    """Session factory for a fresh SQLite database with the tables created"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bookings.db'}")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeAsyncRedis()
+
+
+@pytest.fixture
+def lua_redis(fake_redis):
+    """Fake Redis that can run Lua scripts (needs lupa)"""
+    pytest.importorskip("lupa")
+    return fake_redis
@@ -1,17 +1,30 @@
 """
 Tests for Booking Service
 """
+import asyncio
 import pytest
+from datetime import datetime, timedelta, timezone
 from fastapi.testclient import TestClient
+from app import benchmark
 from app.main import app
+from app.models.database import Booking, insert_slot_rows, insert_unless_slot_taken, slot_buckets
+from app.services.booking import BookingService
+from app.services.reservations import WriteBehindWriter
 
-client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Client running the app lifespan (table creation, connection cleanup)"""
+    # Failures without a reachable Redis surface as 500 responses
+    with TestClient(app, raise_server_exceptions=False) as client:
+        yield client
 
 
 class TestHealthEndpoint:
     """Tests for health check endpoint"""
     
-    def test_health_check(self):
+    def test_health_check(self, client):
         """Test that health endpoint returns OK"""
         response = client.get("/api/booking/health")
         assert response.status_code == 200
@@ -23,7 +36,7 @@ class TestHealthEndpoint:
 class TestBookingEndpoints:
     """Tests for booking endpoints"""
     
-    def test_create_booking(self):
+    def test_create_booking(self, client):
         """Test creating a new booking"""
         booking_data = {
             "user_id": "test-user-123",
@@ -36,13 +49,13 @@ class TestBookingEndpoints:
         # May succeed or fail based on DB state
         assert response.status_code in [200, 201, 409, 500]
     
-    def test_get_user_bookings(self):
+    def test_get_user_bookings(self, client):
         """Test getting bookings for a user"""
         response = client.get("/api/booking/my-bookings?user_id=test-user-123")
         assert response.status_code == 200
         assert isinstance(response.json(), list)
     
-    def test_cancel_booking_not_found(self):
+    def test_cancel_booking_not_found(self, client):
         """Test canceling a non-existent booking"""
         response = client.delete(
             "/api/booking/non-existent-id?user_id=test-user"
@@ -53,10 +66,341 @@ class TestBookingEndpoints:
 class TestRootEndpoint:
     """Tests for root endpoint"""
     
-    def test_root(self):
+    def test_root(self, client):
         """Test root endpoint returns service info"""
         response = client.get("/")
         assert response.status_code == 200
         data = response.json()
         assert "message" in data
         assert "MarketHub" in data["message"]
+
+
+class TestConcurrentBooking:
+    """Tests for many users booking the same slot at once"""
+    
+    def test_one_booking_per_slot(self, sessions, lua_redis):
+        """Only one of many concurrent attempts gets the slot"""
+        service = BookingService(lua_redis)
+        slot_time = datetime(2025, 12, 30, 10, 0)
+        
+        async def attempt(user):
+            async with sessions() as db:
+                return await service.book_slot(db, f"user-{user}", "analyst-1", slot_time)
+        
+        async def run():
+            first = await asyncio.gather(*(attempt(user) for user in range(50)))
+            second = await asyncio.gather(*(attempt(user) for user in range(50, 60)))
+            async with sessions() as db:
+                stored = await service.get_user_bookings(db, next(b for b in first if b).user_id)
+            return first, second, stored
+        
+        first, second, stored = asyncio.run(run())
+        assert sum(booking is not None for booking in first) == 1
+        assert all(booking is None for booking in second)
+        assert stored[0].status == "confirmed"
+        assert stored[0].created_at is not None
+    
+    def test_cancelled_slot_can_be_rebooked(self, sessions, lua_redis):
+        """Cancelling frees the slot"""
+        service = BookingService(lua_redis)
+        slot_time = datetime(2025, 12, 30, 11, 0)
+        
+        async def run():
+            async with sessions() as db:
+                booking = await service.book_slot(db, "user-1", "analyst-1", slot_time)
+                assert await service.cancel_booking(db, booking.id, "user-1")
+                return await service.book_slot(db, "user-2", "analyst-1", slot_time)
+        
+        assert asyncio.run(run()).user_id == "user-2"
+
+
+class TestReserveStrategy:
+    """Tests for Lua reservations persisted by the write-behind writer"""
+    
+    slot_time = datetime(2030, 1, 15, 10, 0)
+    
+    def test_reservation_is_atomic_and_written_behind(self, sessions, lua_redis):
+        """One reservation wins; it is readable before and after it is persisted"""
+        service = BookingService(lua_redis, strategy="reserve", sessions=sessions)
+        
+        async def run():
+            await service.writer.setup()
+            async with sessions() as db:
+                results = await asyncio.gather(*(
+                    service.book_slot(db, f"user-{user}", "analyst-1", self.slot_time) for user in range(100)
+                ))
+                winner = next(booking for booking in results if booking)
+                pending = await service.get_user_bookings(db, winner.user_id)
+                assert await db.get(Booking, winner.id) is None
+            
+            assert await service.writer.drain_once() == 1
+            async with sessions() as db:
+                stored = await db.get(Booking, winner.id)
+                persisted = await service.get_user_bookings(db, winner.user_id)
+            assert await lua_redis.hlen("booking:pending") == 0
+            return results, pending, stored, persisted
+        
+        results, pending, stored, persisted = asyncio.run(run())
+        assert sum(booking is not None for booking in results) == 1
+        assert [booking.id for booking in pending] == [stored.id] == [booking.id for booking in persisted]
+        assert stored.status == "confirmed"
+    
+    def test_cancel_before_and_after_persisting(self, sessions, lua_redis):
+        """Cancelling frees the slot whether or not the booking was written yet"""
+        service = BookingService(lua_redis, strategy="reserve", sessions=sessions)
+        
+        async def run():
+            await service.writer.setup()
+            async with sessions() as db:
+                first = await service.book_slot(db, "user-1", "analyst-1", self.slot_time)
+                assert await service.cancel_booking(db, first.id, "user-1")
+                second = await service.book_slot(db, "user-2", "analyst-1", self.slot_time)
+                await service.writer.drain_once()
+                assert await service.cancel_booking(db, second.id, "user-2")
+                third = await service.book_slot(db, "user-3", "analyst-1", self.slot_time)
+                await service.writer.drain_once()
+            async with sessions() as db:
+                return [(await db.get(Booking, booking.id)).status for booking in (first, second, third)]
+        
+        assert asyncio.run(run()) == ["cancelled", "cancelled", "confirmed"]
+    
+    def test_restart_reconciliation(self, sessions, lua_redis):
+        """Entries a crashed worker took are written; lost slot claims are restored"""
+        crashed = WriteBehindWriter(lua_redis, sessions, consumer="crashed")
+        service = BookingService(lua_redis, strategy="reserve", sessions=sessions)
+        service.writer = WriteBehindWriter(lua_redis, sessions, consumer="restarted", claim_idle_ms=0)
+        
+        async def run():
+            await crashed.setup()
+            async with sessions() as db:
+                booking = await service.book_slot(db, "user-1", "analyst-1", self.slot_time)
+            assert len(await crashed._read(">")) == 1
+            
+            await service.start()
+            assert await service.writer.drain_once() == 1
+            await service.stop()
+            
+            # Redis lost its data: the slot is claimed again from the DB
+            await lua_redis.flushall()
+            await service.start()
+            await service.stop()
+            async with sessions() as db:
+                stored = await db.get(Booking, booking.id)
+                again = await service.book_slot(db, "user-2", "analyst-1", self.slot_time)
+            return stored, again
+        
+        stored, again = asyncio.run(run())
+        assert stored.status == "confirmed"
+        assert again is None
+    
+    def test_failing_record_is_dead_lettered(self, sessions, lua_redis):
+        """A record that cannot be written does not hold up the ones after it"""
+        service = BookingService(lua_redis, strategy="reserve", sessions=sessions)
+        service.writer = WriteBehindWriter(lua_redis, sessions, max_deliveries=2)
+        
+        async def run():
+            await service.writer.setup()
+            await lua_redis.hset("booking:pending", "poison", '{"id": "poison", "slot_time": "not a date"}')
+            await lua_redis.xadd("booking:stream", {"id": "poison"})
+            async with sessions() as db:
+                booking = await service.book_slot(db, "user-1", "analyst-1", self.slot_time)
+            
+            await service.writer.drain_once()
+            async with sessions() as db:
+                stored = await db.get(Booking, booking.id)
+            assert await lua_redis.hkeys("booking:pending") == [b"poison"]
+            
+            await service.writer.drain_once()
+            dead = await lua_redis.xrange("booking:dead-letter")
+            return stored, dead, await lua_redis.hlen("booking:pending"), await lua_redis.xlen("booking:stream")
+        
+        stored, dead, pending, stream = asyncio.run(run())
+        assert stored.status == "confirmed"
+        assert [fields[b"id"] for _, fields in dead] == [b"poison"]
+        assert pending == stream == 0
+        assert service.writer.dead_lettered == 1
+    
+    def test_aware_slot_time_is_stored_as_utc(self, sessions, lua_redis):
+        service = BookingService(lua_redis, strategy="reserve", sessions=sessions)
+        slot_time = self.slot_time.replace(tzinfo=timezone(timedelta(hours=2)))
+        
+        async def run():
+            await service.writer.setup()
+            async with sessions() as db:
+                booking = await service.book_slot(db, "user-1", "analyst-1", slot_time)
+            await service.writer.drain_once()
+            async with sessions() as db:
+                return await db.get(Booking, booking.id)
+        
+        assert asyncio.run(run()).slot_time == datetime(2030, 1, 15, 8, 0)
+    
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            BookingService(strategy="pessimistic")
+
+
+class TestOptimisticStrategy:
+    """Tests for booking through the active slot unique index"""
+    
+    slot_time = datetime(2030, 1, 15, 10, 0)
+    
+    def test_one_booking_per_slot_without_redis(self, sessions):
+        """The index admits one of many concurrent inserts"""
+        service = BookingService(strategy="optimistic", sessions=sessions)
+        
+        async def attempt(user):
+            async with sessions() as db:
+                return await service.book_slot(db, f"user-{user}", "analyst-1", self.slot_time)
+        
+        async def run():
+            return await asyncio.gather(*(attempt(user) for user in range(50)))
+        
+        results = asyncio.run(run())
+        assert sum(booking is not None for booking in results) == 1
+    
+    def test_cancelled_rows_do_not_block_the_slot(self, sessions):
+        service = BookingService(strategy="optimistic", sessions=sessions)
+        
+        async def run():
+            async with sessions() as db:
+                first = await service.book_slot(db, "user-1", "analyst-1", self.slot_time)
+                other_analyst = await service.book_slot(db, "user-1", "analyst-2", self.slot_time)
+                assert await service.book_slot(db, "user-2", "analyst-1", self.slot_time) is None
+                assert await service.cancel_booking(db, first.id, "user-1")
+                second = await service.book_slot(db, "user-2", "analyst-1", self.slot_time)
+                return other_analyst, second
+        
+        other_analyst, second = asyncio.run(run())
+        assert other_analyst is not None
+        assert second.user_id == "user-2"
+    
+    def test_unsupported_dialect(self):
+        with pytest.raises(ValueError):
+            insert_unless_slot_taken("mysql", {})
+        with pytest.raises(ValueError):
+            insert_slot_rows("mysql", [])
+    
+    def test_benchmark(self, sessions):
+        """The contention benchmark books each slot once"""
+        result = asyncio.run(benchmark.run("optimistic", users=40, slots=4, sessions=sessions))
+        assert result["booked"] == 4
+        assert result["errors"] == 0
+
+
+@pytest.fixture(params=["lock", "reserve", "optimistic"])
+def any_strategy(request, sessions):
+    """A booking service for each strategy"""
+    if request.param == "optimistic":
+        return BookingService(strategy="optimistic", sessions=sessions)
+    return BookingService(request.getfixturevalue("lua_redis"), strategy=request.param, sessions=sessions)
+
+
+class TestOverlappingBookings:
+    """Tests for conflicts between bookings of different durations"""
+    
+    def book(self, service, sessions, *requests):
+        async def run():
+            if service.writer is not None:
+                await service.writer.setup()
+            async with sessions() as db:
+                return [
+                    await service.book_slot(db, f"user-{i}", "analyst-1", datetime(2030, 1, 15, *start), minutes)
+                    for i, (start, minutes) in enumerate(requests)
+                ]
+        return asyncio.run(run())
+    
+    def test_overlap_honors_duration(self, any_strategy, sessions):
+        """A 60-minute booking at 10:00 blocks 10:30 but not 11:00 or 9:30"""
+        results = self.book(
+            any_strategy, sessions,
+            ((10, 0), 60), ((10, 30), 30), ((9, 45), 30), ((11, 0), 30), ((9, 30), 30)
+        )
+        assert [booking is not None for booking in results] == [True, False, False, True, True]
+    
+    def test_off_grid_neighbours(self, any_strategy, sessions):
+        """Bookings sharing a bucket without overlapping are both accepted"""
+        results = self.book(
+            any_strategy, sessions,
+            ((9, 50), 20), ((10, 10), 30), ((10, 5), 10), ((10, 40), 5)
+        )
+        assert [booking is not None for booking in results] == [True, True, False, True]
+    
+    def test_cancelled_neighbour_hands_over_its_bucket(self, any_strategy, sessions):
+        async def run():
+            if any_strategy.writer is not None:
+                await any_strategy.writer.setup()
+            async with sessions() as db:
+                first = await any_strategy.book_slot(db, "user-1", "analyst-1", datetime(2030, 1, 15, 9, 50), 20)
+                await any_strategy.book_slot(db, "user-2", "analyst-1", datetime(2030, 1, 15, 10, 10), 30)
+                assert await any_strategy.cancel_booking(db, first.id, "user-1")
+                overlapping = await any_strategy.book_slot(db, "user-3", "analyst-1", datetime(2030, 1, 15, 10, 5), 10)
+                free = await any_strategy.book_slot(db, "user-4", "analyst-1", datetime(2030, 1, 15, 9, 55), 15)
+                return overlapping, free
+        
+        overlapping, free = asyncio.run(run())
+        assert overlapping is None
+        assert free is not None
+    
+    def test_aware_slot_times_are_compared_in_utc(self, any_strategy, sessions):
+        """10:00+02:00 for an hour blocks 08:30Z"""
+        async def run():
+            if any_strategy.writer is not None:
+                await any_strategy.writer.setup()
+            async with sessions() as db:
+                first = await any_strategy.book_slot(
+                    db, "user-1", "analyst-1", datetime(2030, 1, 15, 10, tzinfo=timezone(timedelta(hours=2))), 60
+                )
+                second = await any_strategy.book_slot(
+                    db, "user-2", "analyst-1", datetime(2030, 1, 15, 8, 30, tzinfo=timezone.utc), 30
+                )
+            return first, second
+        
+        first, second = asyncio.run(run())
+        assert first.slot_time == datetime(2030, 1, 15, 8, 0)
+        assert second is None
+    
+    def test_concurrent_overlapping_attempts(self, any_strategy, sessions):
+        """Of overlapping bookings with different start times, one wins"""
+        async def run():
+            if any_strategy.writer is not None:
+                await any_strategy.writer.setup()
+            
+            async def attempt(user, start, minutes):
+                async with sessions() as db:
+                    slot_time = datetime(2030, 1, 15, *start)
+                    return await any_strategy.book_slot(db, f"user-{user}", "analyst-1", slot_time, minutes)
+            
+            return await asyncio.gather(*(
+                attempt(user, start, minutes)
+                for user in range(10)
+                for start, minutes in (((10, 0), 60), ((10, 30), 30), ((10, 45), 60))
+            ))
+        
+        results = asyncio.run(run())
+        assert sum(booking is not None for booking in results) == 1
+    
+    def test_cancelling_frees_the_range(self, any_strategy, sessions):
+        async def run():
+            if any_strategy.writer is not None:
+                await any_strategy.writer.setup()
+            async with sessions() as db:
+                first = await any_strategy.book_slot(db, "user-1", "analyst-1", datetime(2030, 1, 15, 10), 90)
+                assert await any_strategy.cancel_booking(db, first.id, "user-1")
+                return await any_strategy.book_slot(db, "user-2", "analyst-1", datetime(2030, 1, 15, 10, 30), 30)
+        
+        assert asyncio.run(run()) is not None
+    
+    def test_buckets(self):
+        assert slot_buckets(datetime(2030, 1, 15, 10, 7), 30, minutes=15) == [
+            datetime(2030, 1, 15, 10, 0), datetime(2030, 1, 15, 10, 15), datetime(2030, 1, 15, 10, 30)
+        ]
+        assert slot_buckets(datetime(2030, 1, 15, 10, 30), 30, minutes=15) == [
+            datetime(2030, 1, 15, 10, 30), datetime(2030, 1, 15, 10, 45)
+        ]
+    
+    def test_duration_is_validated(self, client):
+        response = client.post("/api/booking/book", json={
+            "user_id": "user-1", "analyst_id": "analyst-1",
+            "slot_time": "2030-01-15T10:00:00", "duration_minutes": 0
+        })
+        assert response.status_code == 422
@@ -1,15 +1,207 @@
 """
 Predictions API endpoints
 """
-from fastapi import APIRouter, HTTPException
-from app.models.predictor import predictor
+import asyncio
+import logging
+import os
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.models.indicator_state import INDICATOR_FIELDS
+from app.models.predictor import predictor, CANDLE_HISTORY_SIZE, TIMEFRAMES
+from app.schemas.predictions import BatchPredictionRequest
+from app.services.responses import EncodedResponse, ResponseCache, dumps, encoded_response
+from app.services.scheduler import PrecomputeScheduler
+from app.services.stream import PredictionStream, sse_events
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 SUPPORTED_SYMBOLS = ["BTC", "ETH", "SOL", "BNB", "ADA", "XRP", "DOT", "AVAX"]
+INDICATOR_SELECTION = list(INDICATOR_FIELDS) + ["recommendation"]
+
+# Fan-out limits for multi-symbol endpoints
+PREDICTION_CONCURRENCY = int(os.getenv("PREDICTION_CONCURRENCY", 8))
+PREDICTION_TIMEOUT = float(os.getenv("PREDICTION_TIMEOUT", 10))
+
+# Return windows (in hourly candles) for /correlations when none are requested
+CORRELATION_WINDOWS = [int(w) for w in os.getenv("CORRELATION_WINDOWS", "24,168,336").split(",")]
+
+# Encoded bodies of cached results, so cache hits skip JSON encoding
+responses = ResponseCache()
+
+# Pushes snapshots to streaming clients instead of having them poll
+stream = PredictionStream(predictor)
+
+# Warms the prediction cache for every symbol just after each candle closes
+scheduler = PrecomputeScheduler(
+    predictor,
+    SUPPORTED_SYMBOLS,
+    concurrency=PREDICTION_CONCURRENCY,
+    on_result=stream.candle_closed
+)
+
+def _parse_symbols(symbols: Optional[str]) -> List[str]:
+    """Parse ?symbols=BTC,ETH (all supported symbols when omitted)"""
+    if not symbols:
+        return list(SUPPORTED_SYMBOLS)
+    selected = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    unsupported = [symbol for symbol in selected if symbol not in SUPPORTED_SYMBOLS]
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Symbols {unsupported} not supported. Available: {SUPPORTED_SYMBOLS}"
+        )
+    return selected
+
+async def _predict_isolated(symbol: str, semaphore: asyncio.Semaphore) -> dict:
+    """Predict one symbol, turning timeouts and failures into an error entry"""
+    async with semaphore:
+        try:
+            return await asyncio.wait_for(predictor.predict(symbol), PREDICTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            return {
+                "symbol": symbol,
+                "error": f"Prediction timed out after {PREDICTION_TIMEOUT}s"
+            }
+        except Exception as e:
+            return {
+                "symbol": symbol,
+                "error": str(e)
+            }
+
+@router.get("/scheduler/status")
+async def get_scheduler_status():
+    """Get the state of the background precompute scheduler"""
+    return scheduler.status()
+
+@router.get("/stream")
+async def stream_predictions(request: Request, symbols: Optional[str] = None):
+    """
+    Server-sent events with a prediction snapshot whenever a candle closes
+    or a value changes beyond the configured threshold.
+    Use ?symbols=BTC,ETH to subscribe to a subset.
+    """
+    subscription = stream.subscribe(_parse_symbols(symbols))
+    return StreamingResponse(
+        sse_events(stream, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws")
+async def stream_predictions_ws(websocket: WebSocket, symbols: Optional[str] = None):
+    """WebSocket variant of /stream: one JSON message per pushed snapshot"""
+    try:
+        selected = _parse_symbols(symbols)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    
+    await websocket.accept()
+    subscription = stream.subscribe(selected)
+    
+    async def forward():
+        while True:
+            await websocket.send_text(await subscription.get())
+    
+    # Pushes run in the background; receiving notices the client leaving
+    sender = asyncio.ensure_future(forward())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream.unsubscribe(subscription)
+        sender.cancel()
+        try:
+            await sender
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning("WebSocket push to a client failed: %s", e)
+
+@router.get("/correlations")
+async def get_correlations(request: Request, windows: Optional[str] = None, symbols: Optional[str] = None):
+    """
+    Get rolling return correlation and covariance matrices across symbols.
+    Use ?windows=24,168 (hourly returns) and ?symbols=BTC,ETH to narrow it.
+    """
+    selected = _parse_symbols(symbols)
+    if len(selected) < 2:
+        raise HTTPException(status_code=400, detail="At least two symbols are required")
+    
+    try:
+        sizes = sorted({int(w) for w in windows.split(",") if w.strip()}) if windows else CORRELATION_WINDOWS
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Windows must be comma-separated integers")
+    # Returns between the closed candles of the stored window
+    longest = CANDLE_HISTORY_SIZE - 2
+    invalid = [w for w in sizes if not 2 <= w <= longest]
+    if invalid or not sizes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid windows {invalid}. Windows must be between 2 and {longest} returns"
+        )
+    
+    result = await predictor.correlations(selected, sizes, concurrency=PREDICTION_CONCURRENCY)
+    if "error" in result:
+        raise HTTPException(status_code=503, detail=result["error"])
+    return encoded_response(request, responses.get(("correlations", tuple(selected), tuple(sizes)), result))
+
+@router.post("/batch")
+async def get_batch_predictions(request: BatchPredictionRequest, http_request: Request):
+    """
+    Get predictions for a list of cryptocurrencies in one call.
+    Optionally restrict the indicators and timeframes returned.
+    """
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in request.symbols))
+    unsupported = [symbol for symbol in symbols if symbol not in SUPPORTED_SYMBOLS]
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Symbols {unsupported} not supported. Available: {SUPPORTED_SYMBOLS}"
+        )
+    
+    timeframe_labels = [label for label, _, _ in TIMEFRAMES]
+    for name, selected, available in (
+        ("indicators", request.indicators, list(INDICATOR_FIELDS)),
+        ("timeframes", request.timeframes, timeframe_labels)
+    ):
+        unknown = [value for value in selected or [] if value not in available]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown {name} {unknown}. Available: {available}"
+            )
+    
+    results = await predictor.predict_batch(symbols, concurrency=PREDICTION_CONCURRENCY)
+    
+    predictions = []
+    for result in results:
+        if "error" in result or (request.indicators is None and request.timeframes is None):
+            predictions.append(responses.get(("prediction", result["symbol"]), result))
+            continue
+        # Cached results are shared, so filter into a copy
+        result = dict(result)
+        if request.indicators is not None:
+            result["indicators"] = {
+                name: value for name, value in result["indicators"].items()
+                if name in request.indicators
+            }
+        if request.timeframes is not None:
+            result["predictions"] = [
+                p for p in result["predictions"] if p["timeframe"] in request.timeframes
+            ]
+        predictions.append(EncodedResponse.encode(result))
+    
+    encoded = EncodedResponse.join(b'{"predictions":', predictions, b',"symbols":' + dumps(symbols) + b"}")
+    return encoded_response(http_request, encoded)
 
 @router.get("/{symbol}")
-async def get_prediction(symbol: str):
+async def get_prediction(symbol: str, request: Request):
     """Get AI-powered price prediction for a cryptocurrency"""
     symbol = symbol.upper()
     
@@ -20,41 +212,58 @@ async def get_prediction(symbol: str):
         )
     
     prediction = await predictor.predict(symbol)
-    return prediction
+    return encoded_response(request, responses.get(("prediction", symbol), prediction))
 
 @router.get("/")
-async def get_all_predictions():
+async def get_all_predictions(request: Request):
     """Get predictions for all supported cryptocurrencies"""
-    predictions = []
-    
-    for symbol in SUPPORTED_SYMBOLS:
-        try:
-            pred = await predictor.predict(symbol)
-            predictions.append(pred)
-        except Exception as e:
-            predictions.append({
-                "symbol": symbol,
-                "error": str(e)
-            })
+    # All symbols run concurrently, bounded by PREDICTION_CONCURRENCY
+    semaphore = asyncio.Semaphore(PREDICTION_CONCURRENCY)
+    predictions = await asyncio.gather(
+        *(_predict_isolated(symbol, semaphore) for symbol in SUPPORTED_SYMBOLS)
+    )
     
-    return {
-        "predictions": predictions,
-        "supported_symbols": SUPPORTED_SYMBOLS
-    }
+    # Cached predictions are spliced in already encoded
+    encoded = EncodedResponse.join(
+        b'{"predictions":',
+        (responses.get(("prediction", p["symbol"]), p) for p in predictions),
+        b',"supported_symbols":' + dumps(SUPPORTED_SYMBOLS) + b"}"
+    )
+    return encoded_response(request, encoded)
 
 @router.get("/{symbol}/indicators")
-async def get_indicators(symbol: str):
-    """Get technical indicators for a cryptocurrency"""
+async def get_indicators(symbol: str, request: Request, fields: Optional[str] = None):
+    """
+    Get technical indicators for a cryptocurrency.
+    Use ?fields=rsi,trend to request a subset.
+    """
     symbol = symbol.upper()
     
     if symbol not in SUPPORTED_SYMBOLS:
         raise HTTPException(status_code=400, detail=f"Symbol {symbol} not supported")
     
-    prediction = await predictor.predict(symbol)
+    selected = None
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in INDICATOR_SELECTION]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields {unknown}. Available: {INDICATOR_SELECTION}"
+            )
+    
+    result = await predictor.indicators(symbol, selected or None)
+    
+    def render(result: dict) -> dict:
+        response = {
+            "symbol": symbol,
+            "current_price": result.get("current_price"),
+            "indicators": result.get("indicators")
+        }
+        for key in ("recommendation", "error"):
+            if key in result:
+                response[key] = result[key]
+        return response
     
-    return {
-        "symbol": symbol,
-        "current_price": prediction.get("current_price"),
-        "indicators": prediction.get("indicators"),
-        "recommendation": prediction.get("recommendation")
-    }
+    key = ("indicators", symbol, ",".join(sorted(set(selected or []))))
+    return encoded_response(request, responses.get(key, result, render))
@@ -2,15 +2,43 @@
 MarketHub AI Prediction Service
 Provides ML-based cryptocurrency price predictions
 """
-from fastapi import FastAPI
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.api import predictions
+from app.models.predictor import predictor
+from app.services import metrics
 import os
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+loop_lag = metrics.LoopLagMonitor()
+metrics.register_service(predictor, responses=predictions.responses, stream=predictions.stream)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One market data source (pooled upstream session for HTTP) per worker
+    await predictor.start()
+    await predictions.scheduler.start()
+    await predictions.stream.start()
+    await loop_lag.start()
+    yield
+    await loop_lag.stop()
+    await predictions.stream.stop()
+    await predictions.scheduler.stop()
+    await predictor.close()
+
 app = FastAPI(
     title="MarketHub AI Prediction Service",
     description="Machine Learning based cryptocurrency price predictions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -22,6 +50,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, route.path if route is not None else "unmatched", str(status)
+        ).observe(time.perf_counter() - started)
+
 # Routes
 app.include_router(predictions.router, prefix="/api/predictions", tags=["predictions"])
 
@@ -32,7 +76,13 @@ def root():
         "version": "1.0.0",
         "endpoints": {
             "predictions": "/api/predictions/{symbol}",
-            "health": "/health"
+            "correlations": "/api/predictions/correlations",
+            "scheduler": "/api/predictions/scheduler/status",
+            "stream": "/api/predictions/stream",
+            "websocket": "/api/predictions/ws",
+            "health": "/health",
+            "stats": "/stats",
+            "metrics": "/metrics"
         }
     }
 
@@ -40,6 +90,22 @@ def root():
 def health():
     return {"status": "healthy", "service": "prediction-service"}
 
+@app.get("/stats")
+def stats():
+    return {
+        "cache": predictor.cache.stats(),
+        "executor": predictor.executor.stats(),
+        "responses": predictions.responses.stats(),
+        "shared_cache": predictor.shared.stats() if predictor.shared is not None else None,
+        "singleflight": predictor.singleflight.stats(),
+        "stream": predictions.stream.stats(),
+        "upstream": {**predictor.fetcher.stats(), "fallbacks": predictor.fallbacks}
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 3005))
@@ -0,0 +1,249 @@
+"""
+Columnar per-symbol candle store kept up to date by delta fetches
+"""
+import json
+import os
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer use only
+    fcntl = None
+
+FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+_ROW = {name: i for i, name in enumerate(FIELDS)}
+
+CANDLE_FILE_SUFFIXES = (".csv", ".json", ".npy", ".parquet")
+
+
+class CandleView:
+    """
+    Read-only OHLCV columns for one symbol, oldest first.
+    Each attribute is a zero-copy view into the store.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, columns: np.ndarray):
+        for name in FIELDS:
+            column = columns[_ROW[name]]
+            if column.flags.writeable:
+                column = column.view()
+                column.flags.writeable = False
+            setattr(self, name, column)
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    @classmethod
+    def from_klines(cls, klines) -> "CandleView":
+        """Parse raw klines rows ([open_time, open, high, low, close, volume, ...])"""
+        return cls(parse_klines(klines))
+
+
+def parse_klines(klines) -> np.ndarray:
+    """
+    Klines rows to a (6, n) float64 array, one row per field.
+    Millisecond timestamps are exact in float64.
+    """
+    if len(klines) == 0:
+        return np.empty((len(FIELDS), 0))
+    rows = np.asarray([row[:len(FIELDS)] for row in klines])
+    return np.ascontiguousarray(rows.astype(np.float64).T)
+
+
+def load_candles(path: str) -> np.ndarray:
+    """
+    Read a local candle file into a (6, n) array in ``parse_klines`` layout.
+
+    ``.csv`` has one candle per line (timestamp, open, high, low, close,
+    volume, optional header), ``.json`` is a raw klines response, ``.npy``
+    holds either klines rows or the (6, n) columns themselves and
+    ``.parquet`` has one column per field (needs pandas with pyarrow).
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".json":
+        with open(path) as handle:
+            return parse_klines(json.load(handle))
+    if suffix == ".npy":
+        data = np.load(path, mmap_mode="r")
+        if data.ndim == 2 and data.shape[0] == len(FIELDS):
+            return np.asarray(data, dtype=np.float64)
+        return np.ascontiguousarray(np.asarray(data[:, :len(FIELDS)], dtype=np.float64).T)
+    if suffix == ".csv":
+        with open(path) as handle:
+            first = handle.readline().split(",")[0].strip()
+        try:
+            float(first)
+            header = 0
+        except ValueError:
+            header = 1
+        rows = np.loadtxt(path, delimiter=",", skiprows=header, usecols=range(len(FIELDS)), ndmin=2)
+        return np.ascontiguousarray(rows.T)
+    if suffix == ".parquet":
+        import pandas as pd
+        frame = pd.read_parquet(path, columns=list(FIELDS))
+        return np.ascontiguousarray(frame.to_numpy(dtype=np.float64).T)
+    raise ValueError(f"Unsupported candle file {path!r}. Expected one of {CANDLE_FILE_SUFFIXES}")
+
+
+def candle_files(directory: str, symbols: Optional[List[str]] = None) -> Dict[str, str]:
+    """Map symbol -> candle file for ``{SYMBOL}.csv|json|npy|parquet`` files in a directory"""
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        stem, suffix = os.path.splitext(name)
+        if suffix.lower() in CANDLE_FILE_SUFFIXES:
+            files.setdefault(stem.upper(), os.path.join(directory, name))
+    if symbols is not None:
+        missing = [symbol for symbol in symbols if symbol.upper() not in files]
+        if missing:
+            raise FileNotFoundError(f"No candle file for {', '.join(missing)} in {directory}")
+        files = {symbol.upper(): files[symbol.upper()] for symbol in symbols}
+    return files
+
+
+class _Columns:
+    """Fixed-capacity column block of one symbol plus its [start, end) bounds"""
+
+    def __init__(self, data: np.ndarray, bounds: np.ndarray, lock_path: Optional[str] = None):
+        self.data = data
+        self.bounds = bounds
+        self.lock_path = lock_path
+
+    @contextmanager
+    def locked(self):
+        """Serialize writers across worker processes sharing the same files"""
+        if self.lock_path is None or fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class CandleStore:
+    """
+    Most recent ``max_candles`` candles per symbol in contiguous columns.
+
+    Each symbol owns a (6, 2 * max_candles) float64 block, one row per
+    OHLCV field. Candles are appended after the current window and the
+    window is moved back to the front only when the block is full, so
+    appends are amortized O(1) and every window is a contiguous slice.
+
+    With ``directory`` set the blocks are memory-mapped ``.npy`` files:
+    workers on one host share the same pages and a restarted worker
+    starts warm from the last stored candles.
+    """
+
+    def __init__(self, max_candles: int = 720, directory: Optional[str] = None):
+        self.max_candles = max_candles
+        self.capacity = 2 * max_candles
+        self.directory = directory or None
+        self._columns: Dict[str, _Columns] = {}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _open(self, symbol: str) -> _Columns:
+        columns = self._columns.get(symbol)
+        if columns is not None:
+            return columns
+
+        shape = (len(FIELDS), self.capacity)
+        if self.directory is None:
+            columns = _Columns(np.zeros(shape), np.zeros(2, dtype=np.int64))
+        else:
+            base = os.path.join(self.directory, symbol)
+            data, created = _open_memmap(f"{base}.candles.npy", np.float64, shape)
+            bounds, _ = _open_memmap(f"{base}.bounds.npy", np.int64, (2,))
+            if created:
+                bounds[:] = 0
+            columns = _Columns(data, bounds, lock_path=f"{base}.lock")
+        self._columns[symbol] = columns
+        return columns
+
+    def __contains__(self, symbol: str) -> bool:
+        return self.count(symbol) > 0
+
+    def count(self, symbol: str) -> int:
+        start, end = self._open(symbol).bounds
+        return int(end - start)
+
+    def last_timestamp(self, symbol: str) -> Optional[int]:
+        columns = self._open(symbol)
+        start, end = columns.bounds
+        if end == start:
+            return None
+        return int(columns.data[_ROW["timestamp"], end - 1])
+
+    def merge(self, symbol: str, batch: np.ndarray) -> int:
+        """
+        Merge a (6, n) batch sorted by timestamp into the symbol's window.
+
+        Stored candles at or after the batch's first timestamp are replaced
+        (the newest one was still open when fetched), newer ones appended
+        and the window trimmed to ``max_candles``. Returns the window size.
+        """
+        columns = self._open(symbol)
+        n = batch.shape[1]
+        if n == 0:
+            return self.count(symbol)
+
+        with columns.locked():
+            data = columns.data
+            start, end = (int(x) for x in columns.bounds)
+            stored = data[_ROW["timestamp"], start:end]
+            keep = start + int(np.searchsorted(stored, batch[_ROW["timestamp"], 0], side="left"))
+
+            if n >= self.max_candles:
+                batch = batch[:, -self.max_candles:]
+                n = self.max_candles
+                start = keep = 0
+            elif keep + n > self.capacity:
+                # Block full: move the newest retained candles to the front
+                retained = min(keep - start, self.max_candles - n)
+                data[:, :retained] = data[:, keep - retained:keep]
+                start, keep = 0, retained
+
+            data[:, keep:keep + n] = batch
+            end = keep + n
+            columns.bounds[:] = (max(start, end - self.max_candles), end)
+        return self.count(symbol)
+
+    def view(self, symbol: str, limit: Optional[int] = None) -> CandleView:
+        """Zero-copy view of the newest ``limit`` candles (all when omitted)"""
+        columns = self._open(symbol)
+        start, end = (int(x) for x in columns.bounds)
+        if limit is not None:
+            start = max(start, end - limit)
+        return CandleView(columns.data[:, start:end])
+
+    def flush(self):
+        """Write memory-mapped blocks back to disk"""
+        for columns in self._columns.values():
+            if isinstance(columns.data, np.memmap):
+                columns.data.flush()
+                columns.bounds.flush()
+
+    def clear(self, symbol: Optional[str] = None):
+        symbols = list(self._columns) if symbol is None else [symbol]
+        for name in symbols:
+            if name in self._columns:
+                self._columns[name].bounds[:] = 0
+
+
+def _open_memmap(path: str, dtype, shape):
+    """
+    Open an existing .npy file read-write, creating it if missing or
+    mismatched. Returns ``(array, created)``.
+    """
+    if os.path.exists(path):
+        existing = np.lib.format.open_memmap(path, mode="r+")
+        if existing.shape == shape and existing.dtype == dtype:
+            return existing, False
+        del existing
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape), True
@@ -0,0 +1,69 @@
+"""
+Rolling cross-symbol return correlation and covariance
+"""
+import numpy as np
+from functools import reduce
+from typing import Dict, List, Sequence, Tuple
+
+
+def align(timestamps: Sequence[np.ndarray], closes: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack closes on the candle open times every symbol has.
+    Returns the shared open times and a (symbols, candles) matrix, oldest first.
+    """
+    common = reduce(np.intersect1d, timestamps)
+    rows = []
+    for stamps, prices in zip(timestamps, closes):
+        rows.append(np.asarray(prices, dtype=np.float64)[np.searchsorted(stamps, common)])
+    return common, np.vstack(rows)
+
+
+def matrices(closes: np.ndarray, windows: Sequence[int]) -> Dict[int, dict]:
+    """
+    Correlation and covariance of simple returns over the last ``window``
+    returns, for every window, from an aligned (symbols, candles) matrix.
+    Each window is one centered matrix product.
+    """
+    rets = np.diff(closes, axis=-1) / closes[:, :-1]
+    results = {}
+    for window in windows:
+        recent = rets[:, -window:]
+        count = recent.shape[1]
+        if count < 2:
+            raise ValueError(f"Need at least 2 aligned returns for window {window}, got {count}")
+        centered = recent - recent.mean(axis=1, keepdims=True)
+        covariance = centered @ centered.T / (count - 1)
+        std = np.sqrt(np.diag(covariance))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = covariance / np.outer(std, std)
+        correlation = np.nan_to_num(np.clip(correlation, -1.0, 1.0))
+        np.fill_diagonal(correlation, np.where(std > 0, 1.0, 0.0))
+        results[window] = {
+            "returns": count,
+            "correlation": correlation,
+            "covariance": covariance,
+            "volatility": std * 100,
+        }
+    return results
+
+
+def build_correlations(symbols: List[str], timestamps: List[np.ndarray],
+                       closes: List[np.ndarray], windows: List[int]) -> dict:
+    """Response body for aligned closed candles of ``symbols``"""
+    common, aligned = align(timestamps, closes)
+    if len(common) == 0:
+        raise ValueError("Symbols share no candles")
+    by_window = matrices(aligned, windows)
+    return {
+        "symbols": symbols,
+        "last_candle_time": int(common[-1]),
+        "windows": {
+            str(window): {
+                "returns": result["returns"],
+                "correlation": np.round(result["correlation"], 4).tolist(),
+                "covariance": result["covariance"].tolist(),
+                "volatility": np.round(result["volatility"], 4).tolist(),
+            }
+            for window, result in by_window.items()
+        }
+    }
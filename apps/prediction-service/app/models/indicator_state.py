@@ -0,0 +1,233 @@
+"""
+Incremental indicator state, advanced one closed candle at a time
+"""
+import math
+import numpy as np
+from collections import deque
+from typing import Dict, Iterable, Optional, Sequence
+from app.models import indicators
+from app.models.trend import TrendEngine
+
+SMA_PERIODS = (20, 50)
+EMA_PERIODS = (12, 26)
+RSI_PERIOD = 14
+INDICATOR_FIELDS = ("sma_20", "sma_50", "ema_12", "ema_26", "rsi", "volatility", "trend")
+
+
+class IndicatorState:
+    """
+    Running SMA/EMA/RSI/volatility for one symbol.
+
+    Every update is O(1): SMAs keep rolling sums, EMAs and the Wilder RSI
+    averages are plain recurrences and volatility keeps a sliding-window
+    mean/M2 over the last ``window - 1`` returns (the same span the batch
+    engine uses for a ``window``-candle history). ``regression`` holds the
+    rolling trend fits.
+    """
+
+    def __init__(self, window: int = 720):
+        self.window = window
+        self.count = 0
+        self.last_timestamp: Optional[int] = None
+        self.last_close: Optional[float] = None
+
+        self._closes: deque = deque(maxlen=max(SMA_PERIODS))
+        self._sums: Dict[int, float] = {period: 0.0 for period in SMA_PERIODS}
+        self._ema: Dict[int, float] = {period: 0.0 for period in EMA_PERIODS}
+        self._gain = 0.0  # running sum during warmup, Wilder average afterwards
+        self._loss = 0.0
+
+        self._returns: deque = deque(maxlen=max(1, window - 1))
+        self._ret_mean = 0.0
+        self._ret_m2 = 0.0
+        self._since_resync = 0
+
+        # Rolling regressions used for the per-timeframe trend projection
+        self.regression = TrendEngine()
+
+    @classmethod
+    def from_history(cls, timestamps: Sequence[int], closes, window: int = 720) -> "IndicatorState":
+        """Seed a state from closed candles with one vectorized pass"""
+        closes = np.asarray(closes, dtype=np.float64)
+        state = cls(window=window)
+        n = len(closes)
+        if n == 0:
+            return state
+
+        state.count = n
+        state.last_timestamp = int(timestamps[-1])
+        state.last_close = float(closes[-1])
+        state._closes.extend(closes[-state._closes.maxlen:].tolist())
+        for period in SMA_PERIODS:
+            state._sums[period] = math.fsum(closes[-period:])
+        for period in EMA_PERIODS:
+            state._ema[period] = float(indicators.ema(closes, period)[-1])
+
+        changes = np.diff(closes)
+        if len(changes) < RSI_PERIOD:
+            state._gain = float(np.clip(changes, 0, None).sum())
+            state._loss = float(np.clip(-changes, 0, None).sum())
+        else:
+            avg_gain, avg_loss = indicators.wilder_averages(closes, RSI_PERIOD)
+            state._gain = float(avg_gain[-1])
+            state._loss = float(avg_loss[-1])
+
+        state._returns.extend(indicators.returns(closes)[-state._returns.maxlen:].tolist())
+        state._resync()
+        state.regression.seed(closes)
+        return state
+
+    def _resync(self):
+        """Recompute running sums exactly to stop floating-point drift"""
+        closes = list(self._closes)
+        for period in SMA_PERIODS:
+            self._sums[period] = math.fsum(closes[-period:])
+        if self._returns:
+            rets = np.fromiter(self._returns, dtype=np.float64, count=len(self._returns))
+            self._ret_mean = float(rets.mean())
+            self._ret_m2 = float(((rets - self._ret_mean) ** 2).sum())
+        else:
+            self._ret_mean = 0.0
+            self._ret_m2 = 0.0
+        self._since_resync = 0
+
+    def _step(self, close: float) -> dict:
+        """Internals after appending ``close``, without mutating the state"""
+        count = self.count + 1
+        closes = self._closes
+
+        sums = {}
+        for period in SMA_PERIODS:
+            dropped = closes[-period] if len(closes) >= period else 0.0
+            sums[period] = self._sums[period] + close - dropped
+
+        ema = {}
+        for period in EMA_PERIODS:
+            if self.count == 0:
+                ema[period] = close
+            else:
+                multiplier = 2 / (period + 1)
+                ema[period] = close * multiplier + self._ema[period] * (1 - multiplier)
+
+        gain, loss = self._gain, self._loss
+        ret_mean, ret_m2 = self._ret_mean, self._ret_m2
+        new_return = None
+        if self.count > 0:
+            change = close - self.last_close
+            up, down = max(change, 0.0), max(-change, 0.0)
+            changes = count - 1
+            if changes <= RSI_PERIOD:
+                gain, loss = gain + up, loss + down
+                if changes == RSI_PERIOD:
+                    gain, loss = gain / RSI_PERIOD, loss / RSI_PERIOD
+            else:
+                gain = (gain * (RSI_PERIOD - 1) + up) / RSI_PERIOD
+                loss = (loss * (RSI_PERIOD - 1) + down) / RSI_PERIOD
+
+            new_return = change / self.last_close
+            rets = self._returns
+            if len(rets) < rets.maxlen:
+                n = len(rets) + 1
+                delta = new_return - ret_mean
+                ret_mean += delta / n
+                ret_m2 += delta * (new_return - ret_mean)
+            else:
+                old = rets[0]
+                n = len(rets)
+                new_mean = ret_mean + (new_return - old) / n
+                ret_m2 += (new_return - old) * (new_return - new_mean + old - ret_mean)
+                ret_mean = new_mean
+            ret_m2 = max(ret_m2, 0.0)
+
+        return {
+            "count": count,
+            "sums": sums,
+            "ema": ema,
+            "gain": gain,
+            "loss": loss,
+            "ret_mean": ret_mean,
+            "ret_m2": ret_m2,
+            "return": new_return,
+        }
+
+    def update(self, timestamp: int, close: float):
+        """Advance the state by one closed candle"""
+        close = float(close)
+        step = self._step(close)
+
+        self.count = step["count"]
+        self._sums = step["sums"]
+        self._ema = step["ema"]
+        self._gain, self._loss = step["gain"], step["loss"]
+        self._ret_mean, self._ret_m2 = step["ret_mean"], step["ret_m2"]
+        if step["return"] is not None:
+            self._returns.append(step["return"])
+        self._closes.append(close)
+        self.regression.update(close)
+        self.last_timestamp = int(timestamp)
+        self.last_close = close
+
+        self._since_resync += 1
+        if self._since_resync >= self.window:
+            self._resync()
+
+    def snapshot(self, price: Optional[float] = None, fields: Optional[Iterable[str]] = None) -> Dict[str, object]:
+        """
+        Current indicator values.
+
+        If ``price`` is given it is treated as the close of the still-open
+        candle: indicators are computed as if it were appended, in O(1) and
+        without changing the state. ``fields`` restricts the result (and the
+        work done) to a subset of INDICATOR_FIELDS.
+        """
+        if price is None:
+            if self.count == 0:
+                raise ValueError("IndicatorState has no candles")
+            price = self.last_close
+            count = self.count
+            sums, ema = self._sums, self._ema
+            gain, loss = self._gain, self._loss
+            ret_m2, returns_count = self._ret_m2, len(self._returns)
+        else:
+            price = float(price)
+            step = self._step(price)
+            count = step["count"]
+            sums, ema = step["sums"], step["ema"]
+            gain, loss = step["gain"], step["loss"]
+            ret_m2 = step["ret_m2"]
+            returns_count = min(len(self._returns) + (step["return"] is not None), self._returns.maxlen)
+
+        def sma(period: int) -> float:
+            return sums[period] / period if count >= period else price
+
+        def rsi() -> float:
+            if count - 1 < RSI_PERIOD:
+                return 50.0
+            if loss == 0:
+                return 100.0
+            return 100 - 100 / (1 + gain / loss)
+
+        def trend() -> str:
+            if count < 50:
+                return "neutral"
+            sma_20, sma_50 = sma(20), sma(50)
+            if price > sma_20 > sma_50:
+                return "bullish"
+            if price < sma_20 < sma_50:
+                return "bearish"
+            return "neutral"
+
+        compute = {
+            "sma_20": lambda: sma(20),
+            "sma_50": lambda: sma(50),
+            "ema_12": lambda: ema[12] if count >= 12 else price,
+            "ema_26": lambda: ema[26] if count >= 26 else price,
+            "rsi": rsi,
+            "volatility": lambda: math.sqrt(ret_m2 / returns_count) * 100 if returns_count else 0.0,
+            "trend": trend,
+        }
+
+        result: Dict[str, object] = {"current_price": price}
+        for name in INDICATOR_FIELDS if fields is None else fields:
+            result[name] = compute[name]()
+        return result
@@ -0,0 +1,197 @@
+"""
+Vectorized technical indicators over NumPy arrays.
+
+Every function accepts a 1-D array of prices for a single symbol or a 2-D
+array with one row per symbol and computes along the last axis, so a whole
+batch of symbols is handled in a single pass.
+"""
+import numpy as np
+from typing import Dict
+
+# Largest exponent used when rescaling EMA weights inside one block.
+# Keeps d ** -block_size well inside float64 range.
+_EMA_LOG_SPAN = 30.0
+
+
+def _as_array(prices) -> np.ndarray:
+    return np.asarray(prices, dtype=np.float64)
+
+
+def _rolling_sum(values: np.ndarray, period: int) -> np.ndarray:
+    """Rolling sum along the last axis, NaN until the window is full"""
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] < period:
+        return out
+    csum = np.cumsum(values, axis=-1)
+    out[..., period - 1] = csum[..., period - 1]
+    out[..., period:] = csum[..., period:] - csum[..., :-period]
+    return out
+
+
+def sma(prices, period: int) -> np.ndarray:
+    """Simple Moving Average series"""
+    prices = _as_array(prices)
+    return _rolling_sum(prices, period) / period
+
+
+def smooth(values, alpha: float, initial=None) -> np.ndarray:
+    """
+    Exponential smoothing y[t] = alpha * x[t] + (1 - alpha) * y[t-1].
+
+    The recursion is solved in closed form block by block, each block being
+    short enough that the rescaled weights stay finite in float64.
+    If ``initial`` is omitted the series is seeded with its first value.
+    """
+    values = _as_array(values)
+    n = values.shape[-1]
+    out = np.empty(values.shape)
+    if n == 0:
+        return out
+
+    decay = 1.0 - alpha
+    if initial is None:
+        prev = values[..., 0].copy()
+        out[..., 0] = prev
+        start = 1
+    else:
+        prev = np.broadcast_to(_as_array(initial), values.shape[:-1]).copy()
+        start = 0
+
+    if decay <= 0.0:
+        out[..., start:] = values[..., start:]
+        return out
+
+    block = max(1, int(_EMA_LOG_SPAN / -np.log(decay)))
+    for begin in range(start, n, block):
+        end = min(begin + block, n)
+        steps = np.arange(end - begin)
+        grow = decay ** -steps
+        shrink = decay ** steps
+        acc = np.cumsum(values[..., begin:end] * grow, axis=-1)
+        out[..., begin:end] = (
+            alpha * shrink * acc + (decay * shrink) * prev[..., np.newaxis]
+        )
+        prev = out[..., end - 1]
+    return out
+
+
+def ema(prices, period: int) -> np.ndarray:
+    """Exponential Moving Average series, seeded with the first price"""
+    return smooth(prices, 2 / (period + 1))
+
+
+def wilder_averages(prices, period: int = 14):
+    """
+    Wilder-smoothed average gain and loss series.
+
+    Seeded with the simple average of the first ``period`` changes, then
+    avg[t] = (avg[t-1] * (period - 1) + x[t]) / period. Both series are
+    aligned with ``prices`` and NaN until ``period`` changes are available.
+    """
+    prices = _as_array(prices)
+    avg_gain = np.full(prices.shape, np.nan)
+    avg_loss = np.full(prices.shape, np.nan)
+    if prices.shape[-1] < period + 1:
+        return avg_gain, avg_loss
+
+    changes = np.diff(prices, axis=-1)
+    for out, values in ((avg_gain, np.clip(changes, 0, None)),
+                        (avg_loss, np.clip(-changes, 0, None))):
+        seed = values[..., :period].mean(axis=-1)
+        out[..., period] = seed
+        out[..., period + 1:] = smooth(values[..., period:], 1 / period, initial=seed)
+    return avg_gain, avg_loss
+
+
+def rsi_from_averages(avg_gain, avg_loss):
+    """RSI from average gain/loss; 100 when there were no losses"""
+    avg_gain = _as_array(avg_gain)
+    avg_loss = _as_array(avg_loss)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, values)
+
+
+def rsi(prices, period: int = 14) -> np.ndarray:
+    """Relative Strength Index series using Wilder smoothing"""
+    avg_gain, avg_loss = wilder_averages(prices, period)
+    out = rsi_from_averages(avg_gain, avg_loss)
+    out[np.isnan(avg_gain)] = np.nan
+    return out
+
+
+def returns(prices) -> np.ndarray:
+    """Simple period-over-period returns (one element shorter than prices)"""
+    prices = _as_array(prices)
+    return np.diff(prices, axis=-1) / prices[..., :-1]
+
+
+def volatility(prices, window: int) -> np.ndarray:
+    """
+    Rolling volatility series: standard deviation of the last ``window``
+    returns, in percent. Aligned with ``prices``; NaN until the window fills.
+    """
+    prices = _as_array(prices)
+    out = np.full(prices.shape, np.nan)
+    rets = returns(prices)
+    if rets.shape[-1] < window:
+        return out
+
+    mean = _rolling_sum(rets, window)[..., window - 1:] / window
+    mean_sq = _rolling_sum(rets * rets, window)[..., window - 1:] / window
+    variance = np.clip(mean_sq - mean * mean, 0, None)
+    out[..., window:] = np.sqrt(variance) * 100
+    return out
+
+
+def trend(prices, sma_short, sma_long) -> np.ndarray:
+    """Trend label per element: bullish, bearish or neutral"""
+    prices = _as_array(prices)
+    bullish = (prices > sma_short) & (sma_short > sma_long)
+    bearish = (prices < sma_short) & (sma_short < sma_long)
+    return np.select([bullish, bearish], ["bullish", "bearish"], default="neutral")
+
+
+def latest(prices) -> Dict[str, np.ndarray]:
+    """
+    Latest indicator values used by the predictor.
+
+    Returns one value per symbol (a scalar array for 1-D input). Short
+    histories fall back the same way the original per-call helpers did:
+    averages return the last price, RSI returns 50 and the trend is neutral.
+    RSI is Wilder-smoothed so it agrees with the streaming IndicatorState.
+    """
+    prices = _as_array(prices)
+    n = prices.shape[-1]
+    last = prices[..., -1]
+
+    def last_or_price(series: np.ndarray, period: int) -> np.ndarray:
+        return series[..., -1] if n >= period else last.copy()
+
+    sma_20 = last_or_price(sma(prices, 20), 20)
+    sma_50 = last_or_price(sma(prices, 50), 50)
+    ema_12 = last_or_price(ema(prices, 12), 12)
+    ema_26 = last_or_price(ema(prices, 26), 26)
+
+    rsi_14 = rsi(prices, 14)[..., -1] if n >= 15 else np.full(last.shape, 50.0)
+
+    if n >= 2:
+        vol = np.std(returns(prices), axis=-1) * 100
+    else:
+        vol = np.zeros(last.shape)
+
+    if n >= 50:
+        trend_label = trend(last, sma_20, sma_50)
+    else:
+        trend_label = np.full(last.shape, "neutral")
+
+    return {
+        "current_price": last,
+        "sma_20": sma_20,
+        "sma_50": sma_50,
+        "ema_12": ema_12,
+        "ema_26": ema_26,
+        "rsi": rsi_14,
+        "volatility": vol,
+        "trend": trend_label,
+    }
@@ -3,235 +3,671 @@ Price Predictor using multiple ML approaches
 """
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-import aiohttp
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import asyncio
+import logging
+import os
+import time
+from app.models import indicators
+from app.models.candles import CandleStore, CandleView, parse_klines
+from app.models.correlation import build_correlations
+from app.models.indicator_state import IndicatorState, INDICATOR_FIELDS
+from app.models.trend import regression
+from app.services.cache import TTLCache
+from app.services.executor import ComputeExecutor
+from app.services.market_data import CANDLE_INTERVAL_MS, MarketDataError, MarketDataSource, create_source
+from app.services.metrics import observe_stage, stage
+from app.services.shared_cache import SharedCache, create_shared_cache
+from app.services.singleflight import SingleFlight
+from app.services.upstream import FetchScheduler
+
+logger = logging.getLogger(__name__)
+
+CANDLE_HISTORY_SIZE = int(os.getenv("CANDLE_HISTORY_SIZE", 720))
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR", "")
+
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", 300))
+PREDICTION_CACHE_STALE_TTL = float(os.getenv("PREDICTION_CACHE_STALE_TTL", 60))
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", 1024))
+
+# (label, hours ahead, regression window in candles)
+TIMEFRAMES = [
+    ("1h", 1, 24),
+    ("4h", 4, 24),
+    ("24h", 24, 72),
+    ("7d", 168, 168)
+]
+
+def advance_state(state: Optional[IndicatorState], timestamps: np.ndarray, closes: np.ndarray,
+                  window: int) -> IndicatorState:
+    """
+    Bring an indicator state up to date with closed candles.
+    
+    Only candles newer than the state are applied, one O(1) update each;
+    the state is reseeded from the whole history when it is missing or has
+    a gap, in which case a new state is returned.
+    """
+    if state is not None and state.last_timestamp is not None:
+        first_new = int(np.searchsorted(timestamps, state.last_timestamp, side="right"))
+        if first_new == len(timestamps) or timestamps[first_new] == state.last_timestamp + CANDLE_INTERVAL_MS:
+            for i in range(first_new, len(timestamps)):
+                state.update(int(timestamps[i]), closes[i])
+            return state
+    return IndicatorState.from_history(timestamps, closes, window=window)
+
+def indicator_step(state: Optional[IndicatorState], timestamps: np.ndarray, closes: np.ndarray,
+                   symbol: Optional[str] = None,
+                   fields: Optional[List[str]] = None) -> Tuple[IndicatorState, dict, Dict[str, float]]:
+    """
+    Advance ``state`` with the closed candles (the last kline is still open)
+    and read it at the open candle's price. With a ``symbol`` the result is
+    the full prediction, otherwise the indicator ``values``. Runs in the
+    compute executor and returns the state (a copy in process mode) and the
+    time spent in each stage.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    state = advance_state(state, timestamps[:-1], closes[:-1], window=len(closes))
+    values = state.snapshot(closes[-1], fields=fields)
+    timings["indicators"] = time.perf_counter() - started
+    if symbol is None:
+        return state, values, timings
+    
+    started = time.perf_counter()
+    fits = state.regression.fit(closes[-1])
+    timings["regression"] = time.perf_counter() - started
+    started = time.perf_counter()
+    result = build_prediction(symbol, values, fits)
+    timings["projection"] = time.perf_counter() - started
+    return state, result, timings
+
+def build_batch(symbols: List[str], closes: np.ndarray) -> List[dict]:
+    """
+    Predictions for several symbols from a stacked (symbols, candles) close
+    matrix: indicators and regression fits are computed for all rows at once.
+    """
+    values = indicators.latest(closes)
+    windows = sorted({window for _, _, window in TIMEFRAMES})
+    fits = {window: regression(closes, window) for window in windows}
+    
+    return [
+        build_prediction(
+            symbol,
+            {name: column[row] for name, column in values.items()},
+            {window: {name: float(column[row]) for name, column in fit.items()} for window, fit in fits.items()}
+        )
+        for row, symbol in enumerate(symbols)
+    ]
+
+def build_prediction(symbol: str, values: dict, fits: Dict[int, dict]) -> dict:
+    """
+    Project prices for each timeframe from the latest indicator values and
+    the linear regression fit over that timeframe's window.
+    Pure function of its arguments so it can run in a thread or process pool.
+    """
+    current_price = float(values["current_price"])
+    sma_20 = float(values["sma_20"])
+    sma_50 = float(values["sma_50"])
+    ema_12 = float(values["ema_12"])
+    ema_26 = float(values["ema_26"])
+    rsi = float(values["rsi"])
+    volatility = float(values["volatility"])
+    trend = str(values["trend"])
+    
+    # Generate predictions
+    predictions = []
+    for label, hours, window in TIMEFRAMES:
+        # Predict based on the window's linear trend + mean reversion
+        fit = fits[window]
+        trend_factor = 1 + (fit["slope"] / current_price) * hours * 0.5
+        
+        # Mean reversion factor (RSI based)
+        if rsi > 70:
+            mean_reversion = 0.98  # Overbought - expect pullback
+        elif rsi < 30:
+            mean_reversion = 1.02  # Oversold - expect bounce
+        else:
+            mean_reversion = 1.0
+        
+        predicted_price = current_price * trend_factor * mean_reversion
+        change_percent = ((predicted_price - current_price) / current_price) * 100
+        
+        # Confidence based on volatility and trend strength
+        trend_strength = abs(sma_20 - sma_50) / current_price * 100
+        confidence = max(30, min(85, 70 - volatility * 2 + trend_strength * 5))
+        
+        predictions.append({
+            "timeframe": label,
+            "predicted_price": round(predicted_price, 2),
+            "change_percent": round(change_percent, 2),
+            "confidence": round(confidence, 1),
+            "trend_r2": round(fit["r2"], 3)
+        })
+    
+    result = {
+        "symbol": symbol,
+        "current_price": round(current_price, 2),
+        "timestamp": datetime.now().isoformat(),
+        "indicators": {
+            "sma_20": round(sma_20, 2),
+            "sma_50": round(sma_50, 2),
+            "ema_12": round(ema_12, 2),
+            "ema_26": round(ema_26, 2),
+            "rsi": round(rsi, 2),
+            "volatility": round(volatility, 2),
+            "trend": trend
+        },
+        "predictions": predictions,
+        "recommendation": get_recommendation(rsi, trend)
+    }
+    return result
+
+def get_recommendation(rsi: float, trend: str) -> dict:
+    """Generate trading recommendation based on indicators"""
+    if rsi < 30 and trend in ["neutral", "bullish"]:
+        return {
+            "action": "BUY",
+            "strength": "strong",
+            "reason": "Oversold conditions with potential reversal"
+        }
+    elif rsi > 70 and trend in ["neutral", "bearish"]:
+        return {
+            "action": "SELL",
+            "strength": "strong",
+            "reason": "Overbought conditions with potential pullback"
+        }
+    elif trend == "bullish" and 30 <= rsi <= 70:
+        return {
+            "action": "BUY",
+            "strength": "moderate",
+            "reason": "Bullish trend continuation expected"
+        }
+    elif trend == "bearish" and 30 <= rsi <= 70:
+        return {
+            "action": "SELL",
+            "strength": "moderate",
+            "reason": "Bearish trend continuation expected"
+        }
+    else:
+        return {
+            "action": "HOLD",
+            "strength": "neutral",
+            "reason": "No clear signal - wait for better entry"
+        }
 
 class PricePredictor:
     """Simple ML-based price predictor using moving averages and trend analysis"""
     
-    def __init__(self):
-        self.cache: Dict[str, dict] = {}
-        self.cache_ttl = 300  # 5 minutes
+    def __init__(self, source: Optional[MarketDataSource] = None, shared: Optional[SharedCache] = None):
+        self.cache_ttl = PREDICTION_CACHE_TTL
+        # Seconds after the hour that request keys roll over (see _cache_key)
+        self.cache_key_lag = 0.0
+        self.cache = TTLCache(
+            max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+            ttl=self.cache_ttl,
+            stale_ttl=PREDICTION_CACHE_STALE_TTL
+        )
+        # Cluster-wide L2 behind the in-process cache (None = per-worker only)
+        self.shared = shared if shared is not None else create_shared_cache()
+        self.states: Dict[str, IndicatorState] = {}
+        self.source = source or create_source()
+        self.fetcher = FetchScheduler(self.source)
+        self.fallbacks = 0
+        self.candles = CandleStore(max_candles=CANDLE_HISTORY_SIZE, directory=CANDLE_STORE_DIR)
+        self.singleflight = SingleFlight()
+        self.executor = ComputeExecutor()
+        self._background: set = set()
+        self._state_locks: Dict[str, asyncio.Lock] = {}
+    
+    async def start(self):
+        """Open the market data source (called from the app lifespan)"""
+        await self.source.start()
+    
+    async def close(self):
+        """Close the market data source and shared cache and flush the candle store"""
+        await self.source.close()
+        if self.shared is not None:
+            await self.shared.close()
+        self.candles.flush()
+        self.executor.shutdown()
+        
+    async def fetch_historical_data(self, symbol: str, days: int = 30) -> CandleView:
+        """
+        Fetch historical price data from the market data source.
+        
+        Candles are kept in the columnar candle store; after the first call
+        only candles from the last stored one onwards are requested. Returns
+        zero-copy views of the newest ``days * 24`` candles. Requests go
+        through the rate-limit-aware fetcher; if they still fail, the last
+        good candles in the store are returned (empty if there are none).
+        """
+        limit = days * 24  # hours
+        request_limit, start_time = limit, None
+        
+        # Delta fetch: re-read the last stored (possibly still open) candle and anything newer
+        last_timestamp = self.candles.last_timestamp(symbol)
+        if last_timestamp is not None and limit <= self.candles.max_candles:
+            missing = (self.source.now_ms() - last_timestamp) // CANDLE_INTERVAL_MS + 1
+            if missing < limit:
+                request_limit, start_time = max(1, missing), last_timestamp
         
-    async def fetch_historical_data(self, symbol: str, days: int = 30) -> List[dict]:
-        """Fetch historical price data from Binance API"""
         try:
-            url = f"https://api.binance.com/api/v3/klines"
-            params = {
-                "symbol": f"{symbol}USDT",
-                "interval": "1h",
-                "limit": days * 24  # hours
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return [
-                            {
-                                "timestamp": item[0],
-                                "open": float(item[1]),
-                                "high": float(item[2]),
-                                "low": float(item[3]),
-                                "close": float(item[4]),
-                                "volume": float(item[5])
-                            }
-                            for item in data
-                        ]
-        except Exception as e:
-            print(f"Error fetching data: {e}")
-        return []
+            batch = await self.fetcher.fetch(symbol, request_limit, start_time)
+        except MarketDataError as e:
+            logger.warning("Klines request for %s failed (%s): %s", symbol, e.status, e)
+            if last_timestamp is None or limit > self.candles.max_candles:
+                return CandleView(parse_klines([]))
+            self.fallbacks += 1
+            return self.candles.view(symbol, limit)
+        
+        if limit > self.candles.max_candles:
+            return CandleView(batch)
+        self.candles.merge(symbol, batch)
+        return self.candles.view(symbol, limit)
     
     def calculate_sma(self, prices: List[float], period: int) -> float:
         """Simple Moving Average"""
         if len(prices) < period:
-            return prices[-1] if prices else 0
-        return sum(prices[-period:]) / period
+            return prices[-1] if len(prices) else 0
+        return float(indicators.sma(prices, period)[-1])
     
     def calculate_ema(self, prices: List[float], period: int) -> float:
         """Exponential Moving Average"""
         if len(prices) < period:
-            return prices[-1] if prices else 0
-        
-        multiplier = 2 / (period + 1)
-        ema = prices[0]
-        for price in prices[1:]:
-            ema = (price * multiplier) + (ema * (1 - multiplier))
-        return ema
+            return prices[-1] if len(prices) else 0
+        return float(indicators.ema(prices, period)[-1])
     
     def calculate_rsi(self, prices: List[float], period: int = 14) -> float:
         """Relative Strength Index"""
         if len(prices) < period + 1:
             return 50
-        
-        gains = []
-        losses = []
-        
-        for i in range(1, len(prices)):
-            change = prices[i] - prices[i-1]
-            if change > 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
-        
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
-        if avg_loss == 0:
-            return 100
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return float(indicators.rsi(prices, period)[-1])
     
     def predict_trend(self, prices: List[float]) -> str:
         """Predict trend based on moving averages"""
         if len(prices) < 50:
             return "neutral"
         
-        sma_20 = self.calculate_sma(prices, 20)
-        sma_50 = self.calculate_sma(prices, 50)
-        current_price = prices[-1]
-        
-        if current_price > sma_20 > sma_50:
-            return "bullish"
-        elif current_price < sma_20 < sma_50:
-            return "bearish"
-        else:
-            return "neutral"
+        values = indicators.latest(prices)
+        return str(values["trend"])
+    
+    async def _indicator_step(self, symbol: str, historical: CandleView, predict: bool = False,
+                              fields: Optional[List[str]] = None):
+        """
+        Run indicator_step on the symbol's state in the compute executor,
+        one call per symbol at a time, and record its stage timings.
+        """
+        lock = self._state_locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            # Copied out of the candle store, which may change while the worker runs
+            state, result, timings = await self.executor.run(
+                indicator_step, self.states.get(symbol), historical.timestamp.copy(), historical.close.copy(),
+                symbol if predict else None, fields
+            )
+            self.states[symbol] = state
+        for name, seconds in timings.items():
+            observe_stage(name, seconds)
+        return result
     
     async def predict(self, symbol: str) -> dict:
         """Generate price prediction for a cryptocurrency"""
+        self.fetcher.record(symbol)
         
         # Check cache
-        cache_key = f"{symbol}_{datetime.now().strftime('%Y%m%d%H')}"
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        cache_key = self._cache_key(symbol)
+        cached, stale = self.cache.lookup(cache_key)
+        if cached is not None:
+            if stale:
+                self._revalidate(symbol, cache_key)
+            return cached
         
-        # Fetch historical data
-        historical = await self.fetch_historical_data(symbol, days=30)
+        # Concurrent misses for the same key share one computation
+        return await self.singleflight.do(cache_key, lambda: self._compute(symbol, cache_key))
+    
+    async def predict_batch(self, symbols: List[str], concurrency: int = 8) -> List[dict]:
+        """
+        Predictions for several symbols in one call.
+        
+        Fresh cache entries are returned as is and misses already being
+        computed are joined. The remaining symbols are fetched concurrently
+        and computed together on stacked close matrices (one per history
+        length), and each result is cached like a single prediction.
+        """
+        results: Dict[str, dict] = {}
+        pending: Dict[str, str] = {}
+        for symbol in symbols:
+            self.fetcher.record(symbol)
+            cache_key = self._cache_key(symbol)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                results[symbol] = cached
+            else:
+                pending[symbol] = cache_key
+        
+        # Misses are computed by one shared batch task; concurrent single
+        # requests for the same keys coalesce onto it through single-flight
+        to_compute = [symbol for symbol, key in pending.items() if key not in self.singleflight]
+        batch = asyncio.ensure_future(self._compute_batch(to_compute, pending, concurrency)) if to_compute else None
+        
+        async def from_batch(symbol: str, cache_key: str) -> dict:
+            if symbol not in to_compute:
+                # The computation it was going to join finished in the meantime
+                return await self._compute(symbol, cache_key)
+            return (await asyncio.shield(batch))[symbol]
+        
+        computed = await asyncio.gather(*(
+            self.singleflight.do(key, lambda symbol=symbol, key=key: from_batch(symbol, key))
+            for symbol, key in pending.items()
+        ))
+        results.update(zip(pending, computed))
+        return [results[symbol] for symbol in symbols]
+    
+    async def _compute_batch(self, symbols: List[str], cache_keys: Dict[str, str], concurrency: int) -> Dict[str, dict]:
+        """
+        Batch counterpart of _compute: symbols whose L2 lock this worker
+        takes are computed in one batch and published, symbols locked by
+        another worker are waited for like single predictions.
+        """
+        if self.shared is None:
+            return await self._compute_batch_local(symbols, cache_keys, concurrency)
         
+        # Symbols another worker already published skip the fetch
+        results = await self._published(symbols, cache_keys)
+        remaining = [symbol for symbol in symbols if symbol not in results]
+        tokens = dict(zip(remaining, await asyncio.gather(*(
+            self.shared.acquire(cache_keys[symbol]) for symbol in remaining
+        ))))
+        locked = [symbol for symbol in remaining if tokens[symbol] is not None]
+        try:
+            # The previous holders may have published just before we locked
+            results.update(await self._published(locked, cache_keys))
+            to_compute = [symbol for symbol in locked if symbol not in results]
+            waiting = [symbol for symbol in remaining if tokens[symbol] is None]
+            computed, waited = await asyncio.gather(
+                self._compute_batch_local(to_compute, cache_keys, concurrency),
+                asyncio.gather(*(self._compute_isolated(symbol, cache_keys[symbol]) for symbol in waiting))
+            )
+            for symbol, result in computed.items():
+                if "error" not in result:
+                    await self.shared.set(cache_keys[symbol], result, self.cache_ttl)
+        finally:
+            await asyncio.gather(*(self.shared.release(cache_keys[symbol], tokens[symbol]) for symbol in locked))
+        results.update(computed)
+        results.update(zip(waiting, waited))
+        return results
+    
+    async def _published(self, symbols: List[str], cache_keys: Dict[str, str]) -> Dict[str, dict]:
+        """Results other workers published to L2, copied into L1"""
+        results: Dict[str, dict] = {}
+        entries = await asyncio.gather(*(self.shared.get(cache_keys[symbol]) for symbol in symbols))
+        for symbol, entry in zip(symbols, entries):
+            if entry is not None:
+                results[symbol], remaining = entry
+                self.cache.set(cache_keys[symbol], results[symbol], ttl=remaining)
+        return results
+    
+    async def _compute_isolated(self, symbol: str, cache_key: str) -> dict:
+        """_compute for one symbol of a batch, turning a failure into an error entry"""
+        try:
+            return await self._compute(symbol, cache_key)
+        except Exception as e:
+            logger.warning("Prediction for %s failed: %s", symbol, e)
+            return {"symbol": symbol, "error": str(e), "predictions": []}
+    
+    async def _compute_batch_local(self, symbols: List[str], cache_keys: Dict[str, str],
+                                   concurrency: int) -> Dict[str, dict]:
+        """Fetch and compute symbols together; one symbol failing does not fail the others"""
+        results: Dict[str, dict] = {}
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch(symbol: str) -> CandleView:
+            async with semaphore:
+                try:
+                    return await self.fetch_historical_data(symbol, days=30)
+                except Exception as e:
+                    logger.warning("Fetching %s for a batch failed: %s", symbol, e)
+                    return CandleView(parse_klines([]))
+        
+        histories = await asyncio.gather(*(fetch(symbol) for symbol in symbols))
+        
+        groups: Dict[int, List[str]] = {}
+        for symbol, historical in zip(symbols, histories):
+            if historical:
+                groups.setdefault(len(historical), []).append(symbol)
+            else:
+                results[symbol] = {
+                    "symbol": symbol,
+                    "error": "Failed to fetch historical data",
+                    "predictions": []
+                }
+        
+        by_symbol = dict(zip(symbols, histories))
+        for group in groups.values():
+            matrix = np.vstack([by_symbol[symbol].close for symbol in group])
+            try:
+                with stage("projection"):
+                    group_results = await self.executor.run(build_batch, group, matrix)
+            except Exception as e:
+                logger.warning("Batch prediction for %s failed: %s", ",".join(group), e)
+                results.update({symbol: {"symbol": symbol, "error": str(e), "predictions": []} for symbol in group})
+                continue
+            for result in group_results:
+                results[result["symbol"]] = result
+                self.cache.set(cache_keys[result["symbol"]], result)
+        return results
+    
+    async def refresh(self, symbol: str, ttl: Optional[float] = None) -> dict:
+        """
+        Recompute the prediction for the current candle and publish it to
+        the cache, keeping it for ``ttl`` seconds instead of the default
+        cache TTL. Before request keys roll over to the new candle the
+        result is also served under the key requests still use.
+        """
+        cache_key = self._cache_key(symbol, lag=False)
+        joined = cache_key in self.singleflight
+        result = await self.singleflight.do(cache_key, lambda: self._compute(symbol, cache_key, ttl))
+        if "error" not in result and joined and ttl is not None:
+            # The request-path computation we joined cached it with the default TTL
+            self.cache.set(cache_key, result, ttl=ttl)
+            if self.shared is not None:
+                await self.shared.set(cache_key, result, ttl)
+        request_key = self._cache_key(symbol)
+        if "error" not in result and request_key != cache_key:
+            self.cache.set(request_key, result, ttl=self.cache_key_lag)
+        return result
+    
+    async def live(self, symbol: str) -> dict:
+        """
+        A prediction from freshly fetched candles, bypassing the cache, so
+        streaming sees price moves between hourly refreshes. The result is
+        not cached; concurrent calls for a symbol share one computation.
+        """
+        return await self.singleflight.do(f"live:{symbol}", lambda: self._compute_local(symbol, None))
+    
+    async def correlations(self, symbols: List[str], windows: List[int], concurrency: int = 8) -> dict:
+        """
+        Return correlation/covariance matrices of ``symbols`` for each window.
+        
+        Candles come from the shared candle store (delta fetches) and only
+        closed candles are used, so a result is cached for the whole candle.
+        Symbols whose candles cannot be fetched are listed under "missing".
+        """
+        cache_key = f"correlations:{self._cache_key(','.join(symbols))}:{','.join(map(str, windows))}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        return await self.singleflight.do(cache_key, lambda: self._compute_shared(
+            cache_key,
+            lambda: self._compute_correlations(symbols, windows, cache_key, concurrency),
+            ttl=CANDLE_INTERVAL_MS / 1000
+        ))
+    
+    async def _compute_correlations(self, symbols: List[str], windows: List[int], cache_key: str,
+                                    concurrency: int) -> dict:
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch(symbol: str) -> CandleView:
+            async with semaphore:
+                return await self.fetch_historical_data(symbol, days=30)
+        
+        histories = await asyncio.gather(*(fetch(symbol) for symbol in symbols))
+        available = [(symbol, history) for symbol, history in zip(symbols, histories) if len(history) > 2]
+        missing = [symbol for symbol, history in zip(symbols, histories) if len(history) <= 2]
+        if len(available) < 2:
+            return {"error": "Not enough symbols with historical data", "missing": missing}
+        
+        # Closed candles only (the last kline is still open), copied out of the store
+        try:
+            result = await self.executor.run(
+                build_correlations,
+                [symbol for symbol, _ in available],
+                [history.timestamp[:-1].copy() for _, history in available],
+                [history.close[:-1].copy() for _, history in available],
+                windows
+            )
+        except ValueError as e:
+            return {"error": str(e), "missing": missing}
+        result["missing"] = missing
+        self.cache.set(cache_key, result, ttl=CANDLE_INTERVAL_MS / 1000)
+        return result
+    
+    async def indicators(self, symbol: str, fields: Optional[List[str]] = None) -> dict:
+        """
+        Technical indicators without the price projection.
+        
+        Only the requested ``fields`` (INDICATOR_FIELDS plus "recommendation";
+        all by default) are computed. Results have their own cache entry per
+        field selection and share the candle store and indicator state with
+        predict().
+        """
+        self.fetcher.record(symbol)
+        if fields is None:
+            fields = list(INDICATOR_FIELDS) + ["recommendation"]
+        selection = ",".join(sorted(set(fields)))
+        cache_key = f"indicators:{self._cache_key(symbol)}:{selection}"
+        
+        cached, stale = self.cache.lookup(cache_key)
+        if cached is not None and not stale:
+            return cached
+        return await self.singleflight.do(cache_key, lambda: self._compute_shared(
+            cache_key, lambda: self._compute_indicators(symbol, cache_key, sorted(set(fields)))
+        ))
+    
+    async def _compute_indicators(self, symbol: str, cache_key: str, fields: List[str]) -> dict:
+        with stage("fetch"):
+            historical = await self.fetch_historical_data(symbol, days=30)
         if not historical:
             return {
                 "symbol": symbol,
-                "error": "Failed to fetch historical data",
-                "predictions": []
+                "error": "Failed to fetch historical data"
             }
         
-        # Extract close prices
-        close_prices = [h["close"] for h in historical]
-        current_price = close_prices[-1]
-        
-        # Calculate indicators
-        sma_20 = self.calculate_sma(close_prices, 20)
-        sma_50 = self.calculate_sma(close_prices, 50)
-        ema_12 = self.calculate_ema(close_prices, 12)
-        ema_26 = self.calculate_ema(close_prices, 26)
-        rsi = self.calculate_rsi(close_prices)
-        trend = self.predict_trend(close_prices)
-        
-        # Calculate volatility
-        returns = [(close_prices[i] - close_prices[i-1]) / close_prices[i-1] 
-                   for i in range(1, len(close_prices))]
-        volatility = np.std(returns) * 100
-        
-        # Generate predictions
-        # Simple linear regression based on recent trend
-        recent_prices = close_prices[-24:]  # Last 24 hours
-        x = np.arange(len(recent_prices))
-        slope = np.polyfit(x, recent_prices, 1)[0]
-        
-        predictions = []
-        timeframes = [
-            ("1h", 1),
-            ("4h", 4),
-            ("24h", 24),
-            ("7d", 168)
-        ]
-        
-        for label, hours in timeframes:
-            # Predict based on trend + mean reversion
-            trend_factor = 1 + (slope / current_price) * hours * 0.5
-            
-            # Mean reversion factor (RSI based)
-            if rsi > 70:
-                mean_reversion = 0.98  # Overbought - expect pullback
-            elif rsi < 30:
-                mean_reversion = 1.02  # Oversold - expect bounce
-            else:
-                mean_reversion = 1.0
-            
-            predicted_price = current_price * trend_factor * mean_reversion
-            change_percent = ((predicted_price - current_price) / current_price) * 100
-            
-            # Confidence based on volatility and trend strength
-            trend_strength = abs(sma_20 - sma_50) / current_price * 100
-            confidence = max(30, min(85, 70 - volatility * 2 + trend_strength * 5))
-            
-            predictions.append({
-                "timeframe": label,
-                "predicted_price": round(predicted_price, 2),
-                "change_percent": round(change_percent, 2),
-                "confidence": round(confidence, 1)
-            })
+        wants_recommendation = "recommendation" in fields
+        requested = [name for name in fields if name in INDICATOR_FIELDS]
+        needed = set(requested) | ({"rsi", "trend"} if wants_recommendation else set())
+        
+        values = await self._indicator_step(
+            symbol, historical, fields=[field for field in INDICATOR_FIELDS if field in needed]
+        )
         
         result = {
             "symbol": symbol,
-            "current_price": round(current_price, 2),
+            "current_price": round(values["current_price"], 2),
             "timestamp": datetime.now().isoformat(),
             "indicators": {
-                "sma_20": round(sma_20, 2),
-                "sma_50": round(sma_50, 2),
-                "ema_12": round(ema_12, 2),
-                "ema_26": round(ema_26, 2),
-                "rsi": round(rsi, 2),
-                "volatility": round(volatility, 2),
-                "trend": trend
-            },
-            "predictions": predictions,
-            "recommendation": self._get_recommendation(rsi, trend)
+                name: values[name] if name == "trend" else round(values[name], 2)
+                for name in requested
+            }
         }
+        if wants_recommendation:
+            result["recommendation"] = self._get_recommendation(values["rsi"], values["trend"])
+        
+        self.cache.set(cache_key, result)
+        return result
+    
+    def _cache_key(self, symbol: str, lag: bool = True) -> str:
+        # Keyed by the source's candle hour, which runs fast during replay.
+        # Request keys roll over ``cache_key_lag`` seconds after the hour, once
+        # the precompute run has published the new candle's entries.
+        now_ms = self.source.now_ms() - (self.cache_key_lag * 1000 if lag else 0)
+        hour = datetime.fromtimestamp(now_ms / 1000)
+        return f"{symbol}_{hour.strftime('%Y%m%d%H')}"
+    
+    def _revalidate(self, symbol: str, cache_key: str):
+        """Refresh a stale entry in the background while it keeps being served"""
+        if cache_key in self.singleflight:
+            return
+        task = asyncio.ensure_future(
+            self.singleflight.do(cache_key, lambda: self._compute(symbol, cache_key))
+        )
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _compute(self, symbol: str, cache_key: str, ttl: Optional[float] = None) -> dict:
+        """Compute a prediction once per cluster"""
+        return await self._compute_shared(cache_key, lambda: self._compute_local(symbol, cache_key, ttl), ttl)
+    
+    async def _compute_shared(self, cache_key: str, compute: Callable[[], Awaitable[dict]],
+                              ttl: Optional[float] = None) -> dict:
+        """
+        Run ``compute`` for a cache key once per cluster.
+        
+        With a shared cache the result is taken from L2 when another worker
+        published it; otherwise the worker holding the L2 lock for the key
+        computes and publishes it while the others wait for it. A worker
+        that waits longer than PREDICTION_LOCK_WAIT computes on its own.
+        """
+        if self.shared is None:
+            return await compute()
+        
+        entry = await self.shared.get(cache_key)
+        if entry is None:
+            token = await self.shared.acquire(cache_key)
+            if token is None:
+                entry = await self.shared.wait_for(cache_key)
+            else:
+                try:
+                    # The previous holder may have published just before we locked
+                    entry = await self.shared.get(cache_key)
+                    if entry is None:
+                        result = await compute()
+                        if "error" not in result:
+                            await self.shared.set(cache_key, result, self.cache_ttl if ttl is None else ttl)
+                        return result
+                finally:
+                    await self.shared.release(cache_key, token)
+        
+        if entry is None:
+            return await compute()
+        result, remaining = entry
+        self.cache.set(cache_key, result, ttl=remaining)
+        return result
+    
+    async def _compute_local(self, symbol: str, cache_key: Optional[str], ttl: Optional[float] = None) -> dict:
+        """Fetch, compute and cache a prediction for one cache key (None = not cached)"""
+        # Fetch historical data
+        with stage("fetch"):
+            historical = await self.fetch_historical_data(symbol, days=30)
+        
+        if not historical:
+            return {
+                "symbol": symbol,
+                "error": "Failed to fetch historical data",
+                "predictions": []
+            }
+        
+        # Indicators, regression and projection run off the event loop
+        result = await self._indicator_step(symbol, historical, predict=True)
         
         # Cache result
-        self.cache[cache_key] = result
+        if cache_key is not None:
+            self.cache.set(cache_key, result, ttl=ttl)
         
         return result
     
     def _get_recommendation(self, rsi: float, trend: str) -> dict:
         """Generate trading recommendation based on indicators"""
-        if rsi < 30 and trend in ["neutral", "bullish"]:
-            return {
-                "action": "BUY",
-                "strength": "strong",
-                "reason": "Oversold conditions with potential reversal"
-            }
-        elif rsi > 70 and trend in ["neutral", "bearish"]:
-            return {
-                "action": "SELL",
-                "strength": "strong",
-                "reason": "Overbought conditions with potential pullback"
-            }
-        elif trend == "bullish" and 30 <= rsi <= 70:
-            return {
-                "action": "BUY",
-                "strength": "moderate",
-                "reason": "Bullish trend continuation expected"
-            }
-        elif trend == "bearish" and 30 <= rsi <= 70:
-            return {
-                "action": "SELL",
-                "strength": "moderate",
-                "reason": "Bearish trend continuation expected"
-            }
-        else:
-            return {
-                "action": "HOLD",
-                "strength": "neutral",
-                "reason": "No clear signal - wait for better entry"
-            }
+        return get_recommendation(rsi, trend)
 
 # Global predictor instance
 predictor = PricePredictor()
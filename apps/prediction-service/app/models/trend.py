@@ -0,0 +1,167 @@
+"""
+Closed-form rolling linear regression for trend projection
+"""
+import math
+import numpy as np
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+
+REGRESSION_WINDOWS = (24, 72, 168)
+
+
+def _fit(count: int, sum_y: float, sum_xy: float, sum_yy: float) -> Tuple[float, float, float]:
+    """
+    Least-squares line through ``count`` points at x = 0..count-1 from
+    running sums. Returns (slope, intercept at x = 0, R²).
+    """
+    if count < 2:
+        return 0.0, sum_y / count if count else 0.0, 0.0
+    sum_x = count * (count - 1) / 2
+    sum_xx = (count - 1) * count * (2 * count - 1) / 6
+    cov = count * sum_xy - sum_x * sum_y
+    var_x = count * sum_xx - sum_x * sum_x
+    var_y = count * sum_yy - sum_y * sum_y
+    slope = cov / var_x
+    intercept = (sum_y - slope * sum_x) / count
+    r2 = cov * cov / (var_x * var_y) if var_y > 0 else 0.0
+    return slope, intercept, min(1.0, max(0.0, r2))
+
+
+class RollingRegression:
+    """
+    Regression of price on time over the last ``window`` candles.
+
+    Keeps Σy, Σxy and Σy² (x = 0 for the oldest candle in the window), so
+    sliding the window by one candle is O(1). Prices are centered on a
+    reference value to limit cancellation in the sums.
+    """
+
+    def __init__(self, window: int, reference: float = 0.0):
+        self.window = window
+        self.reference = reference
+        self.count = 0
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_yy = 0.0
+
+    def slide(self, y: float, dropped: Optional[float]) -> Tuple[int, float, float, float]:
+        """Sums after appending centered price ``y`` (``dropped`` leaves the window)"""
+        if self.count < self.window:
+            return (
+                self.count + 1,
+                self.sum_y + y,
+                self.sum_xy + self.count * y,
+                self.sum_yy + y * y,
+            )
+        return (
+            self.count,
+            self.sum_y - dropped + y,
+            self.sum_xy - (self.sum_y - dropped) + (self.window - 1) * y,
+            self.sum_yy - dropped * dropped + y * y,
+        )
+
+    def reset(self, centered: np.ndarray):
+        """Recompute the sums exactly from the newest centered prices"""
+        values = np.asarray(centered[-self.window:], dtype=np.float64)
+        self.count = len(values)
+        self.sum_y = math.fsum(values)
+        self.sum_xy = float(np.arange(self.count) @ values)
+        self.sum_yy = float(values @ values)
+
+    def fit(self, sums: Optional[Tuple[int, float, float, float]] = None) -> Dict[str, float]:
+        count, sum_y, sum_xy, sum_yy = sums or (self.count, self.sum_y, self.sum_xy, self.sum_yy)
+        slope, intercept, r2 = _fit(count, sum_y, sum_xy, sum_yy)
+        return {"slope": slope, "intercept": intercept + self.reference, "r2": r2, "count": count}
+
+
+class TrendEngine:
+    """Rolling regressions for several window lengths over one price series"""
+
+    def __init__(self, windows: Iterable[int] = REGRESSION_WINDOWS):
+        self.windows = tuple(sorted(set(windows)))
+        self.reference: Optional[float] = None
+        self._prices: deque = deque(maxlen=max(self.windows))
+        self._regressions = {window: RollingRegression(window) for window in self.windows}
+        self._since_resync = 0
+
+    def seed(self, prices):
+        """Initialize all windows from the newest closed prices"""
+        prices = np.asarray(prices, dtype=np.float64)
+        self._prices.clear()
+        if len(prices) == 0:
+            return
+        self.reference = float(prices[-1])
+        self._prices.extend((prices[-self._prices.maxlen:] - self.reference).tolist())
+        self._resync()
+
+    def _resync(self):
+        centered = np.fromiter(self._prices, dtype=np.float64, count=len(self._prices))
+        for regression in self._regressions.values():
+            regression.reference = self.reference or 0.0
+            regression.reset(centered)
+        self._since_resync = 0
+
+    def _dropped(self, window: int) -> Optional[float]:
+        return self._prices[-window] if len(self._prices) >= window else None
+
+    def update(self, price: float):
+        """Slide every window by one closed candle"""
+        if self.reference is None:
+            self.seed([price])
+            return
+        y = float(price) - self.reference
+        for window, regression in self._regressions.items():
+            sums = regression.slide(y, self._dropped(window))
+            regression.count, regression.sum_y, regression.sum_xy, regression.sum_yy = sums
+        self._prices.append(y)
+
+        self._since_resync += 1
+        if self._since_resync >= self._prices.maxlen:
+            self._resync()
+
+    def fit(self, price: Optional[float] = None) -> Dict[int, Dict[str, float]]:
+        """
+        Slope, intercept and R² for every window. With ``price`` the fits
+        include it as the still-open candle, without changing the engine.
+        """
+        if self.reference is None:
+            if price is None:
+                return {window: _empty_fit() for window in self.windows}
+            engine = TrendEngine(self.windows)
+            engine.seed([price])
+            return engine.fit()
+
+        fits = {}
+        for window, regression in self._regressions.items():
+            sums = None
+            if price is not None:
+                sums = regression.slide(float(price) - self.reference, self._dropped(window))
+            fits[window] = regression.fit(sums)
+        return fits
+
+
+def _empty_fit() -> Dict[str, float]:
+    return {"slope": 0.0, "intercept": 0.0, "r2": 0.0, "count": 0}
+
+
+def regression(prices, window: int) -> Dict[str, np.ndarray]:
+    """
+    Vectorized least-squares fit over the last ``window`` prices of every
+    row (1-D input is a single row). Intercept is at the oldest point.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    recent = prices[..., -window:]
+    count = recent.shape[-1]
+    x = np.arange(count) - (count - 1) / 2
+    centered = recent - recent.mean(axis=-1, keepdims=True)
+    sxx = x @ x
+    if count < 2 or sxx == 0:
+        zeros = np.zeros(recent.shape[:-1])
+        return {"slope": zeros, "intercept": recent[..., -1].copy(), "r2": zeros.copy()}
+
+    slope = centered @ x / sxx
+    intercept = recent.mean(axis=-1) - slope * (count - 1) / 2
+    syy = (centered * centered).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(syy > 0, (centered @ x) ** 2 / (sxx * syy), 0.0)
+    return {"slope": slope, "intercept": intercept, "r2": np.clip(r2, 0.0, 1.0)}
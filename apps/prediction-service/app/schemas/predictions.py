@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class BatchPredictionRequest(BaseModel):
+    symbols: List[str] = Field(..., min_length=1, max_length=50)
+    indicators: Optional[List[str]] = None
+    timeframes: Optional[List[str]] = None
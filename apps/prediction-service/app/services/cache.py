@@ -0,0 +1,112 @@
+"""
+Bounded in-process cache with TTL expiry and LRU eviction
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire after ``ttl`` seconds.
+
+    With ``stale_ttl`` > 0 an expired entry is kept for that many extra
+    seconds and returned by ``lookup`` flagged as stale, so the caller can
+    serve it while revalidating in the background.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 300,
+        stale_ttl: float = 0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        value, stale = self._peek(key)
+        return value is not None and not stale
+
+    def _peek(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        value, expires_at, stale_until = entry
+        now = self.clock()
+        if now < expires_at:
+            return value, False
+        if now < stale_until:
+            return value, True
+        return None, False
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        """Return ``(value, is_stale)``; value is None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, False
+
+        value, stale = self._peek(key)
+        if value is None:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None, False
+
+        self._entries.move_to_end(key)
+        if stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return value, stale
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value or ``default``"""
+        value, stale = self.lookup(key)
+        return default if value is None or stale else value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        now = self.clock()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at, expires_at + self.stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.set(key, value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
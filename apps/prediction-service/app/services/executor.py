@@ -0,0 +1,95 @@
+"""
+Executor for CPU-bound prediction math
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+from app.services.metrics import EXECUTOR_QUEUE_SECONDS
+
+PREDICTION_EXECUTOR = os.getenv("PREDICTION_EXECUTOR", "thread")
+PREDICTION_EXECUTOR_WORKERS = int(os.getenv("PREDICTION_EXECUTOR_WORKERS", 0)) or None
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+
+def _timed(fn: Callable[..., Any], *args) -> Tuple[float, Any]:
+    """Run ``fn`` in a worker and report when it started (wall clock, valid across processes)"""
+    return time.time(), fn(*args)
+
+
+class ComputeExecutor:
+    """
+    Runs the compute phase of a prediction off the event loop.
+
+    ``inline`` runs on the loop thread (no offload), ``thread`` uses a thread
+    pool and ``process`` a spawn-based process pool, so submitted functions
+    and their arguments must be picklable. Queue depth is the number of
+    submitted calls beyond what the workers can run at once.
+    """
+
+    def __init__(self, mode: str = PREDICTION_EXECUTOR, workers: Optional[int] = PREDICTION_EXECUTOR_WORKERS):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode {mode!r}. Available: {EXECUTOR_MODES}")
+        self.mode = mode
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._pool: Optional[Executor] = None
+
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        if self.mode == "inline":
+            return 0
+        return max(0, self.in_flight - self.workers)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="predict")
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            if self.mode == "inline":
+                result = fn(*args)
+            else:
+                loop = asyncio.get_running_loop()
+                submitted = time.time()
+                started, result = await loop.run_in_executor(self._get_pool(), _timed, fn, *args)
+                EXECUTOR_QUEUE_SECONDS.observe(max(0.0, started - submitted))
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,272 @@
+"""
+Market data sources the predictor reads hourly klines from
+"""
+import asyncio
+import os
+import time
+import zlib
+import numpy as np
+import aiohttp
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from app.models.candles import FIELDS, candle_files, load_candles, parse_klines
+from app.services.http import create_session
+
+CANDLE_INTERVAL_MS = 60 * 60 * 1000  # 1h klines
+
+MARKET_DATA_SOURCE = os.getenv("MARKET_DATA_SOURCE", "http")
+BINANCE_API_URL = os.getenv("BINANCE_API_URL", "https://api.binance.com")
+REPLAY_DATA_DIR = os.getenv("REPLAY_DATA_DIR", "data/candles")
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", 60))
+REPLAY_START = os.getenv("REPLAY_START", "")
+SYNTHETIC_LATENCY_MS = float(os.getenv("SYNTHETIC_LATENCY_MS", 0))
+SYNTHETIC_SEED = int(os.getenv("SYNTHETIC_SEED", 0))
+
+_TIMESTAMP = FIELDS.index("timestamp")
+
+
+class MarketDataError(Exception):
+    """
+    A source could not return candles; ``status`` labels the failure and
+    ``retry_after`` is the wait (seconds) the upstream asked for, if any.
+    """
+
+    def __init__(self, message: str, status: str = "error", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class MarketDataSource(ABC):
+    """
+    Where hourly klines come from.
+
+    ``fetch_klines`` returns a (6, n) array in ``parse_klines`` layout,
+    oldest first, whose last candle is the one still open at ``now_ms()``.
+    With ``start_time`` it returns candles from that open time onwards,
+    otherwise the newest ``limit``. Failures raise MarketDataError.
+
+    Rate-limited sources report the weight of a request through
+    ``request_weight`` and the used weight the upstream returns through
+    ``on_used_weight``.
+    """
+
+    name = "base"
+    on_used_weight: Optional[Callable[[int], None]] = None
+
+    def request_weight(self, limit: int) -> int:
+        """Upstream rate-limit weight of a klines request (0 = unlimited)"""
+        return 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def now_ms(self) -> int:
+        """Current time on the source's clock, in epoch milliseconds"""
+        return int(time.time() * 1000)
+
+    @abstractmethod
+    async def fetch_klines(self, symbol: str, limit: int, start_time: Optional[int] = None) -> np.ndarray:
+        """Klines for ``symbol``; see the class docstring"""
+
+
+class HTTPSource(MarketDataSource):
+    """Binance-compatible /api/v3/klines over the shared pooled session"""
+
+    name = "http"
+
+    def __init__(self, base_url: str = BINANCE_API_URL):
+        self.base_url = base_url
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def request_weight(self, limit: int) -> int:
+        # Binance klines weight grows with the requested limit
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
+
+    async def start(self):
+        if self.session is None or self.session.closed:
+            self.session = create_session()
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def fetch_klines(self, symbol: str, limit: int, start_time: Optional[int] = None) -> np.ndarray:
+        params = {
+            "symbol": f"{symbol}USDT",
+            "interval": "1h",
+            "limit": limit
+        }
+        if start_time is not None:
+            params["startTime"] = start_time
+
+        # Reuse pooled keep-alive connections; open lazily outside the app
+        await self.start()
+        try:
+            async with self.session.get(f"{self.base_url}/api/v3/klines", params=params) as response:
+                used = response.headers.get("X-MBX-USED-WEIGHT-1M")
+                if used is not None and used.isdigit() and self.on_used_weight is not None:
+                    self.on_used_weight(int(used))
+                if response.status != 200:
+                    retry_after = response.headers.get("Retry-After")
+                    raise MarketDataError(
+                        f"HTTP {response.status}",
+                        status=str(response.status),
+                        retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+                    )
+                return parse_klines(await response.json())
+        except asyncio.TimeoutError:
+            raise MarketDataError("request timed out", status="timeout")
+        except aiohttp.ClientError as e:
+            raise MarketDataError(str(e))
+
+
+class ReplaySource(MarketDataSource):
+    """
+    Replays local candle files (``{SYMBOL}.csv|json|npy|parquet``) on a
+    virtual clock running ``speed`` times faster than real time.
+
+    The clock starts at ``start`` (epoch ms), by default far enough into the
+    data for a full ``history``-candle window. With ``speed=0`` it only
+    moves through ``advance``, for stepping through data at full speed.
+    The open candle is returned with its final values.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        directory: str = REPLAY_DATA_DIR,
+        speed: float = REPLAY_SPEED,
+        start: Optional[int] = None,
+        history: int = 720
+    ):
+        self.directory = directory
+        self.speed = speed
+        self.history = history
+        self._start = start
+        self._files: Optional[Dict[str, str]] = None
+        self._candles: Dict[str, np.ndarray] = {}
+        self._origin: Optional[int] = None
+        self._started_at = time.monotonic()
+        self._offset_ms = 0
+
+    def _load(self, symbol: str) -> np.ndarray:
+        candles = self._candles.get(symbol)
+        if candles is None:
+            if self._files is None:
+                self._files = candle_files(self.directory)
+            if symbol not in self._files:
+                raise MarketDataError(f"no replay file for {symbol}", status="missing")
+            candles = self._candles[symbol] = load_candles(self._files[symbol])
+            if self._origin is None:
+                timestamps = candles[_TIMESTAMP]
+                self._origin = self._start if self._start is not None else int(
+                    timestamps[min(self.history, len(timestamps) - 1)]
+                )
+                self._started_at = time.monotonic()
+        return candles
+
+    def now_ms(self) -> int:
+        if self._origin is None:
+            return int(time.time() * 1000)
+        elapsed = (time.monotonic() - self._started_at) * 1000 * self.speed
+        return int(self._origin + self._offset_ms + elapsed)
+
+    def advance(self, candles: int = 1):
+        """Move the replay clock forward by whole candles"""
+        self._offset_ms += candles * CANDLE_INTERVAL_MS
+
+    async def fetch_klines(self, symbol: str, limit: int, start_time: Optional[int] = None) -> np.ndarray:
+        candles = self._load(symbol)
+        timestamps = candles[_TIMESTAMP]
+        end = int(np.searchsorted(timestamps, self.now_ms(), side="right"))
+        if start_time is not None:
+            begin = int(np.searchsorted(timestamps, start_time, side="left"))
+            return candles[:, begin:min(end, begin + limit)].copy()
+        return candles[:, max(0, end - limit):end].copy()
+
+
+class SyntheticSource(MarketDataSource):
+    """
+    Deterministic random-walk candles for load tests, on the real clock.
+    Each symbol's path is seeded from its name; ``latency_ms`` simulates
+    the network round trip.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, seed: int = SYNTHETIC_SEED, latency_ms: float = SYNTHETIC_LATENCY_MS,
+                 history: int = 2000):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.history = history
+        self._closes: Dict[str, np.ndarray] = {}
+        self._first: Dict[str, int] = {}
+
+    def _path(self, symbol: str, current: int) -> np.ndarray:
+        """Closes from the symbol's first candle through the ``current`` open time"""
+        if symbol not in self._first:
+            self._first[symbol] = current - (self.history - 1) * CANDLE_INTERVAL_MS
+            self._closes[symbol] = np.empty(0)
+        needed = (current - self._first[symbol]) // CANDLE_INTERVAL_MS + 1
+        closes = self._closes[symbol]
+        if len(closes) < needed:
+            rng = np.random.default_rng((zlib.crc32(symbol.encode()), self.seed, len(closes)))
+            steps = rng.normal(0, 0.01, needed - len(closes))
+            base = closes[-1] if len(closes) else 100.0 * (1 + zlib.crc32(symbol.encode()) % 1000)
+            closes = self._closes[symbol] = np.concatenate([closes, base * np.exp(np.cumsum(steps))])
+        return closes
+
+    async def fetch_klines(self, symbol: str, limit: int, start_time: Optional[int] = None) -> np.ndarray:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        now = self.now_ms()
+        current = now - now % CANDLE_INTERVAL_MS
+        closes = self._path(symbol, current)
+        first = self._first[symbol]
+
+        end = len(closes)
+        if start_time is not None:
+            begin = max(0, (start_time - first + CANDLE_INTERVAL_MS - 1) // CANDLE_INTERVAL_MS)
+            end = min(end, begin + limit)
+        else:
+            begin = max(0, end - limit)
+
+        close = closes[begin:end]
+        opens = np.concatenate([closes[begin - 1:begin] if begin else close[:1], close[:-1]])
+        spread = np.abs(close - opens) + close * 0.002
+        return np.vstack([
+            first + np.arange(begin, end, dtype=np.float64) * CANDLE_INTERVAL_MS,
+            opens,
+            np.maximum(opens, close) + spread / 2,
+            np.minimum(opens, close) - spread / 2,
+            close,
+            np.full(len(close), 1000.0),
+        ])
+
+
+MARKET_DATA_SOURCES = {
+    source.name: source for source in (HTTPSource, ReplaySource, SyntheticSource)
+}
+
+
+def create_source(kind: str = MARKET_DATA_SOURCE) -> MarketDataSource:
+    """Build the configured source (MARKET_DATA_SOURCE: http, replay or synthetic)"""
+    if kind not in MARKET_DATA_SOURCES:
+        raise ValueError(f"Unknown market data source {kind!r}. Available: {list(MARKET_DATA_SOURCES)}")
+    if kind == ReplaySource.name and REPLAY_START:
+        start = int(datetime.fromisoformat(REPLAY_START).timestamp() * 1000)
+        return ReplaySource(start=start)
+    return MARKET_DATA_SOURCES[kind]()
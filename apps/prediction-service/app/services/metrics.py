@@ -0,0 +1,200 @@
+"""
+Prometheus metrics for the prediction service
+"""
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+from prometheus_client import REGISTRY, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", 0.5))
+
+# Upstream and request latencies (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# In-process stages and loop lag are usually well under a millisecond
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+STAGES = ("fetch", "indicators", "regression", "projection", "serialize")
+
+UPSTREAM_FETCH_SECONDS = Histogram(
+    "prediction_upstream_fetch_seconds",
+    "Latency of klines requests to the market data source",
+    ["source", "symbol", "status"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_FETCHES_IN_FLIGHT = Gauge(
+    "prediction_upstream_fetches_in_flight",
+    "Upstream klines requests currently waiting for a response"
+)
+STAGE_SECONDS = Histogram(
+    "prediction_stage_seconds",
+    "Time spent in each stage of computing a prediction",
+    ["stage"],
+    buckets=FAST_BUCKETS
+)
+EXECUTOR_QUEUE_SECONDS = Histogram(
+    "prediction_executor_queue_seconds",
+    "Time compute calls wait for a free executor worker",
+    buckets=FAST_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "prediction_http_request_seconds",
+    "Time until response headers, by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "prediction_http_requests_in_flight",
+    "HTTP requests currently being handled"
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "prediction_event_loop_lag_seconds",
+    "Delay of a periodic timer on the event loop beyond its schedule",
+    buckets=FAST_BUCKETS
+)
+
+_stage_metrics = {name: STAGE_SECONDS.labels(name) for name in STAGES}
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one prediction stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def observe_stage(name: str, seconds: float):
+    """Record a stage timed elsewhere, e.g. inside an executor worker"""
+    _stage_metrics[name].observe(seconds)
+
+
+class ServiceCollector:
+    """
+    Exposes counters the service already keeps (caches, executor,
+    single-flight, streaming) at scrape time, so hot paths pay nothing.
+    """
+
+    def __init__(self, predictor, responses=None, stream=None):
+        self.predictor = predictor
+        self.responses = responses
+        self.stream = stream
+
+    def collect(self):
+        events = CounterMetricFamily(
+            "prediction_cache_events", "Cache lookups and removals", labels=["cache", "event"]
+        )
+        entries = GaugeMetricFamily("prediction_cache_entries", "Entries held per cache", labels=["cache"])
+
+        cache = self.predictor.cache.stats()
+        for event, key in (("hit", "hits"), ("stale_hit", "stale_hits"), ("miss", "misses"),
+                           ("eviction", "evictions"), ("expiration", "expirations")):
+            events.add_metric(["prediction", event], cache[key])
+        entries.add_metric(["prediction"], cache["entries"])
+
+        if self.responses is not None:
+            responses = self.responses.stats()
+            events.add_metric(["response", "hit"], responses["hits"])
+            events.add_metric(["response", "miss"], responses["encoded"])
+            events.add_metric(["response", "eviction"], responses["evictions"])
+            entries.add_metric(["response"], responses["entries"])
+        shared = self.predictor.shared
+        if shared is not None:
+            stats = shared.stats()
+            for event, key in (("hit", "hits"), ("miss", "misses"), ("error", "errors"),
+                               ("lock_acquired", "locks_acquired"), ("lock_wait", "lock_waits"),
+                               ("lock_timeout", "lock_timeouts")):
+                events.add_metric(["shared", event], stats[key])
+        yield events
+        yield entries
+
+        executor = self.predictor.executor.stats()
+        yield GaugeMetricFamily(
+            "prediction_executor_in_flight", "Compute calls submitted and not finished", value=executor["in_flight"]
+        )
+        yield GaugeMetricFamily(
+            "prediction_executor_queue_depth", "Compute calls waiting for a worker", value=executor["queue_depth"]
+        )
+        calls = CounterMetricFamily("prediction_executor_calls", "Finished compute calls", labels=["outcome"])
+        calls.add_metric(["completed"], executor["completed"])
+        calls.add_metric(["failed"], executor["failed"])
+        yield calls
+
+        singleflight = self.predictor.singleflight.stats()
+        yield GaugeMetricFamily(
+            "prediction_computations_in_flight", "Distinct predictions being computed", value=singleflight["in_flight"]
+        )
+        yield CounterMetricFamily(
+            "prediction_coalesced_requests", "Requests that joined an in-flight computation",
+            value=singleflight["coalesced"]
+        )
+
+        upstream = self.predictor.fetcher.stats()
+        yield GaugeMetricFamily(
+            "prediction_upstream_weight_used", "Upstream request weight used in the current window",
+            value=upstream["used"]
+        )
+        yield GaugeMetricFamily(
+            "prediction_upstream_queue_depth", "Upstream requests waiting for weight budget",
+            value=upstream["waiting"]
+        )
+        requests = CounterMetricFamily(
+            "prediction_upstream_request_events", "Upstream request scheduling outcomes", labels=["event"]
+        )
+        for event, value in (("retry", upstream["retries"]), ("queued", upstream["queued"]),
+                             ("throttled", upstream["throttled"]), ("failure", upstream["failures"]),
+                             ("fallback", self.predictor.fallbacks)):
+            requests.add_metric([event], value)
+        yield requests
+
+        if self.stream is not None:
+            yield GaugeMetricFamily(
+                "prediction_stream_subscribers", "Connected streaming subscribers",
+                value=self.stream.stats()["subscribers"]
+            )
+
+
+_collector: Optional[ServiceCollector] = None
+
+
+def register_service(predictor, responses=None, stream=None):
+    """Register (or replace) the collector for the service's own counters"""
+    global _collector
+    if _collector is not None:
+        REGISTRY.unregister(_collector)
+    _collector = ServiceCollector(predictor, responses, stream)
+    REGISTRY.register(_collector)
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires: time the loop spent blocked"""
+
+    def __init__(self, interval: float = METRICS_LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG_SECONDS.observe(self.last_lag)
@@ -0,0 +1,110 @@
+"""
+Pre-encoded JSON responses with ETags
+"""
+import hashlib
+import json
+from typing import Any, Callable, Hashable, Iterable, Optional
+from fastapi import Request, Response
+from app.services.cache import TTLCache
+from app.services.metrics import stage
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode to compact JSON bytes, accepting NumPy scalars and arrays"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(",", ":"), default=_default).encode()
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class EncodedResponse:
+    """JSON body encoded once, plus the strong ETag derived from it"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: Optional[str] = None):
+        self.body = body
+        self.etag = etag or etag_for(body)
+
+    @classmethod
+    def encode(cls, payload: Any) -> "EncodedResponse":
+        return cls(dumps(payload))
+
+    @classmethod
+    def join(cls, prefix: bytes, parts: Iterable["EncodedResponse"], suffix: bytes) -> "EncodedResponse":
+        """Splice already-encoded parts into a JSON array without re-encoding them"""
+        return cls(prefix + b"[" + b",".join(part.body for part in parts) + b"]" + suffix)
+
+
+class ResponseCache:
+    """
+    Encoded responses memoized per source result.
+
+    Each entry remembers the result object it was rendered from, so a hit
+    needs no TTL of its own: it is valid exactly as long as the prediction
+    cache keeps returning that same object. A new result is encoded once
+    and replaces the entry.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self._entries = TTLCache(max_entries=max_entries, ttl=float("inf"))
+        self.hits = 0
+        self.encoded = 0
+
+    def get(self, key: Hashable, source: Any, render: Optional[Callable[[Any], Any]] = None) -> EncodedResponse:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is source:
+            self.hits += 1
+            return entry[1]
+        with stage("serialize"):
+            encoded = EncodedResponse.encode(render(source) if render else source)
+        self.encoded += 1
+        if not (isinstance(source, dict) and "error" in source):
+            self._entries.set(key, (source, encoded))
+        return encoded
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        stats = self._entries.stats()
+        return {
+            "encoder": "orjson" if orjson is not None else "json",
+            "entries": stats["entries"],
+            "max_entries": stats["max_entries"],
+            "hits": self.hits,
+            "encoded": self.encoded,
+            "evictions": stats["evictions"],
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag``"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def encoded_response(request: Request, encoded: EncodedResponse, status_code: int = 200) -> Response:
+    """Serve pre-encoded bytes, or 304 Not Modified when the client's ETag matches"""
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache"}
+    if status_code == 200 and etag_matches(request.headers.get("if-none-match"), encoded.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=encoded.body, status_code=status_code, media_type="application/json", headers=headers)
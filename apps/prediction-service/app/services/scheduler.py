@@ -0,0 +1,149 @@
+"""
+Background scheduler that precomputes predictions at candle close
+"""
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "true").lower() == "true"
+PRECOMPUTE_INTERVAL_SECONDS = float(os.getenv("PRECOMPUTE_INTERVAL_SECONDS", 3600))
+PRECOMPUTE_LEAD_SECONDS = float(os.getenv("PRECOMPUTE_LEAD_SECONDS", 5))
+PRECOMPUTE_JITTER_SECONDS = float(os.getenv("PRECOMPUTE_JITTER_SECONDS", 10))
+PRECOMPUTE_ON_STARTUP = os.getenv("PRECOMPUTE_ON_STARTUP", "false").lower() == "true"
+
+
+class PrecomputeScheduler:
+    """
+    Recompute and publish predictions for every symbol just after each
+    candle closes, so requests are served from the cache.
+
+    A run starts ``lead`` seconds after the candle boundary (giving the
+    exchange time to finalize the candle) plus a random ``jitter`` that
+    spreads workers apart. Published entries live until the next run, and
+    request cache keys roll over once the latest possible run has started,
+    so requests right after the boundary do not miss the cache.
+    ``on_result`` is awaited with each fresh prediction, e.g. to push it
+    to streaming subscribers.
+
+    Runs are timed on ``clock`` (epoch seconds), by default the predictor's
+    market data source, so they line up with the cache keys under a replay
+    clock too. The loop re-reads the clock at least every ``tick`` seconds
+    while waiting, since a source clock need not run at wall-clock speed.
+    """
+
+    def __init__(
+        self,
+        predictor,
+        symbols: List[str],
+        interval: float = PRECOMPUTE_INTERVAL_SECONDS,
+        lead: float = PRECOMPUTE_LEAD_SECONDS,
+        jitter: float = PRECOMPUTE_JITTER_SECONDS,
+        concurrency: int = 8,
+        enabled: bool = PRECOMPUTE_ENABLED,
+        on_result: Optional[Callable[[str, dict], Awaitable[None]]] = None,
+        clock: Optional[Callable[[], float]] = None,
+        tick: float = 1.0
+    ):
+        self.predictor = predictor
+        self.symbols = symbols
+        self.interval = interval
+        self.lead = lead
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.enabled = enabled
+        self.on_result = on_result
+        self.clock = clock or (lambda: self.predictor.source.now_ms() / 1000)
+        self.tick = tick
+
+        self.runs = 0
+        self.last_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.next_run: Optional[float] = None
+        self.results: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def next_run_after(self, now: float) -> float:
+        """Clock time of the first run after ``now``"""
+        boundary = (now // self.interval) * self.interval
+        run_at = boundary + self.lead + random.uniform(0, self.jitter)
+        if run_at <= now:
+            run_at += self.interval
+        return run_at
+
+    async def start(self):
+        if self.enabled and not self.running:
+            self.predictor.cache_key_lag = self.lead + self.jitter
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.next_run = None
+
+    async def _loop(self):
+        if PRECOMPUTE_ON_STARTUP:
+            await self.run_once()
+        while True:
+            self.next_run = self.next_run_after(self.clock())
+            remaining = self.next_run - self.clock()
+            while remaining > 0:
+                await asyncio.sleep(min(remaining, self.tick))
+                remaining = self.next_run - self.clock()
+            await self.run_once()
+
+    async def run_once(self):
+        """Recompute all symbols concurrently and record per-symbol status"""
+        self.last_started = self.clock()
+        # Keep entries until shortly after the following run has published
+        ttl = self.interval + self.lead + self.jitter + 60
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(symbol: str):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await self.predictor.refresh(symbol, ttl=ttl)
+                    error = result.get("error")
+                    if error is None and self.on_result is not None:
+                        await self.on_result(symbol, result)
+                except Exception as e:
+                    error = str(e)
+                self.results[symbol] = {
+                    "ok": error is None,
+                    "error": error,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "updated_at": datetime.now().isoformat()
+                }
+
+        await asyncio.gather(*(refresh(symbol) for symbol in self.symbols))
+        self.runs += 1
+        self.last_finished = self.clock()
+
+    def status(self) -> dict:
+        def iso(timestamp: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "lead_seconds": self.lead,
+            "jitter_seconds": self.jitter,
+            "runs": self.runs,
+            "last_started": iso(self.last_started),
+            "last_finished": iso(self.last_finished),
+            "next_run": iso(self.next_run),
+            "symbols": self.results
+        }
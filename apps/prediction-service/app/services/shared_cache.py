@@ -0,0 +1,251 @@
+"""
+Cluster-wide (L2) prediction cache and compute locks shared by workers
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+from app.services.responses import dumps
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library decoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_CACHE_REDIS_URL = os.getenv("PREDICTION_CACHE_REDIS_URL", "")
+PREDICTION_LOCK_TTL = float(os.getenv("PREDICTION_LOCK_TTL", 30))
+PREDICTION_LOCK_WAIT = float(os.getenv("PREDICTION_LOCK_WAIT", 10))
+PREDICTION_LOCK_POLL = float(os.getenv("PREDICTION_LOCK_POLL", 0.05))
+
+# Delete the lock only if it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class SharedCache(ABC):
+    """
+    Base for the L2 cache: JSON values with a TTL plus an exclusive,
+    expiring lock per key so only one worker computes a value.
+
+    Backend errors are logged and treated as misses (or as a free lock),
+    so an unavailable L2 degrades to per-worker caching.
+    """
+
+    backend = "base"
+
+    def __init__(
+        self,
+        namespace: str = "prediction",
+        lock_ttl: float = PREDICTION_LOCK_TTL,
+        lock_wait: float = PREDICTION_LOCK_WAIT,
+        poll: float = PREDICTION_LOCK_POLL
+    ):
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.poll = poll
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.locks_acquired = 0
+        self.lock_waits = 0
+        self.lock_timeouts = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.namespace}-lock:{key}"
+
+    @abstractmethod
+    async def _get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Stored bytes and remaining TTL, or None"""
+
+    @abstractmethod
+    async def _set(self, key: str, data: bytes, ttl: float):
+        """Store bytes for ``ttl`` seconds"""
+
+    @abstractmethod
+    async def _acquire(self, key: str, token: str, ttl: float) -> bool:
+        """Take the lock with ``token`` unless it is held"""
+
+    @abstractmethod
+    async def _release(self, key: str, token: str):
+        """Free the lock if it still holds ``token``"""
+
+    async def close(self):
+        pass
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, remaining_ttl)`` or None on a miss"""
+        try:
+            entry = await self._get(self._key(key))
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared cache read failed for %s: %s", key, e)
+            return None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        data, remaining = entry
+        return loads(data), remaining
+
+    async def set(self, key: str, value: Any, ttl: float):
+        try:
+            await self._set(self._key(key), dumps(value), ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared cache write failed for %s: %s", key, e)
+
+    async def acquire(self, key: str) -> Optional[str]:
+        """
+        Take the compute lock for ``key``. Returns a release token, an empty
+        token if the backend failed (compute locally), or None if another
+        worker holds the lock.
+        """
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self._acquire(self._lock_key(key), token, self.lock_ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared lock failed for %s: %s", key, e)
+            return ""
+        if acquired:
+            self.locks_acquired += 1
+            return token
+        return None
+
+    async def release(self, key: str, token: str):
+        if not token:
+            return
+        try:
+            await self._release(self._lock_key(key), token)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared lock release failed for %s: %s", key, e)
+
+    async def wait_for(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Poll for a value another worker is computing; None after ``lock_wait``"""
+        self.lock_waits += 1
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll)
+            try:
+                entry = await self._get(self._key(key))
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Shared cache read failed for %s: %s", key, e)
+                break
+            if entry is not None:
+                self.hits += 1
+                data, remaining = entry
+                return loads(data), remaining
+        self.lock_timeouts += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "locks_acquired": self.locks_acquired,
+            "lock_waits": self.lock_waits,
+            "lock_timeouts": self.lock_timeouts,
+        }
+
+
+class RedisSharedCache(SharedCache):
+    """L2 cache on Redis; locks are SET NX PX with a token-checked release"""
+
+    backend = "redis"
+
+    def __init__(self, url: str, **options):
+        super().__init__(**options)
+        import redis.asyncio as redis
+        self.client = redis.from_url(url)
+        self._release_script = self.client.register_script(_RELEASE_SCRIPT)
+
+    async def _get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            data, remaining_ms = await pipe.get(key).pttl(key).execute()
+        if data is None:
+            return None
+        return data, max(0.0, remaining_ms / 1000)
+
+    async def _set(self, key: str, data: bytes, ttl: float):
+        await self.client.set(key, data, px=max(1, int(ttl * 1000)))
+
+    async def _acquire(self, key: str, token: str, ttl: float) -> bool:
+        return bool(await self.client.set(key, token, nx=True, px=max(1, int(ttl * 1000))))
+
+    async def _release(self, key: str, token: str):
+        await self._release_script(keys=[key], args=[token])
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class FakeSharedCache(SharedCache):
+    """
+    In-process stand-in for Redis with the same expiry and lock semantics.
+    Share one instance between predictors to simulate several workers.
+    """
+
+    backend = "memory"
+
+    def __init__(self, clock=time.monotonic, **options):
+        super().__init__(**options)
+        self.clock = clock
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, float]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] <= self.clock():
+            del self._data[key]
+            return None
+        return entry
+
+    async def _get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        entry = self._live(key)
+        if entry is None:
+            return None
+        return entry[0], entry[1] - self.clock()
+
+    async def _set(self, key: str, data: bytes, ttl: float):
+        self._data[key] = (data, self.clock() + ttl)
+
+    async def _acquire(self, key: str, token: str, ttl: float) -> bool:
+        if self._live(key) is not None:
+            return False
+        self._data[key] = (token.encode(), self.clock() + ttl)
+        return True
+
+    async def _release(self, key: str, token: str):
+        entry = self._live(key)
+        if entry is not None and entry[0] == token.encode():
+            del self._data[key]
+
+
+def create_shared_cache(url: str = PREDICTION_CACHE_REDIS_URL) -> Optional[SharedCache]:
+    """L2 cache for ``url``: ``redis://...``, ``memory://`` (in-process fake) or none when empty"""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return FakeSharedCache()
+    return RedisSharedCache(url)
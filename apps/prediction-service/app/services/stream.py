@@ -0,0 +1,213 @@
+"""
+Push prediction updates to streaming subscribers
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", 15))
+STREAM_CHANGE_THRESHOLD_PERCENT = float(os.getenv("STREAM_CHANGE_THRESHOLD_PERCENT", 0.25))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 16))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", 30))
+
+
+class Subscription:
+    """
+    One subscriber's queue of encoded messages.
+
+    The queue is bounded: when a slow client falls behind, the oldest
+    message is dropped so it always catches up to the latest snapshot.
+    """
+
+    def __init__(self, symbols: Iterable[str], queue_size: int = STREAM_QUEUE_SIZE):
+        self.symbols: Set[str] = set(symbols)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def put(self, message: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Next message, or None if nothing arrives within ``timeout``"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PredictionStream:
+    """
+    Fan out prediction snapshots to streaming subscribers.
+
+    A single poll loop recomputes each subscribed symbol from fresh
+    candles (the cached prediction only changes hourly) and publishes
+    only when the candle closed or
+    the price moved by at least ``threshold`` percent, or the trend or
+    recommendation changed. Each message is encoded once and the same
+    string is queued to every subscriber of the symbol.
+    """
+
+    def __init__(
+        self,
+        predictor,
+        poll_interval: float = STREAM_POLL_SECONDS,
+        threshold: float = STREAM_CHANGE_THRESHOLD_PERCENT,
+        queue_size: int = STREAM_QUEUE_SIZE
+    ):
+        self.predictor = predictor
+        self.poll_interval = poll_interval
+        self.threshold = threshold
+        self.queue_size = queue_size
+
+        self.subscriptions: Set[Subscription] = set()
+        self.latest: Dict[str, dict] = {}
+        self._latest_messages: Dict[str, str] = {}
+        self._candles: Dict[str, Optional[int]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.published = 0
+        self.skipped = 0
+        self.delivered = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def symbols(self) -> List[str]:
+        """Symbols with at least one subscriber"""
+        return sorted({symbol for sub in self.subscriptions for symbol in sub.symbols})
+
+    def subscribe(self, symbols: Iterable[str]) -> Subscription:
+        """Register a subscriber; it first receives the latest known snapshots"""
+        subscription = Subscription(symbols, self.queue_size)
+        for symbol in sorted(subscription.symbols):
+            if symbol in self._latest_messages:
+                subscription.put(self._latest_messages[symbol])
+        self.subscriptions.add(subscription)
+        if self._wake is not None:
+            self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def _candle(self, symbol: str) -> Optional[int]:
+        state = self.predictor.states.get(symbol)
+        return state.last_timestamp if state is not None else None
+
+    def _change_reason(self, symbol: str, result: dict) -> Optional[str]:
+        previous = self.latest.get(symbol)
+        if previous is None:
+            return "snapshot"
+        if self._candle(symbol) != self._candles.get(symbol):
+            return "candle_close"
+        if previous["current_price"]:
+            moved = abs(result["current_price"] / previous["current_price"] - 1) * 100
+            if moved >= self.threshold:
+                return "threshold"
+        if result["indicators"]["trend"] != previous["indicators"]["trend"]:
+            return "trend_change"
+        if result["recommendation"]["action"] != previous["recommendation"]["action"]:
+            return "recommendation_change"
+        return None
+
+    def publish(self, symbol: str, result: dict, reason: Optional[str] = None) -> bool:
+        """
+        Push ``result`` to the symbol's subscribers if it differs enough
+        from the last published snapshot. An explicit ``reason`` (e.g. from
+        the candle-close scheduler) always publishes. Returns whether it did.
+        """
+        if "error" in result or result is self.latest.get(symbol):
+            return False
+        reason = reason or self._change_reason(symbol, result)
+        if reason is None:
+            self.skipped += 1
+            return False
+
+        message = json.dumps({"event": "prediction", "reason": reason, "symbol": symbol, "data": result})
+        self.latest[symbol] = result
+        self._latest_messages[symbol] = message
+        self._candles[symbol] = self._candle(symbol)
+        self.published += 1
+
+        for subscription in self.subscriptions:
+            if symbol in subscription.symbols:
+                subscription.put(message)
+                self.delivered += 1
+        return True
+
+    async def candle_closed(self, symbol: str, result: dict):
+        """Scheduler hook: publish the freshly precomputed prediction"""
+        self.publish(symbol, result, reason="candle_close")
+
+    async def start(self):
+        if not self.running:
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wake = None
+
+    async def _loop(self):
+        while True:
+            self._wake.clear()
+            await self.poll_once()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll_once(self):
+        """Read every subscribed symbol once and publish what changed"""
+        symbols = self.symbols()
+
+        async def poll(symbol: str):
+            try:
+                self.publish(symbol, await self.predictor.live(symbol))
+            except Exception as e:
+                logger.warning("Stream poll failed for %s: %s", symbol, e)
+
+        await asyncio.gather(*(poll(symbol) for symbol in symbols))
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "subscribers": len(self.subscriptions),
+            "symbols": self.symbols(),
+            "published": self.published,
+            "skipped": self.skipped,
+            "delivered": self.delivered,
+            "dropped": sum(sub.dropped for sub in self.subscriptions),
+            "poll_interval_seconds": self.poll_interval,
+            "threshold_percent": self.threshold,
+        }
+
+
+async def sse_events(stream: PredictionStream, subscription: Subscription,
+                     heartbeat: float = STREAM_HEARTBEAT_SECONDS):
+    """Server-sent events for one subscription, with comment heartbeats"""
+    try:
+        while True:
+            message = await subscription.get(timeout=heartbeat)
+            if message is None:
+                yield f": heartbeat {int(time.time())}\n\n"
+            else:
+                yield f"event: prediction\ndata: {message}\n\n"
+    finally:
+        stream.unsubscribe(subscription)
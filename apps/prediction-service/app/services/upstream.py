@@ -0,0 +1,228 @@
+"""
+Rate-limit-aware scheduling of upstream klines requests
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.services.market_data import MarketDataError, MarketDataSource
+from app.services.metrics import UPSTREAM_FETCH_SECONDS, UPSTREAM_FETCHES_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_WEIGHT_LIMIT = int(os.getenv("UPSTREAM_WEIGHT_LIMIT", 1200))
+UPSTREAM_WEIGHT_WINDOW = float(os.getenv("UPSTREAM_WEIGHT_WINDOW", 60))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", 3))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", 0.5))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", 10))
+UPSTREAM_MAX_QUEUE_WAIT = float(os.getenv("UPSTREAM_MAX_QUEUE_WAIT", 5))
+UPSTREAM_POPULARITY_HALFLIFE = float(os.getenv("UPSTREAM_POPULARITY_HALFLIFE", 3600))
+
+
+def retryable(status: str) -> bool:
+    """Throttling, timeouts, connection errors and 5xx are worth another attempt"""
+    return status in ("429", "418", "timeout", "error") or status.startswith("5")
+
+
+class WeightBudget:
+    """
+    Request weight spent in the current upstream window.
+
+    Windows are aligned to the wall clock like Binance's per-minute limit.
+    Local reservations are raised to the used weight the exchange reports
+    (``observe``), which also counts other workers behind the same IP.
+    """
+
+    def __init__(self, limit: int = UPSTREAM_WEIGHT_LIMIT, window: float = UPSTREAM_WEIGHT_WINDOW,
+                 clock=time.time):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.used = 0
+        self.blocked_until = 0.0
+        self._window_start = self._current_window()
+
+    def _current_window(self) -> float:
+        now = self.clock()
+        return now - now % self.window
+
+    def _roll(self):
+        start = self._current_window()
+        if start != self._window_start:
+            self._window_start = start
+            self.used = 0
+
+    def observe(self, used: int):
+        """Record the used weight reported by the exchange"""
+        self._roll()
+        self.used = max(self.used, used)
+
+    def block(self, seconds: float):
+        """Send nothing for ``seconds`` (429/418 Retry-After)"""
+        self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+    def try_reserve(self, weight: int) -> bool:
+        self._roll()
+        if self.clock() < self.blocked_until:
+            return False
+        # A request heavier than the whole limit still goes out in an empty window
+        if self.used + weight > self.limit and self.used > 0:
+            return False
+        self.used += weight
+        return True
+
+    def wait_time(self) -> float:
+        """Seconds until weight may free up"""
+        self._roll()
+        now = self.clock()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return max(0.0, self._window_start + self.window - now)
+
+    def stats(self) -> dict:
+        return {
+            "used": self.used,
+            "limit": self.limit,
+            "blocked_for": round(max(0.0, self.blocked_until - self.clock()), 3),
+        }
+
+
+class FetchScheduler:
+    """
+    Sends klines requests to a market data source within its weight budget.
+
+    Requests go straight out while the budget has room. Once it is spent
+    they queue, and are released as weight frees up in order of symbol
+    popularity (exponentially decayed request counts from ``record``), so
+    the symbols users ask for most keep fresh data. A request that cannot
+    be sent within ``max_wait`` fails as "throttled". Failed attempts that
+    may succeed later are retried with full-jitter exponential backoff,
+    honoring Retry-After. Sources with no request weight skip the budget.
+    """
+
+    def __init__(
+        self,
+        source: MarketDataSource,
+        budget: Optional[WeightBudget] = None,
+        retries: int = UPSTREAM_RETRIES,
+        backoff_base: float = UPSTREAM_BACKOFF_BASE,
+        backoff_max: float = UPSTREAM_BACKOFF_MAX,
+        max_wait: float = UPSTREAM_MAX_QUEUE_WAIT,
+        halflife: float = UPSTREAM_POPULARITY_HALFLIFE
+    ):
+        self.source = source
+        self.budget = budget or WeightBudget()
+        self.source.on_used_weight = self.budget.observe
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.halflife = halflife
+
+        self.requests = 0
+        self.retried = 0
+        self.queued = 0
+        self.throttled = 0
+        self.failures = 0
+        self._popularity: Dict[str, Tuple[float, float]] = {}
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self._drainer: Optional[asyncio.Task] = None
+
+    def record(self, symbol: str):
+        """Count a user request for ``symbol`` towards its priority"""
+        score, at = self._popularity.get(symbol, (0.0, 0.0))
+        now = time.monotonic()
+        self._popularity[symbol] = (self._decay(score, now - at) + 1, now)
+
+    def popularity(self, symbol: str) -> float:
+        score, at = self._popularity.get(symbol, (0.0, 0.0))
+        return self._decay(score, time.monotonic() - at)
+
+    def _decay(self, score: float, elapsed: float) -> float:
+        return score * math.pow(0.5, elapsed / self.halflife) if score else 0.0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def fetch(self, symbol: str, limit: int, start_time: Optional[int] = None) -> np.ndarray:
+        """``source.fetch_klines`` within the budget, retried; raises MarketDataError"""
+        weight = self.source.request_weight(limit)
+        attempt = 0
+        while True:
+            if weight:
+                await self._acquire(symbol, weight)
+            try:
+                return await self._attempt(symbol, limit, start_time)
+            except MarketDataError as e:
+                if e.retry_after:
+                    self.budget.block(e.retry_after)
+                if attempt >= self.retries or not retryable(e.status) or (e.retry_after or 0) > self.backoff_max:
+                    self.failures += 1
+                    raise
+                delay = e.retry_after or self.backoff(attempt)
+                logger.info("Retrying klines for %s in %.2fs after %s", symbol, delay, e.status)
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, symbol: str, limit: int, start_time: Optional[int]) -> np.ndarray:
+        status = "error"
+        started = time.perf_counter()
+        self.requests += 1
+        UPSTREAM_FETCHES_IN_FLIGHT.inc()
+        try:
+            batch = await self.source.fetch_klines(symbol, limit, start_time)
+            status = "ok"
+            return batch
+        except MarketDataError as e:
+            status = e.status
+            raise
+        except Exception as e:
+            raise MarketDataError(str(e)) from e
+        finally:
+            UPSTREAM_FETCHES_IN_FLIGHT.dec()
+            UPSTREAM_FETCH_SECONDS.labels(self.source.name, symbol, status).observe(time.perf_counter() - started)
+
+    async def _acquire(self, symbol: str, weight: int):
+        if not self._waiting and self.budget.try_reserve(weight):
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (-self.popularity(symbol), next(self._sequence), weight, future))
+        self.queued += 1
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.ensure_future(self._drain())
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self.throttled += 1
+            raise MarketDataError("upstream weight budget exhausted", status="throttled")
+
+    async def _drain(self):
+        """Release queued requests, most popular first, as the budget allows"""
+        while self._waiting:
+            _, _, weight, future = self._waiting[0]
+            if future.done():
+                heapq.heappop(self._waiting)
+            elif self.budget.try_reserve(weight):
+                heapq.heappop(self._waiting)
+                future.set_result(None)
+            else:
+                await asyncio.sleep(max(self.budget.wait_time(), 0.01))
+
+    def stats(self) -> dict:
+        return {
+            **self.budget.stats(),
+            "requests": self.requests,
+            "retries": self.retried,
+            "queued": self.queued,
+            "waiting": sum(1 for *_, future in self._waiting if not future.done()),
+            "throttled": self.throttled,
+            "failures": self.failures,
+        }
@@ -0,0 +1,38 @@
+"""
+Shared fixtures for Prediction Service tests
+"""
+import asyncio
+import numpy as np
+import pytest
+from app.models.candles import CandleView
+from app.models.predictor import PricePredictor, CANDLE_INTERVAL_MS
+
+
+def make_history(n=720, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 40000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return CandleView.from_klines([
+        [i * CANDLE_INTERVAL_MS, c, c, c, c, 1.0] for i, c in enumerate(closes)
+    ])
+
+
+@pytest.fixture
+def history():
+    return make_history()
+
+
+@pytest.fixture
+def predictor(history):
+    """Predictor whose upstream fetch returns a fixed history; symbol BAD fails"""
+    predictor = PricePredictor()
+    predictor.fetch_calls = 0
+
+    async def fake_fetch(symbol, days=30):
+        predictor.fetch_calls += 1
+        await asyncio.sleep(0.05)
+        if symbol == "BAD":
+            raise RuntimeError("boom")
+        return history
+
+    predictor.fetch_historical_data = fake_fetch
+    return predictor
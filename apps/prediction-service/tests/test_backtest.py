@@ -0,0 +1,94 @@
+"""
+Tests for the vectorized recommendation backtest
+"""
+import json
+import numpy as np
+import pytest
+from app.models import backtest, indicators
+from app.models.predictor import get_recommendation
+from conftest import make_history
+
+ACTIONS = {"BUY": backtest.BUY, "SELL": backtest.SELL, "HOLD": backtest.HOLD}
+TRENDS = {"bullish": backtest.BULLISH, "bearish": backtest.BEARISH, "neutral": backtest.NEUTRAL}
+
+
+def write_candles(directory, symbol, closes, suffix=".csv"):
+    rows = [[i * 3600000, c, c, c, c, 1.0] for i, c in enumerate(closes)]
+    path = directory / f"{symbol}{suffix}"
+    if suffix == ".csv":
+        lines = ["timestamp,open,high,low,close,volume"] + [",".join(map(str, row)) for row in rows]
+        path.write_text("\n".join(lines))
+    elif suffix == ".json":
+        path.write_text(json.dumps([[row[0]] + [str(v) for v in row[1:]] for row in rows]))
+    else:
+        np.save(path, np.array(rows))
+    return str(path)
+
+
+class TestSignals:
+    """Tests that vectorized signals match the live predictor"""
+
+    def test_recommendation_codes_match_get_recommendation(self):
+        rsi = np.array([0, 10, 29.9, 30, 50, 70, 70.1, 90, 100] * 3, dtype=float)
+        trend = np.repeat([backtest.BULLISH, backtest.NEUTRAL, backtest.BEARISH], 9)
+        codes = backtest.recommendation_codes(rsi, trend)
+        labels = {code: label for label, code in TRENDS.items()}
+        for value, label, code in zip(rsi, trend, codes):
+            assert code == ACTIONS[get_recommendation(value, labels[label])["action"]]
+
+    def test_series_match_latest_indicators(self):
+        closes = make_history(300).close
+        trend = backtest.trend_codes(closes)
+        rsi = indicators.rsi(closes)
+        for t in (49, 120, 299):
+            values = indicators.latest(closes[:t + 1])
+            assert trend[t] == TRENDS[str(values["trend"])]
+            assert rsi[t] == pytest.approx(float(values["rsi"]))
+
+
+class TestBacktest:
+    """Tests for hit rate, PnL and drawdown"""
+
+    def test_rising_market(self):
+        report = backtest.backtest(np.linspace(100, 200, 200))
+        assert report["trend_hit_rate"] == 1.0
+        assert report["max_drawdown_percent"] == pytest.approx(0.0)
+        assert report["evaluated"] == 200 - backtest.WARMUP_CANDLES
+
+    def test_pnl_and_drawdown_follow_positions(self):
+        closes = make_history(500, seed=3).close
+        report = backtest.backtest(closes, fee=0.001)
+        assert report["pnl_percent"] < backtest.backtest(closes)["pnl_percent"]
+        assert 0 <= report["max_drawdown_percent"] <= 100
+        assert sum(report["signals"].values()) == report["evaluated"]
+
+    def test_short_history_is_rejected(self):
+        with pytest.raises(ValueError):
+            backtest.backtest(np.ones(10))
+
+
+class TestCandleFiles:
+    """Tests for offline candle files and the process pool runner"""
+
+    @pytest.mark.parametrize("suffix", [".csv", ".json", ".npy"])
+    def test_formats_round_trip(self, tmp_path, suffix):
+        closes = make_history(100).close
+        path = write_candles(tmp_path, "BTC", closes, suffix)
+        candles = backtest.load_candles(path)
+        assert candles.shape == (6, 100)
+        np.testing.assert_allclose(candles[4], closes)
+
+    def test_run_in_process_pool(self, tmp_path):
+        for seed, symbol in enumerate(["BTC", "ETH"]):
+            write_candles(tmp_path, symbol, make_history(400, seed=seed).close)
+        (tmp_path / "BAD.csv").write_text("1,2,3,4,5,6\n")
+
+        files = backtest.candle_files(str(tmp_path))
+        results = backtest.run(files, workers=2)
+        assert set(results) == {"BAD", "BTC", "ETH"}
+        assert "error" in results["BAD"]
+        assert results["BTC"] == backtest.backtest_file(files["BTC"])
+
+    def test_missing_symbol(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            backtest.candle_files(str(tmp_path), ["BTC"])
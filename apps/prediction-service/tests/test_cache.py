@@ -0,0 +1,64 @@
+"""
+Tests for the TTL/LRU cache
+"""
+import pytest
+from app.services.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestTTLCache:
+    """Tests for expiry, eviction and stats"""
+
+    def test_hit_and_miss(self, clock):
+        cache = TTLCache(ttl=10, clock=clock)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_entries_expire_after_ttl(self, clock):
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+        clock.now = 10
+        assert cache.get("a") is None
+        assert len(cache) == 0
+        assert cache.stats()["expirations"] == 1
+
+    def test_per_entry_ttl(self, clock):
+        cache = TTLCache(ttl=10, clock=clock)
+        cache.set("a", 1, ttl=100)
+        clock.now = 50
+        assert cache.get("a") == 1
+
+    def test_least_recently_used_is_evicted(self, clock):
+        cache = TTLCache(max_entries=2, ttl=10, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "b" not in cache
+        assert "a" in cache and "c" in cache
+        assert cache.stats()["evictions"] == 1
+
+    def test_stale_while_revalidate(self, clock):
+        cache = TTLCache(ttl=10, stale_ttl=5, clock=clock)
+        cache.set("a", 1)
+        clock.now = 12
+        assert cache.lookup("a") == (1, True)
+        assert "a" not in cache
+        clock.now = 15
+        assert cache.lookup("a") == (None, False)
+        assert cache.stats()["stale_hits"] == 1
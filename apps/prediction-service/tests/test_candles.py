@@ -0,0 +1,132 @@
+"""
+Tests for delta kline fetching against a local fake klines server
+"""
+import asyncio
+import time
+import numpy as np
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.models.candles import CandleStore, parse_klines
+from app.models.predictor import PricePredictor, CANDLE_INTERVAL_MS
+
+
+class FakeKlines:
+    """
+    Minimal /api/v3/klines serving hourly candles.
+    The newest candle starts ``lag`` hours before the current hour.
+    """
+
+    def __init__(self, hours=2000, lag=0):
+        now = int(time.time() * 1000)
+        self.current = now - now % CANDLE_INTERVAL_MS - lag * CANDLE_INTERVAL_MS
+        self.first = self.current - (hours - 1) * CANDLE_INTERVAL_MS
+        self.requests = []
+
+    def candle(self, timestamp):
+        price = 100 + (timestamp - self.first) / CANDLE_INTERVAL_MS
+        return [timestamp, str(price), str(price), str(price), str(price), "1.0"]
+
+    async def handle(self, request):
+        params = dict(request.query)
+        self.requests.append(params)
+        limit = int(params.get("limit", 500))
+        if "startTime" in params:
+            start = int(params["startTime"])
+        else:
+            start = self.current - (limit - 1) * CANDLE_INTERVAL_MS
+        start = max(start, self.first)
+        stamps = range(start, self.current + 1, CANDLE_INTERVAL_MS)
+        return web.json_response([self.candle(t) for t in list(stamps)[:limit]])
+
+
+def run_with_server(fake, scenario):
+    async def run():
+        app = web.Application()
+        app.router.add_get("/api/v3/klines", fake.handle)
+        server = TestServer(app)
+        await server.start_server()
+        predictor = PricePredictor()
+        predictor.source.base_url = str(server.make_url("")).rstrip("/")
+        try:
+            return await scenario(predictor)
+        finally:
+            await predictor.close()
+            await server.close()
+
+    return asyncio.run(run())
+
+
+class TestCandleStore:
+    """Tests for merging batches into the columnar store"""
+
+    def batch(self, start, count, close=None):
+        return parse_klines([
+            [t, 1.0, 1.0, 1.0, float(t) if close is None else close, 1.0]
+            for t in range(start, start + count)
+        ])
+
+    def test_merge_replaces_open_candle_and_trims(self):
+        store = CandleStore(max_candles=5)
+        store.merge("BTC", self.batch(0, 4))
+        store.merge("BTC", np.hstack([self.batch(3, 1, close=99.0), self.batch(4, 3)]))
+        view = store.view("BTC")
+        assert view.timestamp.tolist() == [2, 3, 4, 5, 6]
+        assert view.close[1] == 99.0
+        assert store.last_timestamp("BTC") == 6
+
+    def test_views_are_contiguous_and_read_only(self):
+        store = CandleStore(max_candles=5)
+        for start in range(0, 40, 2):
+            store.merge("BTC", self.batch(start, 3))
+            view = store.view("BTC")
+            assert view.close.flags.c_contiguous
+            assert view.timestamp.tolist() == list(range(max(0, start - 2), start + 3))[-5:]
+        assert np.shares_memory(store.view("BTC").close, store.view("BTC", 2).close)
+        with pytest.raises(ValueError):
+            store.view("BTC").close[0] = 1.0
+
+    def test_memory_mapped_store_restarts_warm(self, tmp_path):
+        store = CandleStore(max_candles=5, directory=str(tmp_path))
+        store.merge("BTC", self.batch(0, 7))
+        store.flush()
+
+        restarted = CandleStore(max_candles=5, directory=str(tmp_path))
+        assert isinstance(restarted.view("BTC").close.base, np.memmap)
+        assert restarted.view("BTC").timestamp.tolist() == [2, 3, 4, 5, 6]
+        assert restarted.last_timestamp("BTC") == 6
+
+
+class TestDeltaFetch:
+    """Tests for fetch_historical_data using startTime"""
+
+    def test_second_fetch_only_requests_new_candles(self):
+        fake = FakeKlines(lag=1)
+
+        async def scenario(predictor):
+            first = await predictor.fetch_historical_data("BTC")
+            # The current hour opens upstream
+            fake.current += CANDLE_INTERVAL_MS
+            second = await predictor.fetch_historical_data("BTC")
+            return first, second
+
+        first, second = run_with_server(fake, scenario)
+        assert len(first) == len(second) == 720
+        assert "startTime" not in fake.requests[0]
+        assert int(fake.requests[1]["startTime"]) == first.timestamp[-1]
+        assert int(fake.requests[1]["limit"]) <= 3
+        assert second.timestamp[-1] == fake.current
+        assert second.timestamp[0] == first.timestamp[1]
+
+    def test_large_gap_falls_back_to_full_fetch(self):
+        fake = FakeKlines(hours=3000, lag=1000)
+
+        async def scenario(predictor):
+            await predictor.fetch_historical_data("BTC")
+            fake.current += 1000 * CANDLE_INTERVAL_MS
+            return await predictor.fetch_historical_data("BTC")
+
+        candles = run_with_server(fake, scenario)
+        assert "startTime" not in fake.requests[1]
+        assert len(candles) == 720
+        assert candles.timestamp[-1] == fake.current
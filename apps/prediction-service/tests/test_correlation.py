@@ -0,0 +1,85 @@
+"""
+Tests for cross-symbol correlation and covariance
+"""
+import asyncio
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.api import predictions
+from app.main import app
+from app.models.correlation import align, build_correlations, matrices
+from app.models.predictor import PricePredictor
+from app.services.market_data import SyntheticSource
+
+
+class TestMatrices:
+    """Tests for the vectorized matrix computation"""
+
+    def test_matches_numpy_reference(self):
+        rng = np.random.default_rng(5)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (4, 300)), axis=1))
+        result = matrices(closes, [24, 168])
+        rets = np.diff(closes, axis=1) / closes[:, :-1]
+        for window in (24, 168):
+            np.testing.assert_allclose(result[window]["covariance"], np.cov(rets[:, -window:]))
+            np.testing.assert_allclose(result[window]["correlation"], np.corrcoef(rets[:, -window:]))
+            assert result[window]["returns"] == window
+
+    def test_flat_series_has_zero_correlation(self):
+        closes = np.vstack([np.linspace(100, 110, 50) ** 1.01, np.full(50, 5.0)])
+        correlation = matrices(closes, [20])[20]["correlation"]
+        assert correlation[0, 1] == 0.0
+        assert correlation[1, 1] == 0.0
+
+    def test_alignment_on_shared_candles(self):
+        common, aligned = align(
+            [np.array([1, 2, 3, 4]), np.array([2, 3, 4, 5])],
+            [np.array([10, 20, 30, 40.0]), np.array([200, 300, 400, 500.0])]
+        )
+        assert common.tolist() == [2, 3, 4]
+        assert aligned.tolist() == [[20, 30, 40], [200, 300, 400]]
+
+    def test_disjoint_candles(self):
+        with pytest.raises(ValueError):
+            build_correlations(["A", "B"], [np.array([1, 2]), np.array([3, 4])],
+                               [np.ones(2), np.ones(2)], [2])
+
+
+class TestCorrelationsEndpoint:
+    """Tests for GET /api/predictions/correlations"""
+
+    def test_cached_per_candle(self):
+        predictor = PricePredictor(source=SyntheticSource())
+        calls = []
+        fetch = predictor.fetch_historical_data
+
+        async def counting_fetch(symbol, days=30):
+            calls.append(symbol)
+            return await fetch(symbol, days)
+
+        predictor.fetch_historical_data = counting_fetch
+
+        async def run():
+            first = await predictor.correlations(["BTC", "ETH", "SOL"], [24, 168])
+            second = await predictor.correlations(["BTC", "ETH", "SOL"], [24, 168])
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first is second
+        assert len(calls) == 3
+        assert first["symbols"] == ["BTC", "ETH", "SOL"]
+        assert np.array(first["windows"]["168"]["correlation"]).shape == (3, 3)
+        assert first["missing"] == []
+
+    def test_endpoint(self, monkeypatch):
+        monkeypatch.setattr(predictions, "predictor", PricePredictor(source=SyntheticSource()))
+        with TestClient(app) as client:
+            response = client.get("/api/predictions/correlations?windows=24&symbols=btc,eth")
+            invalid = client.get("/api/predictions/correlations?windows=1")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["symbols"] == ["BTC", "ETH"]
+        assert list(data["windows"]) == ["24"]
+        assert data["windows"]["24"]["correlation"][0][0] == 1.0
+        assert response.headers["etag"]
+        assert invalid.status_code == 400
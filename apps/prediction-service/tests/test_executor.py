@@ -0,0 +1,75 @@
+"""
+Tests for offloading prediction math from the event loop
+"""
+import asyncio
+import time
+import numpy as np
+import pytest
+from app.models.predictor import build_prediction
+from app.models.trend import TrendEngine
+from app.services.executor import ComputeExecutor
+
+VALUES = {
+    "current_price": 100.0, "sma_20": 99.0, "sma_50": 98.0, "ema_12": 99.5,
+    "ema_26": 99.0, "rsi": 55.0, "volatility": 1.0, "trend": "bullish",
+}
+
+
+def blocking_work(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestComputeExecutor:
+    """Tests for executor modes and queue metrics"""
+
+    @pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+    def test_modes_produce_same_prediction(self, mode):
+        executor = ComputeExecutor(mode=mode, workers=1)
+        engine = TrendEngine()
+        engine.seed(np.linspace(90, 100, 200))
+        fits = engine.fit()
+        try:
+            result = asyncio.run(executor.run(build_prediction, "BTC", VALUES, fits))
+        finally:
+            executor.shutdown()
+        expected = build_prediction("BTC", VALUES, fits)
+        assert result["predictions"] == expected["predictions"]
+        assert executor.stats()["completed"] == 1
+
+    def test_event_loop_stays_responsive(self):
+        executor = ComputeExecutor(mode="thread", workers=2)
+
+        async def run():
+            work = asyncio.ensure_future(executor.run(blocking_work, 0.3))
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag = time.perf_counter() - started
+            await work
+            return lag
+
+        try:
+            assert asyncio.run(run()) < 0.1
+        finally:
+            executor.shutdown()
+
+    def test_queue_depth(self):
+        executor = ComputeExecutor(mode="thread", workers=1)
+
+        async def run():
+            tasks = [asyncio.ensure_future(executor.run(blocking_work, 0.05)) for _ in range(4)]
+            await asyncio.sleep(0)
+            depth = executor.queue_depth
+            await asyncio.gather(*tasks)
+            return depth
+
+        try:
+            assert asyncio.run(run()) == 3
+        finally:
+            executor.shutdown()
+        assert executor.stats()["max_queue_depth"] == 3
+        assert executor.stats()["in_flight"] == 0
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            ComputeExecutor(mode="gpu")
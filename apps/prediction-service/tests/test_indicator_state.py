@@ -0,0 +1,105 @@
+"""
+Tests for incremental indicator state
+"""
+import asyncio
+import threading
+import numpy as np
+import pytest
+from app.models import indicators
+from app.models.candles import CandleView
+from app.models.indicator_state import IndicatorState
+from app.models.predictor import PricePredictor, CANDLE_INTERVAL_MS, advance_state
+
+FIELDS = ("sma_20", "sma_50", "ema_12", "ema_26", "rsi", "volatility")
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    return 40000 * np.exp(np.cumsum(rng.normal(0, 0.01, 1500)))
+
+
+def candles(closes, start=0):
+    return CandleView.from_klines([
+        [(start + i) * CANDLE_INTERVAL_MS, c, c, c, c, 1.0] for i, c in enumerate(closes)
+    ])
+
+
+class TestIndicatorState:
+    """Tests for O(1) indicator updates"""
+
+    def test_updates_match_batch_engine(self, prices):
+        timestamps = np.arange(len(prices)) * CANDLE_INTERVAL_MS
+        state = IndicatorState.from_history(timestamps[:300], prices[:300])
+        for timestamp, close in zip(timestamps[300:-1], prices[300:-1]):
+            state.update(timestamp, close)
+
+        snapshot = state.snapshot(prices[-1])
+        expected = indicators.latest(prices[-720:])
+        for name in FIELDS:
+            assert snapshot[name] == pytest.approx(float(expected[name]), rel=1e-9)
+        assert snapshot["trend"] == str(expected["trend"])
+
+    def test_snapshot_does_not_mutate(self, prices):
+        state = IndicatorState.from_history(np.arange(100), prices[:100])
+        before = state.snapshot()
+        state.snapshot(prices[100])
+        assert state.snapshot() == before
+        assert state.count == 100
+
+    def test_warmup_from_empty_state(self, prices):
+        state = IndicatorState()
+        for i, close in enumerate(prices[:30]):
+            state.update(i, close)
+        snapshot = state.snapshot()
+        expected = indicators.latest(prices[:30])
+        for name in FIELDS:
+            assert snapshot[name] == pytest.approx(float(expected[name]))
+
+    def test_calculate_rsi_matches_state(self, prices):
+        state = IndicatorState.from_history(np.arange(720) * CANDLE_INTERVAL_MS, prices[:720])
+        assert PricePredictor().calculate_rsi(prices[:720]) == pytest.approx(state.snapshot()["rsi"])
+
+
+class TestPredictorState:
+    """Tests for keeping per-symbol state in the predictor"""
+
+    def test_only_new_candles_are_applied(self, prices):
+        first = candles(prices[:720])
+        state = advance_state(None, first.timestamp[:-1], first.close[:-1], window=720)
+        assert state.count == 719
+
+        second = candles(prices[2:722], start=2)
+        same = advance_state(state, second.timestamp[:-1], second.close[:-1], window=720)
+        assert same is state
+        assert state.count == 721
+        assert state.last_timestamp == 720 * CANDLE_INTERVAL_MS
+
+    def test_gap_reseeds_state(self, prices):
+        first, later = candles(prices[:720]), candles(prices[:720], start=800)
+        state = advance_state(None, first.timestamp[:-1], first.close[:-1], window=720)
+        reseeded = advance_state(state, later.timestamp[:-1], later.close[:-1], window=720)
+        assert reseeded is not state
+        assert reseeded.count == 719
+
+    def test_reseed_runs_off_the_event_loop(self, prices, monkeypatch):
+        predictor = PricePredictor()
+        predictor.executor.mode = "thread"
+        seeded_on = []
+        from_history = IndicatorState.from_history.__func__
+
+        def record(cls, *args, **kwargs):
+            seeded_on.append(threading.current_thread() is threading.main_thread())
+            return from_history(cls, *args, **kwargs)
+
+        monkeypatch.setattr(IndicatorState, "from_history", classmethod(record))
+        history = candles(prices[:720])
+
+        async def fetch(symbol, days=30):
+            return history
+
+        predictor.fetch_historical_data = fetch
+        asyncio.run(predictor.predict("BTC"))
+        predictor.executor.shutdown()
+        assert seeded_on == [False]
+        assert predictor.states["BTC"].count == 719
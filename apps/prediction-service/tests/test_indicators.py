@@ -0,0 +1,94 @@
+"""
+Tests for vectorized indicators
+"""
+import numpy as np
+import pytest
+from app.models import indicators
+
+
+def reference_ema(prices, period):
+    multiplier = 2 / (period + 1)
+    ema = prices[0]
+    for price in prices[1:]:
+        ema = (price * multiplier) + (ema * (1 - multiplier))
+    return ema
+
+
+def reference_rsi(prices, period=14):
+    gains = []
+    losses = []
+    for i in range(1, len(prices)):
+        change = prices[i] - prices[i-1]
+        gains.append(max(change, 0))
+        losses.append(max(-change, 0))
+    # Wilder smoothing seeded with the simple average of the first period
+    avg_gain = sum(gains[:period]) / period
+    avg_loss = sum(losses[:period]) / period
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    if avg_loss == 0:
+        return 100
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(42)
+    return 40000 * np.exp(np.cumsum(rng.normal(0, 0.01, 720)))
+
+
+class TestSeries:
+    """Tests for full indicator series"""
+
+    def test_sma_matches_window_mean(self, prices):
+        series = indicators.sma(prices, 20)
+        assert np.isnan(series[18])
+        assert series[19] == pytest.approx(prices[:20].mean())
+        assert series[-1] == pytest.approx(prices[-20:].mean())
+
+    def test_ema_matches_recursion(self, prices):
+        series = indicators.ema(prices, 12)
+        assert series[-1] == pytest.approx(reference_ema(list(prices), 12), rel=1e-10)
+        assert series[100] == pytest.approx(reference_ema(list(prices[:101]), 12), rel=1e-10)
+
+    def test_long_ema_stays_finite(self):
+        prices = np.linspace(100, 200, 20000)
+        series = indicators.ema(prices, 26)
+        assert np.all(np.isfinite(series))
+        assert series[-1] == pytest.approx(reference_ema(list(prices), 26), rel=1e-10)
+
+    def test_rsi_matches_reference(self, prices):
+        series = indicators.rsi(prices, 14)
+        assert np.isnan(series[13])
+        assert series[-1] == pytest.approx(reference_rsi(list(prices)))
+        assert series[200] == pytest.approx(reference_rsi(list(prices[:201])))
+
+    def test_rsi_without_losses(self):
+        series = indicators.rsi(np.arange(1.0, 31.0), 14)
+        assert series[-1] == 100
+
+    def test_volatility_window(self, prices):
+        series = indicators.volatility(prices, 24)
+        rets = np.diff(prices[-25:]) / prices[-25:-1]
+        assert series[-1] == pytest.approx(np.std(rets) * 100)
+
+
+class TestBatch:
+    """Tests for 2-D batches of symbols"""
+
+    def test_rows_match_single_symbol(self, prices):
+        batch = np.vstack([prices, prices[::-1], prices * 0.5])
+        values = indicators.latest(batch)
+        for row in range(batch.shape[0]):
+            single = indicators.latest(batch[row])
+            for name in ("sma_20", "sma_50", "ema_12", "ema_26", "rsi", "volatility"):
+                assert values[name][row] == pytest.approx(float(single[name]))
+            assert values["trend"][row] == single["trend"]
+
+    def test_short_history_fallbacks(self):
+        values = indicators.latest([100.0, 101.0, 102.0])
+        assert float(values["sma_20"]) == 102.0
+        assert float(values["ema_26"]) == 102.0
+        assert float(values["rsi"]) == 50.0
+        assert str(values["trend"]) == "neutral"
@@ -0,0 +1,107 @@
+"""
+Tests for pluggable market data sources
+"""
+import asyncio
+import time
+import numpy as np
+import pytest
+from app.models.predictor import PricePredictor, CANDLE_INTERVAL_MS
+from app.services.market_data import (
+    MarketDataError, MarketDataSource, ReplaySource, SyntheticSource, create_source
+)
+
+START = 1_700_000_000_000 - 1_700_000_000_000 % CANDLE_INTERVAL_MS
+
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    rows = [
+        ",".join(map(str, [START + i * CANDLE_INTERVAL_MS, 100 + i, 101 + i, 99 + i, 100 + i, 1.0]))
+        for i in range(1000)
+    ]
+    (tmp_path / "BTC.csv").write_text("timestamp,open,high,low,close,volume\n" + "\n".join(rows))
+    return str(tmp_path)
+
+
+class TestReplaySource:
+    """Tests for replaying local candle files"""
+
+    def test_stepped_replay_uses_delta_fetches(self, replay_dir):
+        source = ReplaySource(replay_dir, speed=0)
+        predictor = PricePredictor(source=source)
+        requests = []
+        fetch = source.fetch_klines
+
+        async def recording_fetch(symbol, limit, start_time=None):
+            requests.append((limit, start_time))
+            return await fetch(symbol, limit, start_time)
+
+        source.fetch_klines = recording_fetch
+
+        async def run():
+            first = await predictor.fetch_historical_data("BTC")
+            source.advance(3)
+            second = await predictor.fetch_historical_data("BTC")
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert len(first) == len(second) == 720
+        assert first.timestamp[-1] == START + 720 * CANDLE_INTERVAL_MS
+        assert second.timestamp[-1] == first.timestamp[-1] + 3 * CANDLE_INTERVAL_MS
+        assert requests[1] == (4, first.timestamp[-1])
+
+    def test_accelerated_clock(self, replay_dir):
+        source = ReplaySource(replay_dir, speed=3600 * 100)
+        asyncio.run(source.fetch_klines("BTC", 1))
+        before = source.now_ms()
+        time.sleep(0.02)
+        assert source.now_ms() - before >= CANDLE_INTERVAL_MS
+
+    def test_prediction_keyed_by_replay_hour(self, replay_dir):
+        source = ReplaySource(replay_dir, speed=0)
+        predictor = PricePredictor(source=source)
+
+        async def run():
+            first = await predictor.predict("BTC")
+            source.advance()
+            return first, await predictor.predict("BTC")
+
+        first, second = asyncio.run(run())
+        assert second["current_price"] == first["current_price"] + 1
+
+    def test_missing_symbol(self, replay_dir):
+        with pytest.raises(MarketDataError):
+            asyncio.run(ReplaySource(replay_dir).fetch_klines("ETH", 10))
+
+
+class TestSyntheticSource:
+    """Tests for generated candles"""
+
+    def test_deterministic_and_consistent_with_delta(self):
+        async def run():
+            source = SyntheticSource(seed=1)
+            full = await source.fetch_klines("BTC", 720)
+            delta = await source.fetch_klines("BTC", 5, start_time=int(full[0, -3]))
+            again = await SyntheticSource(seed=1).fetch_klines("BTC", 720)
+            return full, delta, again
+
+        full, delta, again = asyncio.run(run())
+        assert full.shape == (6, 720)
+        np.testing.assert_array_equal(full, again)
+        np.testing.assert_array_equal(delta, full[:, -3:])
+        assert np.all(np.diff(full[0]) == CANDLE_INTERVAL_MS)
+        assert np.all(full[2] >= full[4]) and np.all(full[3] <= full[4])
+
+    def test_predictor_runs_offline(self):
+        predictor = PricePredictor(source=SyntheticSource())
+        results = asyncio.run(predictor.predict_batch(["BTC", "ETH"]))
+        assert [result["symbol"] for result in results] == ["BTC", "ETH"]
+        assert all(len(result["predictions"]) == 4 for result in results)
+
+    def test_unknown_source(self):
+        with pytest.raises(ValueError):
+            create_source("ftp")
+
+    def test_source_must_implement_fetch_klines(self):
+        with pytest.raises(TypeError):
+            MarketDataSource()
@@ -0,0 +1,85 @@
+"""
+Tests for Prometheus instrumentation
+"""
+import asyncio
+import time
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.main import app
+from app.models.predictor import PricePredictor, predictor as global_predictor
+from app.services.metrics import LoopLagMonitor
+from app.services.upstream import UPSTREAM_RETRIES
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetrics:
+    """Tests for the /metrics surface"""
+
+    def test_stage_timings_are_recorded(self, predictor):
+        before = {stage: sample("prediction_stage_seconds_count", stage=stage)
+                  for stage in ("fetch", "indicators", "regression", "projection")}
+        asyncio.run(predictor.predict("BTC"))
+        for stage, count in before.items():
+            assert sample("prediction_stage_seconds_count", stage=stage) == count + 1
+
+    def test_upstream_failures_are_labelled_by_status(self):
+        async def unavailable(request):
+            return web.Response(status=503)
+
+        async def run():
+            upstream = web.Application()
+            upstream.router.add_get("/api/v3/klines", unavailable)
+            server = TestServer(upstream)
+            await server.start_server()
+            predictor = PricePredictor()
+            predictor.source.base_url = str(server.make_url("")).rstrip("/")
+            predictor.fetcher.backoff_base = 0.001
+            try:
+                return await predictor.fetch_historical_data("METRICS")
+            finally:
+                await predictor.close()
+                await server.close()
+
+        candles = asyncio.run(run())
+        assert len(candles) == 0
+        assert sample("prediction_upstream_fetch_seconds_count", source="http", symbol="METRICS", status="503") == 1 + UPSTREAM_RETRIES
+        assert sample("prediction_upstream_fetches_in_flight") == 0
+
+    def test_metrics_endpoint(self, monkeypatch):
+        async def cached_predict(symbol):
+            return {"symbol": symbol}
+
+        monkeypatch.setattr(global_predictor, "predict", cached_predict)
+        with TestClient(app) as client:
+            client.get("/api/predictions/BTC")
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        body = response.text
+        assert 'prediction_http_request_seconds_count{method="GET",route="/api/predictions/{symbol}",status="200"}' in body
+        assert 'prediction_cache_events_total{cache="prediction",event="miss"}' in body
+        assert "prediction_executor_queue_depth" in body
+        assert "prediction_event_loop_lag_seconds_bucket" in body
+
+    def test_loop_lag_monitor_sees_blocking_call(self):
+        monitor = LoopLagMonitor(interval=0.01)
+
+        def slow_samples():
+            return sample("prediction_event_loop_lag_seconds_count") - \
+                sample("prediction_event_loop_lag_seconds_bucket", le="0.05")
+
+        async def run():
+            await monitor.start()
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)
+            await asyncio.sleep(0.02)
+            await monitor.stop()
+
+        before = slow_samples()
+        asyncio.run(run())
+        assert slow_samples() == before + 1
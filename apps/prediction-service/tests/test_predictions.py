@@ -0,0 +1,183 @@
+"""
+Tests for Prediction Service API
+"""
+import asyncio
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from app.api import predictions
+from app.main import app
+from app.models.predictor import predictor
+from app.services.responses import etag_matches
+
+
+class TestHealthEndpoint:
+    """Tests for health check endpoint"""
+
+    def test_health_check(self):
+        """Test that health endpoint returns OK"""
+        with TestClient(app) as client:
+            response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["service"] == "prediction-service"
+
+
+class TestUpstreamSession:
+    """Tests for the shared upstream session lifecycle"""
+
+    def test_session_opened_and_closed_by_lifespan(self):
+        """Test that the app lifespan owns one pooled session"""
+        with TestClient(app):
+            session = predictor.source.session
+            assert session is not None
+            assert not session.closed
+            assert session.connector.limit > 0
+        assert session.closed
+        assert predictor.source.session is None
+
+
+class TestAllPredictions:
+    """Tests for the concurrent multi-symbol endpoint"""
+
+    def test_symbols_run_concurrently(self, monkeypatch):
+        """Test that latency is close to the slowest symbol, not the sum"""
+        async def slow_predict(symbol):
+            await asyncio.sleep(0.2)
+            return {"symbol": symbol}
+
+        monkeypatch.setattr(predictor, "predict", slow_predict)
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            response = client.get("/api/predictions/")
+            elapsed = time.perf_counter() - started
+
+        assert response.status_code == 200
+        symbols = [p["symbol"] for p in response.json()["predictions"]]
+        assert symbols == predictions.SUPPORTED_SYMBOLS
+        assert elapsed < 0.2 * len(symbols) / 2
+
+    def test_errors_and_timeouts_are_isolated(self, monkeypatch):
+        """Test that one failing or hanging symbol does not affect others"""
+        async def flaky_predict(symbol):
+            if symbol == "BTC":
+                raise RuntimeError("upstream down")
+            if symbol == "ETH":
+                await asyncio.sleep(5)
+            return {"symbol": symbol, "current_price": 1.0}
+
+        monkeypatch.setattr(predictor, "predict", flaky_predict)
+        monkeypatch.setattr(predictions, "PREDICTION_TIMEOUT", 0.1)
+        with TestClient(app) as client:
+            response = client.get("/api/predictions/")
+
+        by_symbol = {p["symbol"]: p for p in response.json()["predictions"]}
+        assert by_symbol["BTC"]["error"] == "upstream down"
+        assert "timed out" in by_symbol["ETH"]["error"]
+        assert by_symbol["SOL"]["current_price"] == 1.0
+
+
+class TestIndicatorsEndpoint:
+    """Tests for GET /api/predictions/{symbol}/indicators"""
+
+    def test_fields_selector(self, monkeypatch):
+        """Test that ?fields= is passed through"""
+        async def fake_indicators(symbol, fields=None):
+            return {"current_price": 1.0, "indicators": {name: 1.0 for name in fields}}
+
+        monkeypatch.setattr(predictor, "indicators", fake_indicators)
+        with TestClient(app) as client:
+            response = client.get("/api/predictions/btc/indicators?fields=rsi,sma_20")
+        assert response.status_code == 200
+        assert response.json()["indicators"] == {"rsi": 1.0, "sma_20": 1.0}
+        assert "recommendation" not in response.json()
+
+    def test_unknown_field(self):
+        """Test that unknown fields are rejected"""
+        with TestClient(app) as client:
+            response = client.get("/api/predictions/BTC/indicators?fields=macd")
+        assert response.status_code == 400
+
+
+class TestBatchEndpoint:
+    """Tests for POST /api/predictions/batch"""
+
+    def test_batch_with_filters(self, monkeypatch):
+        """Test that indicators and timeframes are filtered per request"""
+        async def fake_batch(symbols, concurrency=8):
+            return [
+                {
+                    "symbol": symbol,
+                    "indicators": {"rsi": 50.0, "trend": "neutral"},
+                    "predictions": [{"timeframe": "1h"}, {"timeframe": "7d"}]
+                }
+                for symbol in symbols
+            ]
+
+        monkeypatch.setattr(predictor, "predict_batch", fake_batch)
+        with TestClient(app) as client:
+            response = client.post("/api/predictions/batch", json={
+                "symbols": ["btc", "ETH", "BTC"],
+                "indicators": ["rsi"],
+                "timeframes": ["7d"]
+            })
+        assert response.status_code == 200
+        data = response.json()
+        assert data["symbols"] == ["BTC", "ETH"]
+        assert data["predictions"][0]["indicators"] == {"rsi": 50.0}
+        assert data["predictions"][0]["predictions"] == [{"timeframe": "7d"}]
+
+    def test_unsupported_symbol(self):
+        """Test that unknown symbols are rejected"""
+        with TestClient(app) as client:
+            response = client.post("/api/predictions/batch", json={"symbols": ["DOGE"]})
+        assert response.status_code == 400
+
+
+class TestEncodedResponses:
+    """Tests for pre-encoded cached responses and conditional requests"""
+
+    def test_cache_hits_reuse_encoded_body_and_etag(self, monkeypatch):
+        """Test that a cached result is encoded once and 304s on a matching ETag"""
+        cached = {"symbol": "BTC", "current_price": np.float64(1.5), "indicators": {"trend": np.str_("neutral")}}
+
+        async def cached_predict(symbol):
+            return cached
+
+        monkeypatch.setattr(predictor, "predict", cached_predict)
+        predictions.responses.clear()
+        encoded_before = predictions.responses.encoded
+        with TestClient(app) as client:
+            first = client.get("/api/predictions/BTC")
+            second = client.get("/api/predictions/BTC")
+            not_modified = client.get("/api/predictions/BTC", headers={"If-None-Match": first.headers["etag"]})
+            changed = client.get("/api/predictions/BTC", headers={"If-None-Match": '"other"'})
+
+        assert first.json() == {"symbol": "BTC", "current_price": 1.5, "indicators": {"trend": "neutral"}}
+        assert first.content == second.content
+        assert first.headers["etag"] == second.headers["etag"]
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert changed.status_code == 200
+        assert predictions.responses.encoded - encoded_before == 1
+
+    def test_new_result_gets_new_etag(self, monkeypatch):
+        """Test that a recomputed result is re-encoded"""
+        prices = iter([1.0, 2.0])
+
+        async def fresh_predict(symbol):
+            return {"symbol": symbol, "current_price": next(prices)}
+
+        monkeypatch.setattr(predictor, "predict", fresh_predict)
+        with TestClient(app) as client:
+            first = client.get("/api/predictions/ETH")
+            second = client.get("/api/predictions/ETH", headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 200
+        assert second.json()["current_price"] == 2.0
+        assert first.headers["etag"] != second.headers["etag"]
+
+    def test_etag_matching(self):
+        """Test If-None-Match parsing"""
+        assert etag_matches('"a", W/"b"', '"b"')
+        assert etag_matches("*", '"b"')
+        assert not etag_matches('"a"', '"b"')
+        assert not etag_matches(None, '"b"')
@@ -0,0 +1,170 @@
+"""
+Tests for PricePredictor request handling
+"""
+import asyncio
+import pytest
+from app.models.candles import CandleView
+from app.services.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent cache misses"""
+
+    def test_concurrent_misses_share_one_fetch(self, predictor):
+        async def run():
+            return await asyncio.gather(*(predictor.predict("BTC") for _ in range(20)))
+
+        results = asyncio.run(run())
+        assert predictor.fetch_calls == 1
+        assert all(result is results[0] for result in results)
+        assert predictor.singleflight.coalesced == 19
+        assert predictor.singleflight.stats()["in_flight"] == 0
+
+    def test_different_symbols_are_not_coalesced(self, predictor):
+        async def run():
+            await asyncio.gather(predictor.predict("BTC"), predictor.predict("ETH"))
+
+        asyncio.run(run())
+        assert predictor.fetch_calls == 2
+        assert predictor.singleflight.coalesced == 0
+
+    def test_cancelled_waiter_does_not_cancel_shared_work(self, predictor):
+        async def run():
+            first = asyncio.ensure_future(predictor.predict("BTC"))
+            await asyncio.sleep(0)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(predictor.predict("BTC"), 0.01)
+            return await first
+
+        result = asyncio.run(run())
+        assert result["symbol"] == "BTC"
+        assert predictor.fetch_calls == 1
+
+
+class TestPredictionCache:
+    """Tests for TTL expiry and stale-while-revalidate in predict()"""
+
+    def test_stale_entry_is_served_and_refreshed(self, predictor):
+        clock = [0.0]
+        predictor.cache.clock = lambda: clock[0]
+        predictor.cache.stale_ttl = 60
+
+        async def run():
+            first = await predictor.predict("BTC")
+            clock[0] = predictor.cache.ttl + 1
+            stale = await predictor.predict("BTC")
+            assert stale is first
+            await asyncio.gather(*predictor._background)
+            return first, await predictor.predict("BTC")
+
+        first, refreshed = asyncio.run(run())
+        assert predictor.fetch_calls == 2
+        assert refreshed is not first
+        assert predictor.cache.stats()["stale_hits"] == 1
+
+    def test_expired_entry_is_recomputed(self, predictor):
+        clock = [0.0]
+        predictor.cache.clock = lambda: clock[0]
+
+        async def run():
+            await predictor.predict("BTC")
+            clock[0] = predictor.cache.ttl + predictor.cache.stale_ttl + 1
+            await predictor.predict("BTC")
+
+        asyncio.run(run())
+        assert predictor.fetch_calls == 2
+
+
+class TestIndicatorsPath:
+    """Tests for the indicators-only computation path"""
+
+    def test_indicators_skip_projection(self, predictor, monkeypatch):
+        def fail_fit(*args, **kwargs):
+            raise AssertionError("projection should not run")
+
+        monkeypatch.setattr("app.models.trend.TrendEngine.fit", fail_fit)
+        result = asyncio.run(predictor.indicators("BTC"))
+        assert set(result["indicators"]) == {"sma_20", "sma_50", "ema_12", "ema_26", "rsi", "volatility", "trend"}
+        assert result["recommendation"]["action"] in ("BUY", "SELL", "HOLD")
+
+    def test_field_selection_and_cache(self, predictor):
+        async def run():
+            subset = await predictor.indicators("BTC", ["rsi"])
+            again = await predictor.indicators("BTC", ["rsi"])
+            return subset, again
+
+        subset, again = asyncio.run(run())
+        assert subset is again
+        assert list(subset["indicators"]) == ["rsi"]
+        assert "recommendation" not in subset
+        assert predictor.fetch_calls == 1
+
+    def test_values_match_full_prediction(self, predictor):
+        async def run():
+            return await predictor.indicators("BTC"), await predictor.predict("BTC")
+
+        indicators, prediction = asyncio.run(run())
+        assert indicators["indicators"] == prediction["indicators"]
+        assert indicators["recommendation"] == prediction["recommendation"]
+
+
+class TestBatch:
+    """Tests for batch predictions on a stacked price matrix"""
+
+    def test_batch_matches_single_predictions(self, predictor):
+        batch = asyncio.run(predictor.predict_batch(["BTC", "ETH"]))
+        expected = asyncio.run(predictor.predict("SOL"))
+        for result in batch:
+            assert result["indicators"] == expected["indicators"]
+            assert result["predictions"] == expected["predictions"]
+            assert result["recommendation"] == expected["recommendation"]
+
+    def test_batch_uses_and_fills_cache(self, predictor):
+        async def run():
+            await predictor.predict("BTC")
+            await predictor.predict_batch(["BTC", "ETH", "SOL"])
+            await predictor.predict("ETH")
+
+        asyncio.run(run())
+        assert predictor.fetch_calls == 3
+
+    def test_batch_joins_in_flight_prediction(self, predictor):
+        async def run():
+            single = asyncio.ensure_future(predictor.predict("BTC"))
+            await asyncio.sleep(0)
+            batch = await predictor.predict_batch(["BTC"])
+            return await single, batch[0]
+
+        single, batched = asyncio.run(run())
+        assert single is batched
+        assert predictor.fetch_calls == 1
+
+    def test_in_flight_prediction_finishing_first(self, predictor):
+        """A symbol left out of the batch as in flight is computed if that finished"""
+        class FinishedFlight(SingleFlight):
+            def __contains__(self, key):
+                return True
+
+        predictor.singleflight = FinishedFlight()
+        results = asyncio.run(predictor.predict_batch(["BTC", "ETH"]))
+        assert [result["symbol"] for result in results] == ["BTC", "ETH"]
+        assert predictor.fetch_calls == 2
+
+    def test_raising_fetch_is_isolated(self, predictor):
+        results = asyncio.run(predictor.predict_batch(["BTC", "BAD", "ETH"]))
+        assert [result["symbol"] for result in results] == ["BTC", "BAD", "ETH"]
+        assert "error" in results[1]
+        assert "error" not in results[0] and "error" not in results[2]
+
+    def test_failed_symbol_is_isolated(self, predictor):
+        history = predictor.fetch_historical_data
+
+        async def fetch(symbol, days=30):
+            if symbol == "ETH":
+                return CandleView.from_klines([])
+            return await history(symbol, days)
+
+        predictor.fetch_historical_data = fetch
+        results = asyncio.run(predictor.predict_batch(["BTC", "ETH"]))
+        assert "error" in results[1]
+        assert results[0]["symbol"] == "BTC"
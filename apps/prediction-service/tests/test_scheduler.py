@@ -0,0 +1,124 @@
+"""
+Tests for the background precompute scheduler
+"""
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.scheduler import PrecomputeScheduler
+
+
+class TestSchedule:
+    """Tests for run timing"""
+
+    def test_next_run_is_after_candle_close(self):
+        scheduler = PrecomputeScheduler(None, [], interval=3600, lead=5, jitter=10)
+        run_at = scheduler.next_run_after(7200 + 100)
+        assert 10800 + 5 <= run_at <= 10800 + 15
+
+    def test_run_within_lead_window_of_current_boundary(self):
+        scheduler = PrecomputeScheduler(None, [], interval=3600, lead=5, jitter=0)
+        assert scheduler.next_run_after(7201) == 7205
+
+    def test_runs_follow_source_clock(self, predictor):
+        """A replay clock far from wall time still triggers the run at its boundary"""
+        scheduler = PrecomputeScheduler(predictor, ["BTC"], interval=3600, lead=5, jitter=0, tick=0.01)
+        now = [7190 * 1000]
+        predictor.source.now_ms = lambda: now[0]
+
+        async def run():
+            await scheduler.start()
+            await asyncio.sleep(0.05)
+            assert scheduler.next_run == 7205
+            assert scheduler.runs == 0
+            now[0] = 7206 * 1000
+            for _ in range(100):
+                if scheduler.runs:
+                    break
+                await asyncio.sleep(0.01)
+            await scheduler.stop()
+
+        asyncio.run(run())
+        assert scheduler.runs == 1
+        assert scheduler.last_started == 7206
+
+
+class TestRunOnce:
+    """Tests for publishing predictions to the cache"""
+
+    def test_requests_are_served_from_cache_after_run(self, predictor):
+        scheduler = PrecomputeScheduler(predictor, ["BTC", "ETH"], jitter=0)
+
+        async def run():
+            await scheduler.run_once()
+            calls = predictor.fetch_calls
+            await predictor.predict("BTC")
+            await predictor.predict("ETH")
+            return calls
+
+        assert asyncio.run(run()) == 2
+        assert predictor.fetch_calls == 2
+        assert scheduler.runs == 1
+        assert scheduler.results["BTC"]["ok"]
+
+    def test_entries_outlive_default_ttl(self, predictor):
+        scheduler = PrecomputeScheduler(predictor, ["BTC"], interval=3600, jitter=0)
+        clock = [0.0]
+        predictor.cache.clock = lambda: clock[0]
+        asyncio.run(scheduler.run_once())
+        clock[0] = predictor.cache.ttl + predictor.cache.stale_ttl + 1
+        assert predictor.cache.get(predictor._cache_key("BTC")) is not None
+
+    def test_requests_after_candle_close_are_served_from_cache(self, predictor):
+        """Requests between the candle boundary and the run use the previous key"""
+        scheduler = PrecomputeScheduler(predictor, ["BTC"], interval=3600, lead=5, jitter=10)
+        now = [5400 * 1000]
+        predictor.source.now_ms = lambda: now[0]
+
+        async def run():
+            await scheduler.start()
+            await scheduler.stop()
+            previous = await predictor.refresh("BTC", ttl=3675)
+            now[0] = 7203 * 1000
+            before_run = await predictor.predict("BTC")
+            now[0] = 7210 * 1000
+            await scheduler.run_once()
+            after_run = await predictor.predict("BTC")
+            now[0] = 7220 * 1000
+            return previous, before_run, after_run, await predictor.predict("BTC")
+
+        previous, before_run, after_run, rolled_over = asyncio.run(run())
+        assert before_run is previous
+        assert after_run is rolled_over is not previous
+        assert predictor.fetch_calls == 2
+
+    def test_refresh_joining_request_keeps_ttl(self, predictor):
+        clock = [0.0]
+        predictor.cache.clock = lambda: clock[0]
+
+        async def run():
+            request = asyncio.ensure_future(predictor.predict("BTC"))
+            await asyncio.sleep(0)
+            await predictor.refresh("BTC", ttl=3600)
+            await request
+
+        asyncio.run(run())
+        clock[0] = predictor.cache.ttl + predictor.cache.stale_ttl + 1
+        assert predictor.cache.get(predictor._cache_key("BTC")) is not None
+        assert predictor.fetch_calls == 1
+
+    def test_failures_are_reported_per_symbol(self, predictor):
+        scheduler = PrecomputeScheduler(predictor, ["BTC", "BAD"])
+        asyncio.run(scheduler.run_once())
+        assert scheduler.results["BTC"]["ok"]
+        assert scheduler.results["BAD"]["error"] == "boom"
+
+
+class TestStatusEndpoint:
+    """Tests for the refresh status endpoint"""
+
+    def test_status(self):
+        with TestClient(app) as client:
+            response = client.get("/api/predictions/scheduler/status")
+        assert response.status_code == 200
+        data = response.json()
+        assert {"enabled", "running", "runs", "next_run", "symbols"} <= set(data)
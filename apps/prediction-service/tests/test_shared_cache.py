@@ -0,0 +1,146 @@
+"""
+Tests for the cluster-wide L2 cache and compute lock
+"""
+import asyncio
+import pytest
+from app.models.predictor import PricePredictor
+from app.services.shared_cache import FakeSharedCache, RedisSharedCache, SharedCache, create_shared_cache
+
+
+def make_worker(shared, history):
+    """A predictor standing in for one uvicorn worker, counting upstream fetches"""
+    worker = PricePredictor(shared=shared)
+    worker.fetch_calls = 0
+
+    async def fake_fetch(symbol, days=30):
+        worker.fetch_calls += 1
+        await asyncio.sleep(0.05)
+        return history
+
+    worker.fetch_historical_data = fake_fetch
+    return worker
+
+
+class TestTwoTierCache:
+    """Tests for sharing predictions between workers"""
+
+    def test_one_worker_computes_per_symbol_hour(self, history):
+        shared = FakeSharedCache(poll=0.01)
+        workers = [make_worker(shared, history) for _ in range(8)]
+
+        async def run():
+            return await asyncio.gather(*(worker.predict("BTC") for worker in workers))
+
+        results = asyncio.run(run())
+        assert sum(worker.fetch_calls for worker in workers) == 1
+        assert all(result == results[0] for result in results)
+        assert shared.stats()["locks_acquired"] == 1
+        assert shared.stats()["lock_waits"] == 7
+
+    def test_l2_hit_fills_l1(self, history):
+        clock = [0.0]
+        shared = FakeSharedCache(clock=lambda: clock[0])
+        first, second = make_worker(shared, history), make_worker(shared, history)
+
+        async def run():
+            await first.predict("BTC")
+            clock[0] = 100.0
+            await second.predict("BTC")
+
+        asyncio.run(run())
+        assert second.fetch_calls == 0
+        assert shared.stats()["hits"] == 1
+        assert second.cache.get(second._cache_key("BTC")) is not None
+
+    def test_lock_holder_timeout_falls_back_to_local_compute(self, history):
+        shared = FakeSharedCache(lock_wait=0.05, poll=0.01)
+        worker = make_worker(shared, history)
+
+        async def run():
+            assert await shared.acquire(worker._cache_key("BTC"))
+            return await worker.predict("BTC")
+
+        result = asyncio.run(run())
+        assert result["symbol"] == "BTC"
+        assert worker.fetch_calls == 1
+        assert shared.stats()["lock_timeouts"] == 1
+
+    def test_batch_reads_and_publishes(self, history):
+        shared = FakeSharedCache()
+        first, second = make_worker(shared, history), make_worker(shared, history)
+
+        async def run():
+            await first.predict_batch(["BTC", "ETH"])
+            return await second.predict_batch(["BTC", "ETH", "SOL"])
+
+        results = asyncio.run(run())
+        assert second.fetch_calls == 1
+        assert [result["symbol"] for result in results] == ["BTC", "ETH", "SOL"]
+
+    def test_batch_and_single_requests_compute_once(self, history):
+        shared = FakeSharedCache(poll=0.01)
+        workers = [make_worker(shared, history) for _ in range(4)]
+
+        async def run():
+            return await asyncio.gather(
+                workers[0].predict_batch(["BTC", "ETH"]),
+                workers[1].predict_batch(["ETH", "SOL"]),
+                workers[2].predict("BTC"),
+                workers[3].predict("SOL")
+            )
+
+        asyncio.run(run())
+        assert sum(worker.fetch_calls for worker in workers) == 3
+
+    def test_indicators_and_correlations_compute_once(self, history):
+        shared = FakeSharedCache(poll=0.01)
+        workers = [make_worker(shared, history) for _ in range(4)]
+
+        async def run():
+            await asyncio.gather(*(worker.indicators("BTC", ["rsi"]) for worker in workers))
+            indicator_fetches = sum(worker.fetch_calls for worker in workers)
+            await asyncio.gather(*(worker.correlations(["BTC", "ETH"], [24]) for worker in workers))
+            return indicator_fetches
+
+        assert asyncio.run(run()) == 1
+        assert sum(worker.fetch_calls for worker in workers) == 3
+
+
+class TestSharedCacheBackends:
+    """Tests for lock semantics and backend failures"""
+
+    def test_release_requires_token(self):
+        shared = FakeSharedCache()
+
+        async def run():
+            token = await shared.acquire("BTC_1")
+            assert await shared.acquire("BTC_1") is None
+            await shared.release("BTC_1", "someone-else")
+            assert await shared.acquire("BTC_1") is None
+            await shared.release("BTC_1", token)
+            return await shared.acquire("BTC_1")
+
+        assert asyncio.run(run())
+
+    def test_unreachable_redis_degrades_to_local(self, history):
+        shared = RedisSharedCache("redis://127.0.0.1:1/0")
+        worker = make_worker(shared, history)
+
+        async def run():
+            try:
+                return await worker.predict("BTC")
+            finally:
+                await shared.close()
+
+        result = asyncio.run(run())
+        assert result["symbol"] == "BTC"
+        assert shared.stats()["errors"] >= 2
+
+    def test_backend_must_implement_storage(self):
+        with pytest.raises(TypeError):
+            SharedCache()
+
+    @pytest.mark.parametrize("url, backend", [("", None), ("memory://", "memory"), ("redis://localhost:6379", "redis")])
+    def test_factory(self, url, backend):
+        shared = create_shared_cache(url)
+        assert (shared.backend if shared else None) == backend
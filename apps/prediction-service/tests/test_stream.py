@@ -0,0 +1,161 @@
+"""
+Tests for pushing prediction snapshots to streaming subscribers
+"""
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.api import predictions
+from app.main import app
+from app.models.candles import CandleView
+from app.services.stream import PredictionStream, sse_events
+
+
+def moved(result, percent):
+    """Copy of a prediction with the price moved by ``percent``"""
+    changed = dict(result)
+    changed["current_price"] = result["current_price"] * (1 + percent / 100)
+    return changed
+
+
+class TestPredictionStream:
+    """Tests for change detection and fan-out"""
+
+    def test_one_computation_fans_out_to_all_subscribers(self, predictor):
+        stream = PredictionStream(predictor)
+
+        async def run():
+            subscriptions = [stream.subscribe(["BTC"]) for _ in range(100)]
+            await stream.poll_once()
+            return [sub.queue.get_nowait() for sub in subscriptions]
+
+        messages = asyncio.run(run())
+        assert predictor.fetch_calls == 1
+        assert all(message is messages[0] for message in messages)
+        assert json.loads(messages[0])["reason"] == "snapshot"
+        assert stream.stats()["delivered"] == 100
+
+    def test_unchanged_snapshot_is_not_pushed(self, predictor):
+        stream = PredictionStream(predictor, threshold=0.5)
+
+        async def run():
+            subscription = stream.subscribe(["BTC"])
+            await stream.poll_once()
+            first = stream.latest["BTC"]
+            assert stream.publish("BTC", dict(first)) is False
+            assert stream.publish("BTC", moved(first, 0.1)) is False
+            assert stream.publish("BTC", moved(first, 1.0)) is True
+            return subscription
+
+        subscription = asyncio.run(run())
+        reasons = [json.loads(subscription.queue.get_nowait())["reason"] for _ in range(2)]
+        assert reasons == ["snapshot", "threshold"]
+        assert subscription.queue.empty()
+        assert stream.skipped == 2
+
+    def test_poll_pushes_price_moves_between_refreshes(self, predictor, history):
+        stream = PredictionStream(predictor, threshold=0.5)
+        price = [1.0]
+
+        async def fetch(symbol, days=30):
+            closes = history.close.copy()
+            closes[-1] *= price[0]
+            return CandleView.from_klines([[t, c, c, c, c, 1.0] for t, c in zip(history.timestamp, closes)])
+
+        predictor.fetch_historical_data = fetch
+
+        async def run():
+            await predictor.refresh("BTC", ttl=3600)
+            subscription = stream.subscribe(["BTC"])
+            await stream.poll_once()
+            price[0] = 1.01
+            await stream.poll_once()
+            return subscription
+
+        subscription = asyncio.run(run())
+        reasons = [json.loads(subscription.queue.get_nowait())["reason"] for _ in range(2)]
+        assert reasons == ["snapshot", "threshold"]
+
+    def test_candle_close_always_publishes(self, predictor):
+        stream = PredictionStream(predictor)
+
+        async def run():
+            subscription = stream.subscribe(["BTC"])
+            result = await predictor.predict("BTC")
+            stream.publish("BTC", result)
+            await stream.candle_closed("BTC", dict(result))
+            return subscription
+
+        subscription = asyncio.run(run())
+        subscription.queue.get_nowait()
+        assert json.loads(subscription.queue.get_nowait())["reason"] == "candle_close"
+
+    def test_late_subscriber_gets_latest_and_slow_one_drops_oldest(self, predictor):
+        stream = PredictionStream(predictor, threshold=0.0, queue_size=2)
+
+        async def run():
+            slow = stream.subscribe(["BTC"])
+            await stream.poll_once()
+            result = stream.latest["BTC"]
+            for step in range(1, 4):
+                stream.publish("BTC", moved(result, step))
+            late = stream.subscribe(["BTC", "ETH"])
+            return slow, late
+
+        slow, late = asyncio.run(run())
+        assert slow.dropped == 2
+        assert late.queue.qsize() == 1
+        assert late.queue.get_nowait() == stream._latest_messages["BTC"]
+
+    def test_sse_events_format_and_unsubscribe(self, predictor):
+        stream = PredictionStream(predictor)
+
+        async def run():
+            subscription = stream.subscribe(["BTC"])
+            events = sse_events(stream, subscription, heartbeat=0.01)
+            heartbeat = await events.__anext__()
+            await stream.poll_once()
+            event = await events.__anext__()
+            await events.aclose()
+            return heartbeat, event
+
+        heartbeat, event = asyncio.run(run())
+        assert heartbeat.startswith(": heartbeat")
+        assert event.startswith("event: prediction\ndata: {")
+        assert stream.subscriptions == set()
+
+
+class TestStreamEndpoints:
+    """Tests for the WebSocket endpoint"""
+
+    def test_websocket_receives_pushed_snapshot(self, predictor, monkeypatch):
+        stream = PredictionStream(predictor, poll_interval=60)
+        monkeypatch.setattr(predictions, "stream", stream)
+
+        with TestClient(app) as client:
+            with client.websocket_connect("/api/predictions/ws?symbols=btc") as websocket:
+                client.portal.call(stream.poll_once)
+                message = websocket.receive_json()
+        assert message["symbol"] == "BTC"
+        assert message["data"]["predictions"]
+
+    def test_failed_push_is_logged(self, predictor, monkeypatch, caplog):
+        stream = PredictionStream(predictor, poll_interval=60)
+        subscription = stream.subscribe(["BTC"])
+
+        async def fail(timeout=None):
+            raise RuntimeError("boom")
+
+        subscription.get = fail
+        monkeypatch.setattr(stream, "subscribe", lambda symbols: subscription)
+        monkeypatch.setattr(predictions, "stream", stream)
+
+        with TestClient(app) as client:
+            with client.websocket_connect("/api/predictions/ws?symbols=btc"):
+                pass
+        assert "WebSocket push to a client failed: boom" in caplog.text
+        assert stream.subscriptions == set()
+
+    def test_unsupported_symbol_is_rejected(self):
+        with TestClient(app) as client:
+            response = client.get("/api/predictions/stream?symbols=DOGE")
+        assert response.status_code == 400
@@ -0,0 +1,79 @@
+"""
+Tests for the closed-form rolling regression
+"""
+import numpy as np
+import pytest
+from app.models.trend import TrendEngine, regression, REGRESSION_WINDOWS
+
+
+def polyfit(prices, window):
+    recent = np.asarray(prices[-window:], dtype=np.float64)
+    x = np.arange(len(recent))
+    slope, intercept = np.polyfit(x, recent, 1)
+    r2 = np.corrcoef(x, recent)[0, 1] ** 2
+    return slope, intercept, r2
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    return 30000 + np.cumsum(rng.normal(5, 40, 400))
+
+
+class TestTrendEngine:
+    """Tests for O(1) rolling fits against np.polyfit"""
+
+    def test_seeded_fits_match_polyfit(self, prices):
+        engine = TrendEngine()
+        engine.seed(prices)
+        fits = engine.fit()
+        for window in REGRESSION_WINDOWS:
+            slope, intercept, r2 = polyfit(prices, window)
+            assert fits[window]["slope"] == pytest.approx(slope, rel=1e-9)
+            assert fits[window]["intercept"] == pytest.approx(intercept, rel=1e-9)
+            assert fits[window]["r2"] == pytest.approx(r2, rel=1e-6)
+            assert fits[window]["count"] == window
+
+    def test_incremental_updates_match_polyfit(self, prices):
+        engine = TrendEngine()
+        engine.seed(prices[:10])
+        for price in prices[10:]:
+            engine.update(price)
+        fits = engine.fit()
+        for window in REGRESSION_WINDOWS:
+            slope, _, r2 = polyfit(prices, window)
+            assert fits[window]["slope"] == pytest.approx(slope, rel=1e-6)
+            assert fits[window]["r2"] == pytest.approx(r2, rel=1e-6)
+
+    def test_provisional_fit_does_not_mutate(self, prices):
+        engine = TrendEngine()
+        engine.seed(prices[:-1])
+        before = engine.fit()
+        provisional = engine.fit(prices[-1])
+        assert engine.fit() == before
+
+        slope, _, _ = polyfit(prices, 24)
+        assert provisional[24]["slope"] == pytest.approx(slope, rel=1e-9)
+
+    def test_short_history(self):
+        engine = TrendEngine()
+        engine.seed([100.0, 101.0, 102.0])
+        fits = engine.fit()
+        assert fits[168]["count"] == 3
+        assert fits[168]["slope"] == pytest.approx(1.0)
+        assert TrendEngine().fit()[24]["slope"] == 0.0
+
+
+class TestVectorizedRegression:
+    """Tests for fitting many rows at once"""
+
+    def test_rows_match_polyfit(self, prices):
+        matrix = np.vstack([prices, prices[::-1], np.full_like(prices, 5.0)])
+        fit = regression(matrix, 72)
+        for row in range(2):
+            slope, intercept, r2 = polyfit(matrix[row], 72)
+            assert fit["slope"][row] == pytest.approx(slope, rel=1e-9)
+            assert fit["intercept"][row] == pytest.approx(intercept, rel=1e-9)
+            assert fit["r2"][row] == pytest.approx(r2, rel=1e-9)
+        assert fit["slope"][2] == 0.0
+        assert fit["r2"][2] == 0.0
@@ -0,0 +1,149 @@
+"""
+Tests for the rate-limit-aware upstream fetch scheduler
+"""
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.models.predictor import PricePredictor
+from app.services.market_data import HTTPSource, MarketDataError, SyntheticSource
+from app.services.upstream import FetchScheduler, WeightBudget
+
+KLINE = [[0, "1", "1", "1", "1", "1"]]
+
+
+class WeightedSource(SyntheticSource):
+    """Synthetic candles with a request weight, recording the order of requests"""
+
+    def __init__(self, fail=()):
+        super().__init__()
+        self.calls = []
+        self.fail = list(fail)
+
+    def request_weight(self, limit):
+        return 1
+
+    async def fetch_klines(self, symbol, limit, start_time=None):
+        self.calls.append(symbol)
+        if self.fail:
+            raise self.fail.pop(0)
+        return await super().fetch_klines(symbol, limit, start_time)
+
+
+async def serve(handler):
+    upstream = web.Application()
+    upstream.router.add_get("/api/v3/klines", handler)
+    server = TestServer(upstream)
+    await server.start_server()
+    return server
+
+
+class TestWeightBudget:
+    """Tests for request weight accounting"""
+
+    def test_reserve_until_limit_then_next_window(self):
+        now = [120.0]
+        budget = WeightBudget(limit=10, window=60, clock=lambda: now[0])
+        assert budget.try_reserve(6)
+        assert not budget.try_reserve(5)
+        assert budget.wait_time() == 60
+        now[0] = 180.0
+        assert budget.try_reserve(5)
+
+    def test_reported_weight_and_block(self):
+        now = [0.0]
+        budget = WeightBudget(limit=10, window=60, clock=lambda: now[0])
+        budget.observe(9)
+        assert not budget.try_reserve(2)
+        now[0] = 60.0
+        budget.block(5)
+        assert not budget.try_reserve(1)
+        assert budget.wait_time() == 5
+
+
+class TestFetchScheduler:
+    """Tests for retries, queueing and header tracking"""
+
+    def test_used_weight_header_is_tracked(self):
+        async def klines(request):
+            return web.json_response(KLINE, headers={"X-MBX-USED-WEIGHT-1M": "1150"})
+
+        async def run():
+            server = await serve(klines)
+            source = HTTPSource(str(server.make_url("")).rstrip("/"))
+            fetcher = FetchScheduler(source)
+            try:
+                await fetcher.fetch("BTC", 720)
+            finally:
+                await source.close()
+                await server.close()
+            return fetcher
+
+        fetcher = asyncio.run(run())
+        assert fetcher.budget.used == 1150
+
+    def test_retries_transient_failures_with_backoff(self):
+        source = WeightedSource(fail=[
+            MarketDataError("HTTP 502", status="502"),
+            MarketDataError("timed out", status="timeout"),
+        ])
+        fetcher = FetchScheduler(source, backoff_base=0.001)
+        candles = asyncio.run(fetcher.fetch("BTC", 10))
+        assert candles.shape == (6, 10)
+        assert source.calls == ["BTC"] * 3
+        assert fetcher.retried == 2
+
+    def test_client_errors_and_long_retry_after_are_not_retried(self):
+        source = WeightedSource(fail=[
+            MarketDataError("HTTP 400", status="400"),
+            MarketDataError("HTTP 418", status="418", retry_after=120),
+        ])
+        fetcher = FetchScheduler(source, backoff_base=0.001, max_wait=0.01)
+
+        for status in ("400", "418"):
+            with pytest.raises(MarketDataError) as error:
+                asyncio.run(fetcher.fetch("BTC", 10))
+            assert error.value.status == status
+        # The ban blocks further requests, which give up after max_wait
+        with pytest.raises(MarketDataError) as error:
+            asyncio.run(fetcher.fetch("BTC", 10))
+        assert error.value.status == "throttled"
+        assert len(source.calls) == 2
+
+    def test_queued_requests_released_by_popularity(self):
+        source = WeightedSource()
+        fetcher = FetchScheduler(source, budget=WeightBudget(limit=10), max_wait=5)
+        for _ in range(3):
+            fetcher.record("BTC")
+        fetcher.record("ETH")
+
+        async def run():
+            fetcher.budget.block(0.05)
+            await asyncio.gather(*(fetcher.fetch(symbol, 10) for symbol in ("SOL", "ETH", "BTC")))
+
+        asyncio.run(run())
+        assert source.calls == ["BTC", "ETH", "SOL"]
+        assert fetcher.queued == 3
+
+
+class TestLastGoodCandles:
+    """Tests for falling back when the upstream keeps failing"""
+
+    def test_fallback_to_stored_candles(self):
+        source = WeightedSource()
+        predictor = PricePredictor(source=source)
+        predictor.fetcher.retries = 0
+
+        async def run():
+            first = await predictor.fetch_historical_data("BTC")
+            source.fail = [MarketDataError("HTTP 503", status="503")]
+            second = await predictor.fetch_historical_data("BTC")
+            source.fail = [MarketDataError("HTTP 503", status="503")]
+            missing = await predictor.fetch_historical_data("ETH")
+            return first, second, missing
+
+        first, second, missing = asyncio.run(run())
+        assert len(second) == len(first) == 720
+        assert second.close[-1] == first.close[-1]
+        assert len(missing) == 0
+        assert predictor.fallbacks == 1